@@ -1,81 +1,444 @@
 import pandas as pd
 import numpy as np 
 import matplotlib.pyplot as plt
-import glob
+import csv
+import hashlib
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+
+# --- 0. Parquet 缓存 ---
+# 合并后的价格表缓存在数据目录下 (例如 DATA/PART1/.cache.parquet)。
+# 缓存里记录了生成它时 CSV 文件的 (文件名, 修改时间, 大小)；只要这些都没变
+# (没有新增、删除或修改 CSV)，就直接读取缓存，跳过 CSV 解析和合并。
+CACHE_FILENAME = ".cache.parquet"
+# ffill=True 的结果另存一份，前向填充每个数据目录只做一次
+FFILL_CACHE_FILENAME = ".cache.ffill.parquet"
+# 对数收益率 (load_log_returns) 也单独缓存；key 里额外带上 ffill / dtype 参数
+LOG_RETURNS_CACHE_FILENAME = ".cache.logret.parquet"
+# 单个资产的完整 OHLCV 表 (read_asset_csv) 按 CSV 分别缓存: DATA/PART1/01.csv -> DATA/PART1/.cache/01.parquet
+ASSET_CACHE_DIR = ".cache"
+
+# --- 数据精度约定 ---
+# 价格和对数收益率统一存成 float32 (CSV 里的价格只有 6-8 位有效数字)，所有脚本看到的是同一份数据，
+# 每次遍历的内存读写也减半。各个统计量 (偏度/峰度、相关性、ACF、分位数收益等) 在计算时
+# 内部按 float64 累加，所以不需要在加载时改用 float64。
+# 唯一的例外是 GARCH：arch 的极大似然估计在 float64 下更稳定，它在交给 arch 之前自己转换。
+
+# pyarrow 是可选依赖：装了就用它的多线程 CSV 解析器，否则退回 pandas 默认的 C 解析器
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# numba 也是可选依赖：装了就用 JIT 内核一次算出对数收益率和绝对对数收益率
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+def _cache_key(files):
+    """ 由所有 CSV 的 (文件名, 修改时间, 大小) 算出的短哈希，任何一个文件变了 key 就变。 """
+    stats = sorted((os.path.basename(f), os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in files)
+    return hashlib.blake2b(repr(stats).encode(), digest_size=8).hexdigest()
+
+def _read_cache(cache_path, cache_key):
+    """ 缓存存在且 key 一致时返回缓存的 DataFrame，否则返回 None。 """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        cached = pd.read_parquet(cache_path, engine='pyarrow')
+    except Exception as e:
+        print(f" 警告: 读取缓存 {cache_path} 出错，将重新加载 CSV: {e}")
+        return None
+    if cached.attrs.pop('cache_key', None) != cache_key:
+        return None
+    return cached
+
+def _write_cache(merged, cache_path, cache_key):
+    # key 存在 DataFrame.attrs 里，随 Parquet 元数据一起写入 (不改动返回给调用方的 merged)
+    out = merged.copy(deep=False)
+    out.attrs = {'cache_key': cache_key}
+    try:
+        out.to_parquet(cache_path, engine='pyarrow', compression='zstd')
+    except Exception as e:
+        # 缓存只是加速手段 (例如未安装 pyarrow)，失败时不影响结果
+        print(f" 警告: 写入缓存 {cache_path} 失败: {e}")
+
+
+# 表头里可能带空格或引号 (例如 ' "Close"')，统一映射成内部列名
+_COLUMN_NAMES = {'Index': 'Date', 'Date': 'Date', 'Close': 'close'}
+
+def _header_columns(f):
+    """ 只读表头，返回 {原始列名: 'Date' / 'close'}，只包含实际要用的两列。 """
+    # 用标准库的 csv 读第一行 (拆分规则和 pandas 一样)，省掉一次 read_csv(nrows=0) 的解析器开销
+    with open(f, newline='', encoding='utf-8-sig') as fh:
+        header = next(csv.reader(fh), [])
+    return {c: _COLUMN_NAMES[c.strip().strip('"')] for c in header if c.strip().strip('"') in _COLUMN_NAMES}
+
+def _read_close_arrow(f, columns):
+    """
+    用 pyarrow.csv 只读日期和 Close 两列，按固定类型直接转换 (不经过 pd.read_csv 的包装、
+    类型推断和之后的 rename / to_datetime / dropna)。返回去掉空值后的 (日期, 价格) 两个 ndarray。
+    遇到无法按类型解析的文件 (例如 "1,234" 这种千分位数字) 时返回 None，由调用方退回 pandas。
+    """
+    names = {internal: raw for raw, internal in columns.items()}
+    try:
+        table = pa_csv.read_csv(
+            f,
+            read_options=pa_csv.ReadOptions(use_threads=False), # 文件之间已经在线程池里并行
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[names['Date'], names['close']],
+                column_types={names['Date']: pa.timestamp('ns'), names['close']: pa.float64()},
+            ),
+        )
+    except (pa.ArrowInvalid, KeyError): # KeyError: pyarrow 认出的列名和表头不一致 (ArrowKeyError)
+        return None
+    dates = table.column(0).to_numpy()
+    close = table.column(1).to_numpy() # 空值 -> NaN
+    valid = ~(np.isnat(dates) | np.isnan(close))
+    return dates[valid], close[valid]
+
+def _load_one(f, chunksize=None):
+    """
+    读取 *单个* CSV，返回 (asset_name, DataFrame[Date, asset_name])；失败时返回 None。
+    (由 load_and_merge_data 在线程池中调用)
+    chunksize 不为 None 时分块读取，每块只保留日期和 Close 两列 (大文件时控制峰值内存)。
+    """
+    asset_name = os.path.basename(f).split('.')[0]
+    try:
+        # --- 老师的逻辑 (步骤 1): 不设置 index_col ---
+        # [关键修复] 读取时不指定 parse_dates，日期列可以是 'Index' 或 'Date'
+        # 只读日期和 Close 两列 (其余 OHLV 列从不使用)。
+        # pyarrow 引擎的 usecols 只接受列表，所以先读表头再挑出实际的列名；
+        # 列名的清洗 (去空格/引号、Index -> Date) 也在表头上做一次，不再对每份数据做字符串处理
+        columns = _header_columns(f)
+        usecols = list(columns)
+        if CSV_ENGINE == 'pyarrow' and not chunksize and {'Date', 'close'} <= set(columns.values()):
+            # 常见情况：两列都在，直接用 pyarrow 读成数组，一次构造结果
+            arrays = _read_close_arrow(f, columns)
+            if arrays is not None:
+                dates, close = arrays
+                df = pd.DataFrame({asset_name: close}, index=pd.DatetimeIndex(dates, name='Date'))
+                return asset_name, df[~df.index.duplicated(keep='last')]
+        if chunksize:
+            # pyarrow 引擎不支持 chunksize，分块模式固定用 C 解析器
+            chunks = pd.read_csv(f, engine='c', thousands=',', usecols=usecols, chunksize=chunksize)
+            data = pd.concat(chunks, ignore_index=True)
+        elif CSV_ENGINE == 'pyarrow':
+            # pyarrow 引擎不支持 thousands=','，带千分位的列会读成字符串，下面再处理
+            data = pd.read_csv(f, engine='pyarrow', usecols=usecols)
+        else:
+            data = pd.read_csv(
+                f, 
+                engine='c',
+                usecols=usecols,
+                thousands=','  # <-- [!! 关键修正 1 !!] 告诉 pandas "1,234" 是数字
+            )
+        
+        # --- 你的清洗逻辑 (Zac) ---
+        data.rename(columns=columns, inplace=True)  # <-- 老师的逻辑 (Close -> close, Index -> Date)
+
+        if 'Date' not in data.columns:
+            print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
+            return None
+        data['Date'] = pd.to_datetime(data['Date']).astype('datetime64[ns]')
+        
+        if 'close' not in data.columns:
+            print(f" 警告: {asset_name}.csv 缺少 'close' 列，已跳过。")
+            return None
+
+        # --- [!! 关键修正 2 !!] ---
+        # 解析器没能读成数字时 (pyarrow 遇到 "1,234"，或有脏数据) 才强制转换：
+        # 先去掉千分位逗号，无法解析的值变成 NaN
+        if not pd.api.types.is_numeric_dtype(data['close']):
+            data['close'] = pd.to_numeric(
+                data['close'].astype(str).str.replace(',', '', regex=False), errors='coerce'
+            )
+        data.dropna(subset=['Date', 'close'], inplace=True) 
+
+        # --- 老师的逻辑 (步骤 2): 只剩 'Date' 和 'close' 列 ---
+        # 直接以 Date 为索引，方便后面一次性 concat (重复日期只保留最后一条)
+        df = data.rename(columns={'close': asset_name}).set_index('Date')
+        return asset_name, df[~df.index.duplicated(keep='last')]
+    
+    except Exception as e:
+        print(f" 警告: 加载 {f} 出错: {e}")
+        return None
+
 
 # --- 1. API 函数 (给 Notebook 调用) ---
 
-def load_and_merge_data(data_directory="./DATA/PART1/"):
+def list_csv_files(data_directory):
     """
-    加载所有 CSVs，合并，并返回一个 'merged' DataFrame。
+    数据目录下所有 .csv 文件的路径 (按文件名排序，和 glob('*.csv') 选出的文件一样，不含隐藏文件)。
+    用 os.scandir 一次列出目录，目录不存在时返回空列表。
+    """
+    try:
+        with os.scandir(data_directory) as entries:
+            return sorted(
+                e.path for e in entries
+                if e.name.endswith('.csv') and not e.name.startswith('.') and e.is_file()
+            )
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+def load_and_merge_data(data_directory="./DATA/PART1/", use_cache=True, ffill=False, chunksize=None,
+                        dtype=np.float32):
+    """
+    加载所有 CSVs，合并，并返回一个 'merged' DataFrame (Date 索引，每个资产一列 Close)。
     [最终修复版: 结合了老师的 'merge-on-column' 逻辑 和 我们的 Bug 修复]
+    这是所有绘图脚本共用的唯一加载器。
+    use_cache=True 时优先读取数据目录下的 Parquet 缓存 (见 CACHE_FILENAME / FFILL_CACHE_FILENAME)；
+    同一个 Python 进程里 (例如 Notebook 里依次跑几个分析) 参数相同且 CSV 没变时，
+    直接返回内存里已经加载过的结果 (的副本)，连 Parquet 也不再读。
+    use_cache=False 时跳过所有缓存，重新解析 CSV。
+    ffill=True 时向前填充缺失值 (防止计算指标时因假期错位产生 NaN)。
+    chunksize 用于超大 CSV：按块流式读取，只保留 Date/Close 两列。
+    价格默认存成 float32 (见上面的 "数据精度约定")，需要 float64 时传 dtype=np.float64。
     """
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
+    files = tuple(list_csv_files(data_directory))
     
     if not files:
         print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
         return pd.DataFrame() 
 
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # --- 老师的逻辑 (步骤 1): 不设置 index_col ---
-            data = pd.read_csv(
-                f, 
-                parse_dates=['Index'],
-                thousands=','  # <-- [!! 关键修正 1 !!] 告诉 pandas "1,234" 是数字
-            )
-            
-            # --- 你的清洗逻辑 (Zac) ---
-            data.columns = data.columns.str.strip().str.strip('"')
-            data.rename(columns={
-                'Open': 'open', 'High': 'high', 'Low': 'low',
-                'Close': 'close', 'Volume': 'volume',
-                'Index': 'Date' # <-- 老师的逻辑
-            }, inplace=True)
-            
-            if 'close' in data.columns:
-                
-                # --- [!! 关键修正 2 !!] ---
-                # 强制转换为数字 (作为双重保险)
-                data['close'] = pd.to_numeric(data['close'], errors='coerce')
-                data.dropna(subset=['close'], inplace=True) 
-
-                # --- 老师的逻辑 (步骤 2): 保留 'Date' 列和 'close' 列 ---
-                df = data[['Date', 'close']].rename(columns={'close': asset_name})
-                dfs[asset_name] = df
-            else:
-                 print(f" 警告: {asset_name}.csv 缺少 'close' 列，已跳过。")
-        
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
+    if not use_cache:
+        return _load_merged(data_directory, files, None, False, ffill, chunksize, np.dtype(dtype))
+    # cache_key 也是内存缓存的一部分：任何 CSV 变了都会重新加载
+    merged = _load_memoized(os.path.abspath(data_directory), files, _cache_key(files), True, ffill, chunksize,
+                            np.dtype(dtype))
+    # 返回副本，调用方修改结果不会影响缓存里的那一份
+    return merged.copy()
+
+def _load_merged(data_directory, files, cache_key, use_cache, ffill, chunksize, dtype):
+    # Parquet 缓存总是存 float64 (key 里记下存储精度)，读出来再转成这次要求的 dtype：
+    # 先有 float32 的加载写了缓存，之后要 float64 时也不会拿到被 float32 舍入过的价格
+    cache_path = os.path.join(data_directory, FFILL_CACHE_FILENAME if ffill else CACHE_FILENAME)
+    stored_key = f"{cache_key}-float64"
+    merged = _read_cache(cache_path, stored_key) if use_cache else None
+    if merged is None:
+        if ffill:
+            # 先拿未填充的版本 (可能命中原始缓存)，ffill 一次后单独缓存，
+            # 之后每个脚本再用 ffill=True 加载时都直接读这个缓存
+            load = _load_memoized if use_cache else _load_merged
+            merged = load(data_directory, files, cache_key, use_cache, False, chunksize, np.dtype(np.float64)).ffill()
+        else:
+            merged = _load_and_concat(files, chunksize).astype(np.float64)
+        if use_cache and not merged.empty:
+            _write_cache(merged, cache_path, stored_key)
+    return merged.astype(dtype)
+
+# 进程内的内存缓存 (按 数据目录 + CSV 状态 + 参数)，几个数据集 x ffill 与否足够
+_load_memoized = lru_cache(maxsize=8)(_load_merged)
+
+def _load_and_concat(files, chunksize=None):
+    # 每个 CSV 的读取 + 解析互不依赖，用线程池并行 (pandas 的 C 解析器会释放 GIL)
+    with ThreadPoolExecutor(max_workers=min(32, len(files))) as ex:
+        results = list(ex.map(partial(_load_one, chunksize=chunksize), files))
+    dfs = {asset_name: df for asset_name, df in filter(None, results)}
 
     if not dfs:
         print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
         return pd.DataFrame()
 
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    
-    # --- 老师的逻辑 (步骤 3): 在 'Date' *列* 上合并 ---
-    for df_to_join in df_list[1:]:
-        # 我们使用 'outer' join 来防止数据丢失
-        merged = merged.merge(df_to_join, on='Date', how='outer') 
-    
-    # --- 老师的逻辑 (步骤 4): *最后* 才设置索引 ---
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
+    # --- 老师的逻辑 (步骤 3+4): 按 Date 对齐合并 ---
+    # 每个 df 都以 Date 为索引，一次 concat(axis=1) 做 outer 对齐，
+    # 取代 N-1 次逐个 merge(how='outer')。sort=True 让 concat 在合并索引时就排好序
+    # (也是 pandas 以后不再默认排序时需要显式写明的)，不用再 sort_index() 拷贝一遍整张表
+    merged = pd.concat(dfs.values(), axis=1, join='outer', sort=True)
+    merged.index.name = 'Date'
     return merged
 
-def calculate_log_returns(merged_df): 
-    return np.log(merged_df / merged_df.shift(1)).dropna()
+# --- 单个资产的完整 CSV (K 线 / 成交量 / 波动率脚本用) ---
+
+def prefetch(func, items, max_workers=4):
+    """
+    按顺序逐个产出 (item, future)，其中 func(item) 已经提交到后台线程。
+    逐个资产 "读取 -> 计算 -> 画图" 的脚本用它：处理当前文件时，后面文件的读取和解析已经在进行
+    (磁盘 I/O 和 pyarrow/C 解析器都会释放 GIL)。func 抛出的异常在调用 future.result() 时抛出。
+    最多提前提交 max_workers 个：已读好但还没处理的结果不会堆满内存。
+    调用方中途 break 或出错时，还没开始的读取直接取消，只等正在运行的那几个。
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        window = deque((item, ex.submit(func, item)) for item in islice(items, max_workers))
+        try:
+            while window:
+                item, future = window.popleft()
+                # 交出当前这个之前先补上一个，保持后台始终有 max_workers 个在读
+                window.extend((nxt, ex.submit(func, nxt)) for nxt in islice(items, 1))
+                yield item, future
+        finally:
+            for _, pending in window:
+                pending.cancel()
+
+def _cached_parquet_path(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), ASSET_CACHE_DIR, f"{name}.parquet")
+
+# 标准表头的列类型；其他列 (或带空格的列名) 仍由 pyarrow 自动推断
+_ASSET_FLOAT_COLUMNS = ('Open', 'High', 'Low', 'Close')
+
+def _read_asset_csv_arrow(csv_path):
+    """
+    用 pyarrow 的多线程 C++ 解析器读整个 CSV，日期和价格列按固定类型直接转换，不做类型推断。
+    遇到带千分位逗号的数字 ("1,234"，pyarrow 不支持) 等无法按类型解析的文件时返回 None，
+    由调用方退回 pd.read_csv(thousands=',')。
+    """
+    column_types = {col: pa.float64() for col in _ASSET_FLOAT_COLUMNS}
+    column_types.update({'Index': pa.timestamp('ns'), 'Date': pa.timestamp('ns')})
+    try:
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=1 << 20),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types),
+        )
+    except pa.ArrowInvalid:
+        return None
+    return table.to_pandas(self_destruct=True)
+
+def read_asset_csv(csv_path, use_cache=True):
+    """
+    读取 *单个* 资产 CSV 的全部列，返回 DataFrame (未设索引，列名和 CSV 一致)。
+    已经做好的通用清洗: "1,234" 读成数字，列名去掉空格/引号，'Index' / 'Date' 列解析成日期。
+    各 OHLCV 加载器在这个结果上再做各自的改名和 dropna。
+    use_cache=True 时结果缓存成 .cache/<资产>.parquet；CSV 没变 (文件名/修改时间/大小) 时
+    直接读 Parquet，不再解析文本。
+    """
+    cache_path = _cached_parquet_path(csv_path)
+    cache_key = _cache_key([csv_path]) if use_cache else None
+    data = _read_cache(cache_path, cache_key) if use_cache else None
+    if data is not None:
+        return data
+
+    data = _read_asset_csv_arrow(csv_path) if CSV_ENGINE == 'pyarrow' else None
+    if data is None:
+        data = pd.read_csv(csv_path, thousands=',')
+    data.columns = data.columns.str.strip().str.strip('"')
+    for date_col in ('Index', 'Date'):
+        if date_col in data.columns:
+            data[date_col] = pd.to_datetime(data[date_col]).astype('datetime64[ns]')
+    if use_cache:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        _write_cache(data, cache_path, cache_key)
+    return data
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _log_returns_kernel(prices_t):
+        """
+        一次遍历同时写出对数收益率和它的绝对值。
+        prices_t 每行一个资产 (转置后的价格表)，内层循环读写的都是连续内存。
+        不用 parallel=True：这是受内存带宽限制的简单循环，多线程没有收益；
+        而且 numba 的线程池一旦在父进程里启动，之后 fork 出来的进程池会在退出时卡住。
+        """
+        n_cols, n_rows = prices_t.shape
+        out = np.empty((n_cols, n_rows - 1), dtype=prices_t.dtype)
+        abs_out = np.empty_like(out)
+        for j in range(n_cols):
+            prev = np.log(prices_t[j, 0])
+            for i in range(1, n_rows):
+                cur = np.log(prices_t[j, i])
+                d = cur - prev
+                out[j, i - 1] = d
+                abs_out[j, i - 1] = abs(d)
+                prev = cur
+        return out, abs_out
+
+def compute_log_prices(merged_df):
+    """
+    整张价格表的对数价格 (一次 np.log，float32 价格保持 float32)。
+    需要对数价格的脚本 (例如 Hurst 图) 直接用它，不必各自再取一次 log。
+    """
+    return pd.DataFrame(np.log(merged_df.to_numpy()), index=merged_df.index, columns=merged_df.columns)
+
+def forward_returns(price_series, periods):
+    """
+    未来 periods 天的简单收益 p[t+periods] / p[t] - 1 (即 pct_change(periods).shift(-periods))，
+    最后 periods 天没有未来价格，为 NaN。直接在 ndarray 上相除，不生成 shift 的中间 Series。
+    """
+    prices = price_series.to_numpy(dtype=np.float64)
+    out = np.full(len(prices), np.nan)
+    if len(prices) > periods:
+        out[:-periods] = prices[periods:] / prices[:-periods] - 1.0
+    return pd.Series(out, index=price_series.index, name=price_series.name)
+
+def calculate_log_returns(merged_df, with_abs=False): 
+    """
+    计算对数收益率。
+    with_abs=True 时额外返回绝对对数收益率 (ACF 2x2 图表的波动率代理)，
+    即返回 (log_returns, absolute_log_returns)。
+    """
+    prices = merged_df.to_numpy()
+    # float32 的价格 (load_and_merge_data 的默认输出) 保持 float32，其他一律按 float64 计算
+    if prices.dtype != np.float32:
+        prices = prices.astype(np.float64)
+    # 全程按 (资产, 日期) 的布局计算：这就是 pandas 内部存单一 dtype 表的方式，
+    # 所以转置不拷贝，结果转置回去交给 DataFrame 时也不拷贝
+    prices_t = np.ascontiguousarray(prices.T)
+    if HAS_NUMBA and prices_t.shape[1] > 1:
+        diffs, abs_diffs = _log_returns_kernel(prices_t)
+    else:
+        # log(p_t / p_{t-1}) = log(p_t) - log(p_{t-1})：只对原始数组做一次 log 和一次差分，
+        # 不再生成 shift(1) 和相除的中间 DataFrame
+        diffs = np.diff(np.log(prices_t), axis=1)
+        abs_diffs = None
+
+    # 和原来的 .dropna() 一致：去掉任何资产含 NaN 的行 (ffill 后通常一行都不用去掉，也就不用再拷贝)
+    valid = ~np.isnan(diffs).any(axis=0)
+    if not valid.all():
+        diffs = diffs[:, valid]
+        abs_diffs = abs_diffs[:, valid] if abs_diffs is not None else None
+    index = merged_df.index[1:][valid]
+    log_returns = pd.DataFrame(diffs.T, index=index, columns=merged_df.columns, copy=False)
+    if not with_abs:
+        return log_returns
+    if abs_diffs is None:
+        return log_returns, log_returns.abs()
+    return log_returns, pd.DataFrame(abs_diffs.T, index=index, columns=merged_df.columns, copy=False)
+
+def load_log_returns(data_directory="./DATA/PART1/", with_abs=False, ffill=True, use_cache=True,
+                     dtype=np.float32):
+    """
+    load_and_merge_data + calculate_log_returns (ACF / 相关性等脚本都是这两步)。
+    use_cache=True 时对数收益率也缓存成 Parquet (见 LOG_RETURNS_CACHE_FILENAME)，
+    CSV 和参数都没变时直接读取，不再合并价格、计算收益率。
+    with_abs=True 时返回 (log_returns, absolute_log_returns)。
+    """
+    files = list_csv_files(data_directory)
+    cache_path = os.path.join(data_directory, LOG_RETURNS_CACHE_FILENAME)
+    cache_key = f"{_cache_key(files)}-ffill={ffill}-{np.dtype(dtype).name}" if use_cache and files else None
+    log_returns = _read_cache(cache_path, cache_key) if cache_key else None
+
+    if log_returns is None:
+        merged = load_and_merge_data(data_directory, use_cache=use_cache, ffill=ffill, dtype=dtype)
+        if merged.empty:
+            log_returns = pd.DataFrame()
+        else:
+            log_returns = calculate_log_returns(merged)
+            if cache_key:
+                _write_cache(log_returns, cache_path, cache_key)
+    if with_abs:
+        return log_returns, log_returns.abs()
+    return log_returns
+
+def _minmax(merged_df):
+    """ 逐列 Min–Max 归一化到 0–1：min/max 各算一次，再用 NumPy 广播一次算完。 """
+    vals = merged_df.to_numpy(dtype=np.float64)
+    # nanmin/nanmax 和 DataFrame.min()/max() 一样跳过 NaN (未 ffill 时有假期空缺)
+    mn = np.nanmin(vals, axis=0)
+    mx = np.nanmax(vals, axis=0)
+    return pd.DataFrame((vals - mn) / (mx - mn), index=merged_df.index, columns=merged_df.columns)
 
 def plot_normalized_prices(merged_df):
     """ (这个函数保持不变) """
-    merged_minmax = (merged_df - merged_df.min()) / (merged_df.max() - merged_df.min())
+    merged_minmax = _minmax(merged_df)
     merged_minmax.plot(figsize=(12,6), title="Min–Max Normalised Prices (0–1 Scale)")
     plt.xlabel("Date")
     plt.ylabel("Scaled Price (0–1)")
@@ -85,7 +448,7 @@ def plot_normalized_prices(merged_df):
 
 def save_normalized_prices_plot(merged_df, save_path):
     """ (这个函数保持不变) """
-    merged_minmax = (merged_df - merged_df.min()) / (merged_df.max() - merged_df.min())
+    merged_minmax = _minmax(merged_df)
     fig, ax = plt.subplots(figsize=(12, 6)) 
     merged_minmax.plot(ax=ax, title="Min–Max Normalised Prices (0–1 Scale)")
     ax.set_xlabel("Date")
@@ -100,7 +463,15 @@ def save_normalized_prices_plot(merged_df, save_path):
 
 # --- 2. 本地运行块 (Standalone Runner) ---
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     import sys
+    # numba 的磁盘缓存 (cache=True) 里记录的是 'EDA.data_loader' 模块；直接运行本文件时
+    # 项目根目录不在 sys.path 里，读到 Notebook/其他脚本留下的缓存会报 "No module named 'EDA'"
+    PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    if PROJ_ROOT not in sys.path:
+        sys.path.insert(0, PROJ_ROOT)
     dataset_name = "PART1"
     if len(sys.argv) > 1:
         dataset_name = sys.argv[1]
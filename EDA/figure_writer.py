@@ -0,0 +1,86 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.image as mpimg
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# --- 后台保存 PNG ---
+# savefig 的大部分时间花在 PNG (zlib) 编码上，而编码只需要画好的像素。
+# 主线程把 Figure 渲染成 RGBA 数组 (很快)，编码和写文件交给后台线程，
+# 这样下一个资产的计算/绘图可以和上一张图的编码重叠 (PIL 编码时会释放 GIL)。
+# 像素先拷贝出来，所以主线程可以马上 fig.clear() 复用同一个 Figure。
+# 排队等编码的图最多 max_pending 张 (每张是一整份 RGBA 像素，几 MB)，
+# 排满时主线程先等最早的一张写完，内存占用不会随图片数量增长。
+
+class AsyncFigureWriter:
+    """
+    用法:
+        with AsyncFigureWriter() as writer:
+            for ...:
+                ... 画图 ...
+                writer.save(fig, path, bbox_inches='tight')
+    退出 with 时等待所有图片写完，写入失败的打印警告。
+    """
+
+    def __init__(self, max_workers=2, dpi=100, max_pending=None):
+        self.dpi = dpi
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_pending = max_pending or 2 * max_workers
+        self._pending = deque()
+
+    def save(self, fig, path, bbox_inches=None):
+        """
+        在主线程渲染 fig，在后台线程编码并写入 path (PNG)。
+        bbox_inches='tight' 时输出范围和 savefig(bbox_inches='tight') 完全一样。
+        """
+        if bbox_inches == 'tight':
+            # 让 savefig 按 tight 范围渲染成原始 RGBA 字节 (不做 PNG 编码)：
+            # 超出画布的部分 (例如 y>1 的 suptitle) 也会画出来，和直接 savefig 的像素一致
+            buf = io.BytesIO()
+            fig.savefig(buf, format='rgba', dpi=self.dpi, bbox_inches='tight')
+            renderer = fig.canvas.renderer # 刚才那次渲染用的 renderer，尺寸就是输出尺寸
+            rgba = np.frombuffer(buf.getvalue(), dtype=np.uint8).reshape(renderer.height, renderer.width, 4)
+        else:
+            fig.set_dpi(self.dpi)
+            fig.canvas.draw()
+            # 拷贝一份像素，之后 Figure 可以马上被清空重画
+            rgba = np.asarray(fig.canvas.buffer_rgba()).copy()
+        while len(self._pending) >= self._max_pending:
+            self._wait_oldest()
+        self._pending.append((path, self._pool.submit(_write_png, path, rgba, self.dpi)))
+
+    def _wait_oldest(self):
+        path, future = self._pending.popleft()
+        try:
+            future.result()
+        except Exception as e:
+            print(f" 警告: 保存图片 {path} 失败: {e}")
+
+    def close(self):
+        while self._pending:
+            self._wait_oldest()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def new_figure(figsize):
+    """
+    不经过 pyplot 创建的 Figure (带 Agg canvas)，给批量保存的脚本在所有资产之间复用。
+    它不进 pyplot 的全局注册表 (Gcf)，不需要 plt.close，没有引用之后就会被回收，
+    也不会被别处的 plt.gcf() / plt.show() 拿到。
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _write_png(path, rgba, dpi):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    mpimg.imsave(path, rgba, format='png', dpi=dpi)
@@ -1,153 +1,49 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.collections import LineCollection
 import os
 import sys
-import glob 
+from functools import lru_cache
+from statistics import NormalDist
 
-# --- 优化点 1: 导入 'acf', 'pacf' 和 'adfuller' (来自队友) ---
-from statsmodels.tsa.stattools import acf, pacf, adfuller
+# --- 优化点 1: 'adfuller' (来自队友) 只在独立运行的 ADF 检验里用到 ---
+# statsmodels 冷启动导入要 1 秒多，所以放到 _process_one_asset 里再导入：
+# Notebook 只画图时不用付这个代价，进程池里也只有真正处理资产的 worker 才导入。
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory):
-    # 1. 查找所有 CSV 文件
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # [关键修复] 读取时不指定 parse_dates，避免因找不到列名报错
-            data = pd.read_csv(f, thousands=',')
-            
-            # 清理列名（去除空格或引号）
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            # [关键修复] 动态处理日期列：支持 'Index' 或 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，跳过该文件
-                print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
-                continue
-
-            # 提取 Close 列
-            if 'Close' in data.columns:
-                # 确保是数值类型
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                
-                # 重命名 Close 为资产名称，方便后续合并
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                print(f"  跳过 {asset_name}: 缺少 'Close' 列")
-                continue
-                
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
 
-    # 2. 合并所有数据
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        # 使用 outer join 确保保留所有日期，避免因某个资产缺失某天数据导致整行被删
-        merged = merged.merge(df_to_join, on='Date', how='outer')
-    
-    # 3. 设置索引并排序
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    
-    # 4. 填充缺失值 (Forward Fill) - 这是一个可选但推荐的操作，防止计算指标时因 NaN 报错
-    merged.ffill(inplace=True) 
-    
-    return merged
-
-
-# --- [!! 关键升级 !!] ---
-# (计算函数，使用 V2 的 'absolute' 版本，以支持队友的 2x2 图表)
-def calculate_log_returns(merged_df): 
-    log_returns = np.log(merged_df / merged_df.shift(1)).dropna()
-    absolute_log_returns = log_returns.abs().dropna()
-    # 返回两个值
-    return log_returns, absolute_log_returns
-# -----------------------------------------------------------------
-# (数据加载函数结束)
-# -----------------------------------------------------------------
+from EDA.data_loader import load_log_returns  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
 
 
 # --- 优化点 2: V3 核心 - 手动绘图辅助函数 (来自队友) ---
-def _plot_manual_stem(ax, values, confint, title, nlags, ylim):
-    """
-    (V3 辅助函数)
-    使用 matplotlib.stem 手动绘制 ACF/PACF 图，以控制 Y 轴缩放。
-    """
-    lags_range = np.arange(len(values))
-    # 从 (N, 2) 数组中提取置信区间
-    conf_lower = confint[:, 0] - values # acf/pacf 返回的是 (value, [lower, upper])
-    conf_upper = confint[:, 1] - values # 我们需要的是 (value, [value-lower, upper-value])
-    # 修正：statsmodels acf 返回 (acf, confint), confint 已经是 [lower, upper]
-    conf_lower = confint[:, 0]
-    conf_upper = confint[:, 1]
-
-    (markerline, stemlines, baseline) = ax.stem(
-        lags_range, values, linefmt='-', markerfmt='o', basefmt=' '
-    )
-    plt.setp(markerline, 'color', 'C0')
-    plt.setp(stemlines, 'color', 'C0')
-
-    # 绘制置信区间（蓝色阴影区域）
-    ax.fill_between(lags_range, conf_lower, conf_upper, alpha=0.2, color='b', label='95% Conf. Int.')
-    
-    # --- 优化点 3: 应用手动缩放 (来自队友) ---
-    ax.set_title(title, fontsize=10)
-    ax.set_ylim(ylim) # !! 关键 !!
-    
-    # --- 优化点 4: 隐藏 Lag 0 (来自队友) ---
-    ax.set_xlim(0.5, nlags + 0.5) 
-    
-    ax.axhline(0, color='k', linestyle='-', linewidth=0.5)
-    ax.grid(True)
-    
-    # 修复：手动绘图时，Lag 0 的置信区间是 NaN，会导致 fill_between 失败
-    # 我们在绘图前处理一下
-    conf_lower[0] = 0
-    conf_upper[0] = 0
-    values[0] = 0 # 我们也把 lag 0 的值设为 0，因为我们不关心它
-    # 重新定义 _plot_manual_stem 以处理这个问题
-
 def _plot_manual_stem_v2(ax, values, confint, title, nlags, ylim):
     """
     (V3 辅助函数 - 已修复)
     手动绘制 ACF/PACF 图，并正确处理 Lag 0。
     """
     lags_range = np.arange(len(values))
-    conf_lower = confint[:, 0]
-    conf_upper = confint[:, 1]
+    # 复制一份：confint 可能来自 _acf_pacf_cached 的缓存，不能原地修改
+    conf_lower = confint[:, 0].copy()
+    conf_upper = confint[:, 1].copy()
 
     # [修复] Lag 0 的置信区间是 [nan, nan]，我们手动设为 [0, 0]
     conf_lower[0] = 0
     conf_upper[0] = 0
     
-    (markerline, stemlines, baseline) = ax.stem(
-        lags_range, values, linefmt='-', markerfmt='o', basefmt=' '
-    )
-    plt.setp(markerline, 'color', 'C0')
-    plt.setp(stemlines, 'color', 'C0')
+    # 所有竖线合成一个 LineCollection，圆点合成一次 scatter (比 ax.stem 少很多 artist，保存更快)
+    segments = np.stack([
+        np.stack([lags_range, np.zeros_like(values)], axis=1),
+        np.stack([lags_range, values], axis=1),
+    ], axis=1)
+    ax.add_collection(LineCollection(segments, colors='C0'))
+    ax.scatter(lags_range, values, s=20, color='C0', zorder=3)
 
     ax.fill_between(lags_range, conf_lower, conf_upper, alpha=0.2, color='b', label='95% Conf. Int.')
     
@@ -157,6 +53,96 @@ def _plot_manual_stem_v2(ax, values, confint, title, nlags, ylim):
     ax.axhline(0, color='k', linestyle='-', linewidth=0.5)
     ax.grid(True)
 
+# --- ACF/PACF 结果缓存 ---
+# Notebook 里经常对同一资产先 plot_ 再 save_，statsmodels 的 acf/pacf 不必重算。
+# lru_cache 的键必须可哈希，所以用序列的原始字节 (float64) 作键。
+# ACF / PACF 直接用 NumPy 算 (结果和 statsmodels 的 acf(fft=True) / pacf(method='ywm') 一致)：
+# 自协方差只用一次 FFT 求出 (O(N log N))，PACF 再在这 nlags+1 个数上做 Levinson-Durbin 递推，
+# 不像 pacf_yw 那样对每个滞后阶数都重新算一遍自协方差、解一次 Yule-Walker。
+def _autocovariance(values, nlags):
+    """ 去均值后的有偏自协方差 (除以 N)，滞后 0..nlags。 """
+    x = values - values.mean()
+    n = len(x)
+    # 补零到 2N，避免循环卷积的首尾混叠
+    spectrum = np.fft.rfft(x, n=2 * n)
+    return np.fft.irfft(spectrum * np.conj(spectrum), n=2 * n)[:nlags + 1] / n
+
+def _levinson_durbin_pacf(acov, nlags):
+    """ Levinson-Durbin 递推：第 k 步的最后一个 AR 系数就是滞后 k 的偏自相关。 """
+    pacf_vals = np.empty(nlags + 1)
+    pacf_vals[0] = 1.0
+    phi = np.zeros(nlags + 1)
+    sigma = acov[0]
+    for k in range(1, nlags + 1):
+        phi_kk = (acov[k] - phi[1:k] @ acov[k - 1:0:-1]) / sigma
+        phi[1:k] = phi[1:k] - phi_kk * phi[k - 1:0:-1]
+        phi[k] = phi_kk
+        sigma *= 1.0 - phi_kk * phi_kk
+        pacf_vals[k] = phi_kk
+    return pacf_vals
+
+@lru_cache(maxsize=64)
+def _acf_pacf_cached(series_bytes, nlags, alpha):
+    values = np.frombuffer(series_bytes)
+    n = len(values)
+    z = NormalDist().inv_cdf(1.0 - alpha / 2.0)
+
+    acov = _autocovariance(values, nlags)
+    acf_vals = acov / acov[0]
+    # Bartlett 公式的置信区间 (滞后 0 的区间宽度为 0)
+    var_acf = np.full(nlags + 1, 1.0 / n)
+    var_acf[0] = 0.0
+    var_acf[2:] *= 1.0 + 2.0 * np.cumsum(acf_vals[1:-1] ** 2)
+    acf_half = z * np.sqrt(var_acf)
+    acf_conf = np.column_stack([acf_vals - acf_half, acf_vals + acf_half])
+
+    pacf_vals = _levinson_durbin_pacf(acov, nlags)
+    pacf_half = z / np.sqrt(n)
+    pacf_conf = np.column_stack([pacf_vals - pacf_half, pacf_vals + pacf_half])
+    pacf_conf[0] = pacf_vals[0]
+    return acf_vals, acf_conf, pacf_vals, pacf_conf
+
+def _acf_pacf(series, nlags, alpha):
+    series_bytes = np.ascontiguousarray(series.to_numpy(dtype=np.float64)).tobytes()
+    return _acf_pacf_cached(series_bytes, nlags, alpha)
+
+def _render_acf_pacf(axes, log_returns_series, absolute_log_returns_series, nlags, ylim):
+    """
+    在 2x2 的 axes 上画四宫格 (plot_ 和 save_ 共用)。
+    """
+    alpha = 0.05 # 95% 置信区间
+
+    # --- 上排: ACF / PACF (Log Returns) ---
+    acf_vals, acf_conf, pacf_vals, pacf_conf = _acf_pacf(log_returns_series, nlags, alpha)
+    _plot_manual_stem_v2(axes[0, 0], acf_vals, acf_conf, 'ACF (Log Returns)', nlags, ylim)
+    _plot_manual_stem_v2(axes[0, 1], pacf_vals, pacf_conf, 'PACF (Log Returns)', nlags, ylim)
+
+    # --- 下排: ACF / PACF (Absolute Log Returns) ---
+    abs_acf_vals, abs_acf_conf, abs_pacf_vals, abs_pacf_conf = _acf_pacf(absolute_log_returns_series, nlags, alpha)
+    _plot_manual_stem_v2(axes[1, 0], abs_acf_vals, abs_acf_conf, 'ACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
+    _plot_manual_stem_v2(axes[1, 1], abs_pacf_vals, abs_pacf_conf, 'PACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
+
+_SUBPLOT_PARAMS = ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+
+def _build_acf_pacf_figure(log_returns_series, absolute_log_returns_series, asset_name, lags, ylim, fig=None):
+    """ fig 不为 None 时清空并复用这个 Figure (批量保存时不必每个资产都新建一个)。 """
+    if fig is None:
+        fig, axes = plt.subplots(2, 2, figsize=(16, 10))
+    elif len(fig.axes) == 4:
+        # 上一个资产画过的 2x2：只清空各个 Axes 的内容，不重建 Axes
+        axes = np.array(fig.axes).reshape(2, 2)
+        for ax in fig.axes:
+            ax.clear()
+        # 恢复默认边距，tight_layout 从和新建 Figure 相同的起点算，输出尺寸才一致
+        fig.subplots_adjust(**{k: plt.rcParams[f'figure.subplot.{k}'] for k in _SUBPLOT_PARAMS})
+    else:
+        fig.clear()
+        axes = fig.subplots(2, 2)
+    fig.suptitle(f'Autocorrelation Analysis (Zoomed) - {asset_name}', fontsize=16, y=1.02)
+    _render_acf_pacf(axes, log_returns_series, absolute_log_returns_series, lags, ylim)
+    fig.tight_layout()
+    return fig
+
 # --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
 def plot_acf_pacf_plot_v3(
     log_returns_series, 
@@ -169,29 +155,11 @@ def plot_acf_pacf_plot_v3(
     (新增的 V3 API - 供 Notebook 调用)
     “显示” 2x2 四宫格图。
     """
-    # [我们从 'save_acf_pacf_plot_v3' 复制所有绘图代码]
     if log_returns_series.empty or absolute_log_returns_series.empty:
         print(f" 警告: {asset_name} 数据为空，跳过绘图。")
         return
 
-    fig, axes = plt.subplots(2, 2, figsize=(16, 10))
-    fig.suptitle(f'Autocorrelation Analysis (Zoomed) - {asset_name}', fontsize=16, y=1.02)
-    alpha = 0.05 
-    nlags = lags 
-
-    acf_vals, acf_conf = acf(log_returns_series, nlags=nlags, alpha=alpha, fft=False)
-    _plot_manual_stem_v2(axes[0, 0], acf_vals, acf_conf, 'ACF (Log Returns)', nlags, ylim)
-    
-    pacf_vals, pacf_conf = pacf(log_returns_series, nlags=nlags, alpha=alpha, method='ywm')
-    _plot_manual_stem_v2(axes[0, 1], pacf_vals, pacf_conf, 'PACF (Log Returns)', nlags, ylim)
-    
-    abs_acf_vals, abs_acf_conf = acf(absolute_log_returns_series, nlags=nlags, alpha=alpha, fft=False)
-    _plot_manual_stem_v2(axes[1, 0], abs_acf_vals, abs_acf_conf, 'ACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
-
-    abs_pacf_vals, abs_pacf_conf = pacf(absolute_log_returns_series, nlags=nlags, alpha=alpha, method='ywm')
-    _plot_manual_stem_v2(axes[1, 1], abs_pacf_vals, abs_pacf_conf, 'PACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
-
-    plt.tight_layout()
+    _build_acf_pacf_figure(log_returns_series, absolute_log_returns_series, asset_name, lags, ylim)
     
     # --- [!! 核心区别: "显示" !!] ---
     plt.show()
@@ -202,48 +170,88 @@ def save_acf_pacf_plot_v3(
     asset_name, 
     lags=40, 
     save_path="",
-    ylim=(-0.3, 0.3) 
+    ylim=(-0.3, 0.3),
+    fig=None,
+    writer=None
 ):
     """
     (已优化 V3 - A+++ 级别)
     手动绘制 2x2 四宫格图，并应用 Y 轴缩放。
+    传入 fig 时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    传入 writer (AsyncFigureWriter) 时 PNG 在后台线程编码写入。
     """
     if log_returns_series.empty or absolute_log_returns_series.empty:
         print(f" 警告: {asset_name} 数据为空，跳过保存。")
         return
 
-    fig, axes = plt.subplots(2, 2, figsize=(16, 10))
-    fig.suptitle(f'Autocorrelation Analysis (Zoomed) - {asset_name}', fontsize=16, y=1.02)
+    owns_fig = fig is None
+    fig = _build_acf_pacf_figure(log_returns_series, absolute_log_returns_series, asset_name, lags, ylim, fig=fig)
     
-    alpha = 0.05 # 95% 置信区间
-    nlags = lags 
+    if writer is not None:
+        writer.save(fig, save_path, bbox_inches='tight')
+    else:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        fig.savefig(save_path, bbox_inches='tight')
+    print(f"  2x2 (Zoomed) V3 图表已保存到: {save_path}")
+    if owns_fig:
+        plt.close(fig)
 
-    # --- 1. 上-左: ACF (Log Returns) ---
-    acf_vals, acf_conf = acf(log_returns_series, nlags=nlags, alpha=alpha, fft=False) # 使用 fft=False
-    _plot_manual_stem_v2(axes[0, 0], acf_vals, acf_conf, 'ACF (Log Returns)', nlags, ylim)
-    
-    # --- 2. 上-右: PACF (Log Returns) ---
-    pacf_vals, pacf_conf = pacf(log_returns_series, nlags=nlags, alpha=alpha, method='ywm')
-    _plot_manual_stem_v2(axes[0, 1], pacf_vals, pacf_conf, 'PACF (Log Returns)', nlags, ylim)
-    
-    # --- 3. 下-左: ACF (Absolute Log Returns) ---
-    abs_acf_vals, abs_acf_conf = acf(absolute_log_returns_series, nlags=nlags, alpha=alpha, fft=False)
-    _plot_manual_stem_v2(axes[1, 0], abs_acf_vals, abs_acf_conf, 'ACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
 
-    # --- 4. 下-右: PACF (Absolute Log Returns) ---
-    abs_pacf_vals, abs_pacf_conf = pacf(absolute_log_returns_series, nlags=nlags, alpha=alpha, method='ywm')
-    _plot_manual_stem_v2(axes[1, 1], abs_pacf_vals, abs_pacf_conf, 'PACF (Absolute Log Returns) - Volatility Proxy', nlags, ylim)
+# --- 4. 本地运行块 (Standalone Runner) ---
+# 进程池里每个 worker 进程自己的 2x2 Figure (由 _init_worker 创建)，同一进程处理的资产共用
+_worker_fig = None
 
-    plt.tight_layout()
-    
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path, bbox_inches='tight')
-    print(f"  2x2 (Zoomed) V3 图表已保存到: {save_path}")
-    plt.close(fig)
+def _init_worker():
+    global _worker_fig
+    import matplotlib
+    matplotlib.use('Agg', force=True) # 子进程同样只用 Agg 后端
+    _worker_fig = new_figure(figsize=(16, 10))
 
+def _process_one_asset(asset_name, asset_log_returns, asset_abs_log_returns, save_dir, lags, ylim, fig=None,
+                       writer=None):
+    """
+    单个资产的 ADF 检验 + 2x2 图表保存。
+    各资产互不依赖，独立运行时分给多个进程并行 (statsmodels 和 Agg 渲染都占着 GIL)。
+    fig 为 None 时用本进程的 _worker_fig (不在进程池里时就每次新建)。
+    """
+    if fig is None:
+        fig = _worker_fig
+    print(f"  正在处理: {asset_name}")
+    
+    if asset_log_returns.empty:
+        print("    [跳过] 收益率数据为空。")
+        return
+    
+    # --- [!! 队友的 ADF 检验 !!] ---
+    # 这是非常有价值的论据
+    from statsmodels.tsa.stattools import adfuller
+    adf_test_result = adfuller(asset_log_returns)
+    print(f"    ADF Test (Log Returns) p-value: {adf_test_result[1]:.6f}")
+    if adf_test_result[1] < 0.05:
+        print("    >> 论据发现: 数据是平稳的 (p < 0.05)，支持均值回归。")
+    else:
+        print("    >> 论据发现: 数据是非平稳的 (p > 0.05)，支持动量。")
+    # --- [ADF 结束] ---
+    
+    save_file_path = os.path.join(save_dir, f"{asset_name}_acf_pacf_V3_zoomed.png")
+    
+    save_acf_pacf_plot_v3(
+        asset_log_returns, 
+        asset_abs_log_returns, 
+        asset_name, 
+        lags=lags, 
+        save_path=save_file_path,
+        ylim=ylim,
+        fig=fig,
+        writer=writer
+    )
 
-# --- 4. 本地运行块 (Standalone Runner) ---
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
     
     dataset_name = "PART1"
     if len(sys.argv) > 1:
@@ -258,48 +266,34 @@ if __name__ == "__main__":
     ZOOMED_YLIM = (-0.3, 0.3) 
     
     print(f"正在从 '{DATA_PATH}' 加载数据...")
-    merged_prices = load_and_merge_data(DATA_PATH) 
+    # 加载 + 合并 + 对数收益率 (带 Parquet 缓存，和相关性脚本共用同一份)
+    log_returns, absolute_log_returns = load_log_returns(DATA_PATH, with_abs=True, ffill=True)
     
-    if merged_prices.empty:
+    if log_returns.empty:
         print(f"未能加载数据，请检查 DATA_PATH: {os.path.abspath(DATA_PATH)}")
     else:
-        # --- [!! 关键升级 !!] ---
-        # 调用我们升级版的 calculate_log_returns
-        log_returns, absolute_log_returns = calculate_log_returns(merged_prices)
-        # --- [升级结束] ---
-        
         print("✅ 数据加载、合并、计算收益率完毕。")
         print(f"正在为所有资产生成 V3 缩放图表并保存到 '{SAVE_DIR}'...")
         
-        for asset_name in log_returns.columns:
-            print(f"  正在处理: {asset_name}")
-            
-            asset_log_returns = log_returns[asset_name].dropna()
-            asset_abs_log_returns = absolute_log_returns[asset_name].dropna()
-            
-            if asset_log_returns.empty:
-                print("    [跳过] 收益率数据为空。")
-                continue
-            
-            # --- [!! 队友的 ADF 检验 !!] ---
-            # 这是非常有价值的论据
-            adf_test_result = adfuller(asset_log_returns)
-            print(f"    ADF Test (Log Returns) p-value: {adf_test_result[1]:.6f}")
-            if adf_test_result[1] < 0.05:
-                print("    >> 论据发现: 数据是平稳的 (p < 0.05)，支持均值回归。")
-            else:
-                print("    >> 论据发现: 数据是非平稳的 (p > 0.05)，支持动量。")
-            # --- [ADF 结束] ---
-            
-            save_file_path = os.path.join(SAVE_DIR, f"{asset_name}_acf_pacf_V3_zoomed.png")
-            
-            save_acf_pacf_plot_v3(
-                asset_log_returns, 
-                asset_abs_log_returns, 
-                asset_name, 
-                lags=LAG_PERIODS, 
-                save_path=save_file_path,
-                ylim=ZOOMED_YLIM
-            )
-            
-        print("--- 本地运行完毕 ---")
\ No newline at end of file
+        # calculate_log_returns 已经去掉了含 NaN 的行，这里不必再逐列 dropna
+        jobs = [
+            (asset_name, log_returns[asset_name], absolute_log_returns[asset_name],
+             SAVE_DIR, LAG_PERIODS, ZOOMED_YLIM)
+            for asset_name in log_returns.columns
+        ]
+        n_workers = min(os.cpu_count() or 1, len(jobs))
+        if n_workers > 1:
+            # 每个 worker 进程建一个 Figure，之后处理的资产都在上面重画。
+            # 用 spawn 启动子进程：父进程里已经启动的线程池 (numba / BLAS 等) 被 fork 复制后，
+            # 进程池在解释器退出时会卡住；worker 的状态全由 _init_worker 重新建立，不依赖继承
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                     mp_context=multiprocessing.get_context('spawn')) as ex:
+                list(ex.map(_process_one_asset, *zip(*jobs)))
+        else:
+            # 单核时顺序处理，所有资产共用一个 2x2 Figure，每次 clear 后重画；
+            # PNG 编码交给后台线程，和下一个资产的 ADF 检验/画图重叠
+            fig = new_figure(figsize=(16, 10))
+            with AsyncFigureWriter() as writer:
+                for job in jobs:
+                    _process_one_asset(*job, fig=fig, writer=writer)
+        print("--- 本地运行完毕 ---")
@@ -2,7 +2,13 @@ import pandas as pd
 import mplfinance as mpf
 import sys
 import os
-import glob 
+
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import read_asset_csv, list_csv_files  # noqa: E402
 
 # -----------------------------------------------------------------
 # (数据加载函数 - 保持和 'plot_volatility.py' 一致)
@@ -14,14 +20,9 @@ def load_single_asset_ohlcv(csv_file_path):
     [这是我们最健壮的 OHLCV 加载器]
     """
     try:
-        data = pd.read_csv(
-            csv_file_path, 
-            parse_dates=['Index'], 
-            index_col=None, # [我们的修复]
-            thousands=','   # [我们的修复]
-        )
+        # 读取 + 千分位 + 列名清洗 + 日期解析 (带 Parquet 缓存，见 EDA/data_loader.py)
+        data = read_asset_csv(csv_file_path)
         
-        data.columns = data.columns.str.strip().str.strip('"')
         data.rename(columns={
             'Open': 'open', 'High': 'high', 'Low': 'low',
             'Close': 'close', 'Volume': 'volume',
@@ -167,7 +168,35 @@ def save_candlestick_plot_v4(ohlcv_df, asset_name, base_save_dir, zoom_days=150)
 
 
 # --- 3. 本地运行块 (Standalone Runner) [V4] ---
+def _process_one_file(csv_file_path, base_save_dir, zoom_days):
+    """
+    单个 CSV 的完整流程 (读取 -> 重采样 -> 画图 -> 保存)。
+    各文件互不依赖，独立运行时分给多个进程并行 (mplfinance 画图全程占着 GIL，线程帮不上忙)。
+    """
+    asset_name = os.path.basename(csv_file_path).split('.')[0]
+    print(f"  正在处理: {asset_name}")
+    
+    # 1. 使用我们健壮的 OHLCV 加载器
+    full_df = load_single_asset_ohlcv(csv_file_path)
+    
+    if full_df is not None:
+        # 2. 调用我们新的“保存”函数
+        save_candlestick_plot_v4(
+            full_df, 
+            asset_name, 
+            base_save_dir=base_save_dir, 
+            zoom_days=zoom_days
+        )
+    else:
+        print(f"  [跳过] {asset_name} 因加载失败而被跳过。")
+
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
     
     dataset_name = "PART1"
     if len(sys.argv) > 1:
@@ -180,7 +209,7 @@ if __name__ == "__main__":
     ZOOM_DAYS = 150 
 
     print(f"正在从 '{DATA_PATH}' 加载数据...")
-    csv_files = glob.glob(os.path.join(DATA_PATH, '*.csv'))
+    csv_files = list_csv_files(DATA_PATH)
     
     if not csv_files:
         print(f"错误：在 '{DATA_PATH}' 文件夹里没有找到任何 .csv 文件。")
@@ -188,22 +217,15 @@ if __name__ == "__main__":
         
     print(f"找到了 {len(csv_files)} 个 CSV 文件。开始批量处理 (周线 + 日线)...")
 
-    for csv_file_path in csv_files:
-        asset_name = os.path.basename(csv_file_path).split('.')[0]
-        print(f"  正在处理: {asset_name}")
-        
-        # 1. 使用我们健壮的 OHLCV 加载器
-        full_df = load_single_asset_ohlcv(csv_file_path)
-        
-        if full_df is not None:
-            # 2. 调用我们新的“保存”函数
-            save_candlestick_plot_v4(
-                full_df, 
-                asset_name, 
-                base_save_dir=SAVE_DIR_BASE, 
-                zoom_days=ZOOM_DAYS
-            )
-        else:
-            print(f"  [跳过] {asset_name} 因加载失败而被跳过。")
+    process_one = partial(_process_one_file, base_save_dir=SAVE_DIR_BASE, zoom_days=ZOOM_DAYS)
+    n_workers = min(os.cpu_count() or 1, len(csv_files))
+    if n_workers > 1:
+        # 子进程同样只用 Agg 后端；用 spawn 启动 (不 fork 父进程里可能已启动的线程池，见 plot_acf_charts)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=matplotlib.use, initargs=('Agg',),
+                                 mp_context=multiprocessing.get_context('spawn')) as ex:
+            list(ex.map(process_one, csv_files))
+    else:
+        for csv_file_path in csv_files:
+            process_one(csv_file_path)
             
     print("--- 优化版 K 线图 (V4) 批量生成和保存完毕 ---")
\ No newline at end of file
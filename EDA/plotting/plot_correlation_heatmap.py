@@ -1,94 +1,101 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns # 导入
 import os
 import sys
-import glob 
+from functools import lru_cache
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这和 'plot_acf_charts.py' 里的代码一模一样)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory):
-    # 1. 查找所有 CSV 文件
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # [关键修复] 读取时不指定 parse_dates，避免因找不到列名报错
-            data = pd.read_csv(f, thousands=',')
-            
-            # 清理列名（去除空格或引号）
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            # [关键修复] 动态处理日期列：支持 'Index' 或 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，跳过该文件
-                print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
-                continue
-
-            # 提取 Close 列
-            if 'Close' in data.columns:
-                # 确保是数值类型
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                
-                # 重命名 Close 为资产名称，方便后续合并
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                print(f"  跳过 {asset_name}: 缺少 'Close' 列")
-                continue
-                
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    # 2. 合并所有数据
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        # 使用 outer join 确保保留所有日期，避免因某个资产缺失某天数据导致整行被删
-        merged = merged.merge(df_to_join, on='Date', how='outer')
-    
-    # 3. 设置索引并排序
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    
-    # 4. 填充缺失值 (Forward Fill) - 这是一个可选但推荐的操作，防止计算指标时因 NaN 报错
-    merged.ffill(inplace=True) 
-    
-    return merged
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
 
+from EDA.data_loader import load_log_returns  # noqa: E402
 
-# --- [!! 关键一致性 !!] ---
-# (我们使用和 'acf' 脚本 *完全一样* 的计算函数)
-def calculate_log_returns(merged_df): 
-    log_returns = np.log(merged_df / merged_df.shift(1)).dropna()
-    absolute_log_returns = log_returns.abs().dropna()
-    # 即使这个脚本用不到 'absolute_log_returns'，
-    # 我们也保持函数一致性，返回两个值
-    return log_returns, absolute_log_returns
-# -----------------------------------------------------------------
-# (数据加载函数结束)
-# -----------------------------------------------------------------
+# 资产数超过这个值就不在格子里写数字：N² 个文字对象会拖慢 savefig，而且字也挤得看不清
+ANNOT_MAX_ASSETS = 12
 
 
+def _correlation_matrix(log_returns_df):
+    """
+    Pearson 相关性矩阵。calculate_log_returns 的结果已经没有 NaN，
+    这时直接在 ndarray 上用 np.corrcoef (一次矩阵乘法)；
+    有 NaN 时用 _pairwise_corrcoef，结果和 pandas 的 .corr() (逐对取共同有效日期) 一致。
+    """
+    vals = np.ascontiguousarray(log_returns_df.to_numpy(dtype=np.float64))
+    C = _correlation_cached(vals.tobytes(), vals.shape)
+    return pd.DataFrame(C, index=log_returns_df.columns, columns=log_returns_df.columns, copy=True)
+
+# Notebook 里经常对同一份收益率反复 plot_/save_，相关性矩阵不必重算。
+# 和 ACF 脚本一样，lru_cache 的键用数据的原始字节 (数据变了键就变)；返回只读数组，调用方每次包一个新 DataFrame。
+@lru_cache(maxsize=8)
+def _correlation_cached(vals_bytes, shape):
+    vals = np.frombuffer(vals_bytes).reshape(shape)
+    if np.isnan(vals).any():
+        C = _pairwise_corrcoef(vals)
+    else:
+        C = np.corrcoef(vals, rowvar=False)
+    C.setflags(write=False)
+    return C
+
+def _pairwise_corrcoef(vals):
+    """
+    带 NaN 的 Pearson 相关性 (pairwise complete)：每一对资产只用两者都有值的日期。
+    所有资产对的计数、和、平方和、交叉积都由几次矩阵乘法一起算出，不用 pandas 的逐对循环。
+    """
+    mask = ~np.isnan(vals)
+    # 先按列去均值 (数值更稳定，不影响相关系数)，缺失值置 0，不参与任何求和
+    x = np.where(mask, vals - np.nanmean(vals, axis=0), 0.0)
+    m = mask.astype(np.float64)
+
+    n = m.T @ m                  # n[i, j]: i 和 j 的共同有效天数
+    sum_x = x.T @ m              # sum_x[i, j]: 在 i、j 共同有效的日期上 x_i 的和
+    sum_xx = (x * x).T @ m
+    sum_xy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x * sum_x / n
+        C = cov / np.sqrt(var_x * var_x.T)
+    # 和 pandas 一样：共同样本少于 2 个或方差为 0 时为 NaN；浮点误差不让 |r| 超过 1
+    C[n < 2] = np.nan
+    return np.clip(C, -1.0, 1.0)
+
+def _off_diagonal_stats(C):
+    """
+    返回非对角线相关系数的 (mean, max, min)；少于两个资产时返回 None。
+    只取一次上三角 (不含对角线) 视图：矩阵对称，不用复制整个矩阵再把对角线填成 NaN。
+    """
+    off_diag = C[np.triu_indices_from(C, k=1)]
+    if off_diag.size == 0:
+        return None
+    return np.nanmean(off_diag), np.nanmax(off_diag), np.nanmin(off_diag)
+
+def _draw_heatmap(ax, correlation_matrix, annot):
+    """
+    相关性热力图：pcolormesh (coolwarm，颜色条固定 -1 到 1，黑色格线)，每个资产一个刻度。
+    annot=True 时在每个有值的格子中央写两位小数 (字号 8，统一用黑色)。
+    """
+    C = np.ma.masked_invalid(correlation_matrix.to_numpy())
+    n_rows, n_cols = C.shape
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    mesh = ax.pcolormesh(C, cmap='coolwarm', vmin=-1, vmax=1, linewidths=.5, edgecolor='black')
+    ax.set(xlim=(0, n_cols), ylim=(0, n_rows))
+    ax.invert_yaxis()
+    ax.figure.colorbar(mesh, ax=ax).outline.set_linewidth(0)
+
+    ax.set_xticks(np.arange(n_cols) + .5, labels=correlation_matrix.columns)
+    ax.set_yticks(np.arange(n_rows) + .5, labels=correlation_matrix.index)
+
+    if annot:
+        for i, j in zip(*np.nonzero(~np.ma.getmaskarray(C))):
+            ax.text(j + .5, i + .5, f"{C[i, j]:.2f}", color='black', ha='center', va='center', size=8)
+    return mesh
+
 # --- 1. API 函数 (给 Notebook 调用) ---
 # (这是队友的优化版绘图函数 - 我们保留它)
 def plot_correlation_heatmap(log_returns_df):
@@ -96,20 +103,12 @@ def plot_correlation_heatmap(log_returns_df):
         print(f" 警告: 收益率数据为空，跳过绘图。")
         return
 
-    correlation_matrix = log_returns_df.corr()
+    correlation_matrix = _correlation_matrix(log_returns_df)
     
     # 优化: 增加图表尺寸 (来自队友)
-    plt.figure(figsize=(12, 10)) 
-    sns.heatmap(
-        correlation_matrix, 
-        annot=True,       
-        cmap='coolwarm',  
-        fmt=".2f",        
-        linewidths=.5,
-        linecolor='black',
-        annot_kws={"size": 8}, # 优化: 减小注解字体大小 (来自队友)
-        vmin=-1, vmax=1 # 确保颜色条是 -1 到 1
-    )
+    fig, ax = plt.subplots(figsize=(12, 10))
+    # 颜色条固定 -1 到 1，注解字号 8 (来自队友)
+    _draw_heatmap(ax, correlation_matrix, annot=len(correlation_matrix) <= ANNOT_MAX_ASSETS)
     plt.title('Cross-Asset Log Returns Correlation Heatmap (Optimized)')
     plt.show()
 
@@ -119,37 +118,26 @@ def save_correlation_heatmap(log_returns_df, save_path=""):
         print(f" 警告: 收益率数据为空，跳过保存。")
         return
         
-    correlation_matrix = log_returns_df.corr()
+    correlation_matrix = _correlation_matrix(log_returns_df)
     
     # --- 优化点: 打印核心统计数据 (来自队友) ---
     # (这对于报告论据非常宝贵)
-    corr_for_stats = correlation_matrix.copy() # 复制一个用于计算
-    np.fill_diagonal(corr_for_stats.values, np.nan) 
-    mean_corr = corr_for_stats.stack().mean()
-    max_corr = corr_for_stats.stack().max()
-    min_corr = corr_for_stats.stack().min()
+    stats = _off_diagonal_stats(correlation_matrix.to_numpy())
     
     print("\n--- 报告核心统计数据 ---")
-    print(f" 平均相关性 (Mean Correlation): {mean_corr:.4f}")
-    print(f" 最大正相关性 (Max Positive Correlation): {max_corr:.4f}")
-    print(f" 最小负相关性 (Min Negative Correlation): {min_corr:.4f}")
+    if stats is None:
+        print(" 只有一个资产，没有资产间相关性可统计。")
+    else:
+        mean_corr, max_corr, min_corr = stats
+        print(f" 平均相关性 (Mean Correlation): {mean_corr:.4f}")
+        print(f" 最大正相关性 (Max Positive Correlation): {max_corr:.4f}")
+        print(f" 最小负相关性 (Min Negative Correlation): {min_corr:.4f}")
     print("\n--- 完整相关性矩阵 (用于复制) ---")
     print(correlation_matrix.to_string(float_format="%.4f")) # 打印更整齐
     
     # 优化: 增加图表尺寸 (来自队友)
     fig, ax = plt.subplots(figsize=(12, 10))
-    
-    sns.heatmap(
-        correlation_matrix, 
-        annot=True, 
-        cmap='coolwarm', 
-        fmt=".2f", 
-        linewidths=.5,
-        linecolor='black',
-        annot_kws={"size": 8}, # 优化: 减小注解字体大小 (来自队友)
-        vmin=-1, vmax=1,
-        ax=ax 
-    )
+    _draw_heatmap(ax, correlation_matrix, annot=len(correlation_matrix) <= ANNOT_MAX_ASSETS)
     ax.set_title('Cross-Asset Log Returns Correlation Heatmap (Optimized)')
     
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
@@ -160,6 +148,9 @@ def save_correlation_heatmap(log_returns_df, save_path=""):
     
 # --- 3. 本地运行块 (Standalone Runner) ---
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     
     dataset_name = "PART1"
     if len(sys.argv) > 1:
@@ -171,17 +162,12 @@ if __name__ == "__main__":
     SAVE_FILE = f"./EDA/output/{dataset_name}/charts/correlation_heatmap.png" 
     
     print(f"正在从 '{DATA_PATH}' 加载数据...")
-    merged_prices = load_and_merge_data(DATA_PATH) 
+    # 加载 + 合并 + 对数收益率 (带 Parquet 缓存，和 ACF 脚本共用同一份)
+    log_returns = load_log_returns(DATA_PATH, ffill=True)
     
-    if merged_prices.empty:
+    if log_returns.empty:
         print(f"未能加载数据，请检查 DATA_PATH: {os.path.abspath(DATA_PATH)}")
     else:
-        # --- [!! 关键一致性 !!] ---
-        # 我们必须调用返回 *两个* 值的版本
-        # 我们用 '_' 来忽略我们不需要的 'absolute_log_returns'
-        log_returns, _ = calculate_log_returns(merged_prices) 
-        # --- [修正结束] ---
-        
         print("✅ 数据加载、合并、计算收益率完毕。")
         print(f"正在生成[优化版]相关性热力图并保存到 '{SAVE_FILE}'...")
         
@@ -1,8 +1,11 @@
-import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 import os
-import glob
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 import sys # 确保导入 sys
 
 # --- [!! 关键依赖 !!] ---
@@ -28,63 +31,15 @@ DATA_DIR_PATH = "./DATA/PART1/"
 # ---
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这是 'Close-Only' 版本，GARCH 只需要 Close 价格)
-# -----------------------------------------------------------------
-def load_and_merge_data(data_directory="./DATA/PART1/"):
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # 1. 读取 CSV，不预设任何日期列名
-            data = pd.read_csv(f, thousands=',')
-            data.columns = data.columns.str.strip().str.strip('"') # 清理列名
-            
-            # 2. 动态识别并统一日期列
-            #    如果原始数据有 'Index' 列，就把它重命名为 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            #    现在，我们确保 'Date' 列存在并将其转换为标准的 datetime 对象
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，就报错
-                raise ValueError("CSV file must contain either an 'Index' or 'Date' column.")
-
-            # 3. 后续代码现在可以安全地假设 'Date' 和 'Close' 列存在
-            if 'Close' in data.columns:
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                raise ValueError("CSV file must contain a 'Close' column.")
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        merged = merged.merge(df_to_join, on='Date', how='outer') # [我们的修复]
-    
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    # [优化] 向前填充 NaN
-    merged.ffill(inplace=True) 
-    return merged
-# -----------------------------------------------------------------
-# (数据加载函数结束)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import load_and_merge_data  # noqa: E402
+
 # --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
 def plot_garch_analysis(price_series, asset_name):
     """
@@ -93,7 +48,8 @@ def plot_garch_analysis(price_series, asset_name):
     """
     # [我们从 'analyze_and_plot_garch' 复制所有代码]
     print(f"  Analyzing GARCH for {asset_name}...")
-    returns = 100 * np.log(price_series / price_series.shift(1)).dropna()
+    price_series = price_series.astype(np.float64) # arch 的 MLE 用 float64 更稳定 (加载器默认给 float32)
+    returns = 100 * np.log(price_series).diff().dropna()
     if returns.empty:
         print(f"  Skipping {asset_name}: Not enough data to calculate returns.")
         return
@@ -124,15 +80,20 @@ def plot_garch_analysis(price_series, asset_name):
     plt.show()
 
 # --- (队友的核心分析函数 - 100% 保留) ---
-def analyze_and_plot_garch(price_series, asset_name, save_dir):
+def analyze_and_plot_garch(price_series, asset_name, save_dir, returns=None):
     """
     对 *单个资产* 的价格序列进行 GARCH 分析并绘图。
+    已经算好 100 * 对数收益率时可以直接传 returns (此时忽略 price_series)。
     """
     print(f"  Analyzing GARCH for {asset_name}...")
 
     # 1. 准备数据：GARCH 模型使用收益率，而不是价格
     # (使用 100 * 对数收益率，这是金融计量的标准做法)
-    returns = 100 * np.log(price_series / price_series.shift(1)).dropna()
+    if returns is None:
+        # arch 的 MLE 用 float64 更稳定 (加载器默认给 float32)
+        price_series = price_series.astype(np.float64)
+        # log(p_t) - log(p_{t-1})：一次 log + 一次差分，和 main() 里整表的算法一致
+        returns = 100 * np.log(price_series).diff().dropna()
 
     if returns.empty:
         print(f"  Skipping {asset_name}: Not enough data to calculate returns.")
@@ -177,6 +138,22 @@ def analyze_and_plot_garch(price_series, asset_name, save_dir):
     print(f"  Chart saved to {output_path}")
     plt.close(fig) # 关闭图表
 
+def _init_worker():
+    # 子进程只保存图片，不需要 GUI 后端 (Windows 下子进程是重新 import 的，不会继承父进程的设置)
+    matplotlib.use('Agg')
+
+def _fit_and_save(task):
+    """
+    进程池的任务函数 (必须是模块级函数才能被 pickle)。
+    这个资产的全部输出 (包括多行的 results.summary()) 先写进字符串，返回 (asset_name, report)，
+    由主进程按资产顺序打印，多个 worker 的摘要不会在 stdout 上交错。
+    """
+    returns, asset_name, save_dir = task
+    report = io.StringIO()
+    with redirect_stdout(report):
+        analyze_and_plot_garch(None, asset_name, save_dir, returns=returns)
+    return asset_name, report.getvalue()
+
 def main():
     """
     主执行函数：加载数据，循环处理每个资产。
@@ -193,9 +170,9 @@ def main():
     os.makedirs(local_save_dir, exist_ok=True)
     print(f"Charts & summaries will be saved to: {local_save_dir}")
 
-    print(f"Calling internal load_and_merge_data(data_directory='{local_data_dir}')...")
+    print(f"Calling shared load_and_merge_data(data_directory='{local_data_dir}')...")
     
-    merged_prices_df = load_and_merge_data(local_data_dir)
+    merged_prices_df = load_and_merge_data(local_data_dir, ffill=True)
 
     if merged_prices_df.empty:
         print("Error: Loader returned an empty DataFrame.")
@@ -203,19 +180,38 @@ def main():
 
     print(f"✅ Loader success. Loaded merged DataFrame with {len(merged_prices_df.columns)} assets.")
 
-    # 3. 循环遍历 *合并后 DataFrame 的每一列*
+    # 3. 遍历 *合并后 DataFrame 的每一列*
+    # 每个资产的 GARCH 拟合 (MLE 迭代) 互相独立且纯 CPU，所以交给进程池并行
+    # 对数收益率对整张表一次算好 (float64，arch 的 MLE 更稳定)，每个资产只做切片，
+    # 不再逐列 dropna 复制价格再各自做 shift/除法/log
+    returns_df = 100 * np.log(merged_prices_df.astype(np.float64)).diff()
+    tasks = []
     for asset_name in merged_prices_df.columns:
-        price_series = merged_prices_df[asset_name].dropna()
-        
-        if isinstance(price_series, pd.Series) and not price_series.empty:
-            analyze_and_plot_garch(price_series, 
-                                   asset_name, 
-                                   local_save_dir)
-        else:
+        first_valid = merged_prices_df[asset_name].first_valid_index()
+        if first_valid is None:
             print(f"Skipping {asset_name}: No valid data.")
+            continue
+
+        # ffill 之后只有开头 (上市前) 是 NaN；从第一个有效价格的下一行开始就是完整的收益率
+        returns = returns_df[asset_name].loc[first_valid:].iloc[1:]
+        if returns.hasnans:
+            returns = returns.dropna()
+        tasks.append((returns, asset_name, local_save_dir))
+
+    if tasks:
+        # 用 spawn 启动子进程：父进程里已经启动的线程池 (numba / BLAS 等) 被 fork 复制后，
+        # 进程池在解释器退出时会卡住；worker 只需要 _init_worker 和任务参数，不依赖继承的状态
+        with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1),
+                                 initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as ex:
+            # ex.map 按任务顺序返回，报告按资产顺序完整打印
+            for asset_name, report in ex.map(_fit_and_save, tasks):
+                print(report, end='')
             
     print("--- GARCH 分析全部完成 ---")
 
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
@@ -2,22 +2,18 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-import glob
 import sys # 确保导入 sys
+import math
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
 
-# --- [!! 关键依赖 !!] ---
-# 这个脚本需要 'hurst' 库。
-# 你必须先在你的 comp396 环境中安装它：
-# pip install hurst
-# -------------------------
+# numba 是可选依赖：装了就用 JIT 内核算滚动 Hurst，没装就用纯 NumPy 的向量化版本
+# (两者都和 'hurst' 库的 compute_Hc 结果一致，所以不再需要安装 'hurst')
 try:
-    from hurst import compute_Hc
+    from numba import njit, prange
+    HAS_NUMBA = True
 except ImportError:
-    print("❌ 致命错误: 'hurst' 库未安装。")
-    print("   请在你的 VS Code 终端中运行:")
-    print("   conda activate comp396")
-    print("   pip install hurst")
-    sys.exit(1)
+    HAS_NUMBA = False
 
 # --- 配置 ---
 # [路径修复] 修正为 Zac 的本地路径
@@ -27,94 +23,194 @@ DEFAULT_WINDOW_SIZE = 252 # 默认滚动窗口 (约 1 年)
 # ---
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这是 'Close-Only' 版本，Hurst 只需要 Close 价格)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory="./DATA/PART1/"):
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # 1. 读取 CSV，不预设任何日期列名
-            data = pd.read_csv(f, thousands=',')
-            data.columns = data.columns.str.strip().str.strip('"') # 清理列名
-            
-            # 2. 动态识别并统一日期列
-            #    如果原始数据有 'Index' 列，就把它重命名为 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            #    现在，我们确保 'Date' 列存在并将其转换为标准的 datetime 对象
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，就报错
-                raise ValueError("CSV file must contain either an 'Index' or 'Date' column.")
-
-            # 3. 后续代码现在可以安全地假设 'Date' 和 'Close' 列存在
-            if 'Close' in data.columns:
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                raise ValueError("CSV file must contain a 'Close' column.")
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        merged = merged.merge(df_to_join, on='Date', how='outer') # [我们的修复]
-    
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    return merged
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import load_and_merge_data, compute_log_prices  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
+
 # -----------------------------------------------------------------
-# (数据加载函数结束)
+# (滚动 Hurst 计算)
 # -----------------------------------------------------------------
-# --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
-def plot_rolling_hurst_v2(price_series, asset_name, window_size):
+@lru_cache(maxsize=None)
+def _hurst_window_sizes(n, min_window=10):
     """
-    (新增的 V2 API - 供 Notebook 调用)
-    计算滚动 Hurst，并“显示”双轴图表。
+    和 hurst.compute_Hc 默认参数完全一样的子窗口长度 (10^0.25 步长，最后加上 n 本身)。
+    只取决于滚动窗口长度，每个窗口长度只算一次 (所有资产、所有滚动位置共用，只读)。
     """
-    if len(price_series) < window_size:
-        print(f"  Skipping {asset_name}: Data length ({len(price_series)}) is shorter than window ({window_size}).")
-        return
+    sizes = [int(10**x) for x in np.arange(math.log10(min_window), math.log10(n - 1), 0.25)]
+    sizes.append(n)
+    sizes = np.array(sizes, dtype=np.int64)
+    sizes.flags.writeable = False
+    return sizes
 
-    print(f"  Calculating Rolling Hurst for {asset_name} (window={window_size})...")
-    
-    try:
-        # 1. 计算滚动 H (来自 'hurst' 库)
-        rolling_h = price_series.rolling(window=window_size).apply(
-            lambda x: compute_Hc(x)[0], 
-            raw=True
-        ).dropna()
-        
-        # 2. 为了对齐，我们也截取价格数据
-        log_price = np.log(price_series).loc[rolling_h.index]
-        
-    except Exception as e:
-        print(f"  Error calculating Hurst for {asset_name}: {e}")
-        return
-    
-    if rolling_h.empty:
-        print(f"  Skipping {asset_name}: Hurst calculation returned empty series.")
-        return
+if HAS_NUMBA:
+    # 不用 cache=True：内核之间互相调用时，numba 的磁盘缓存会记下模块名，
+    # 脚本 (plot_hurst_analysis) 和 Notebook (eda.plotting.plot_hurst_analysis) 的模块名不同，读缓存会失败
+    @njit
+    def _rs_hurst(x, window_sizes):
+        """
+        单个窗口的 Hurst 指数：compute_Hc(x, kind='random_walk', simplified=True) 的 JIT 版本。
+        每个子窗口长度 w 上求 R/S 的均值，再对 log10(w) ~ log10(R/S) 做最小二乘取斜率。
+        x 可以是 float32 (loader 的默认 dtype)，读出来就转成 float64，所有累加都用 float64。
+        """
+        n = len(x)
+        n_w = len(window_sizes)
+        sum_x = 0.0
+        sum_y = 0.0
+        sum_xx = 0.0
+        sum_xy = 0.0
+        for k in range(n_w):
+            w = window_sizes[k]
+            rs_total = 0.0
+            rs_count = 0
+            for start in range(0, n - w + 1, w):
+                # R: 子窗口价格的极差；S: 子窗口增量的样本标准差 (ddof=1)
+                lo = np.float64(x[start])
+                hi = lo
+                inc_mean = (np.float64(x[start + w - 1]) - lo) / (w - 1)
+                ss = 0.0
+                for i in range(start + 1, start + w):
+                    v = np.float64(x[i])
+                    if v < lo:
+                        lo = v
+                    if v > hi:
+                        hi = v
+                    d = (v - np.float64(x[i - 1])) - inc_mean
+                    ss += d * d
+                R = hi - lo
+                S = np.sqrt(ss / (w - 2))
+                if R != 0.0 and S != 0.0: # 和 hurst 库一样，跳过 R/S 无定义的子窗口
+                    rs_total += R / S
+                    rs_count += 1
+            if rs_count == 0:
+                return np.nan
+            lx = np.log10(w)
+            ly = np.log10(rs_total / rs_count)
+            sum_x += lx
+            sum_y += ly
+            sum_xx += lx * lx
+            sum_xy += lx * ly
+        # 最小二乘斜率的闭式解 (np.polyfit 不能在 njit 里用)
+        return (n_w * sum_xy - sum_x * sum_y) / (n_w * sum_xx - sum_x * sum_x)
+
+    @njit(parallel=True)
+    def _rolling_hurst_kernel(arr, window_size, window_sizes):
+        """ 单个资产：各滚动窗口互不依赖，用 prange 按窗口并行。 """
+        out = np.full(len(arr), np.nan)
+        for i in prange(window_size - 1, len(arr)):
+            out[i] = _rs_hurst(arr[i - window_size + 1:i + 1], window_sizes)
+        return out
+
+    @njit(parallel=True)
+    def _rolling_hurst_2d_kernel(packed, lengths, window_size, window_sizes):
+        """
+        多资产版本：packed 的第 a 列前 lengths[a] 行是该资产去掉 NaN 后的价格。
+        资产之间互不依赖，用 prange 按列并行 (线程数由 NUMBA_NUM_THREADS 控制)。
+        """
+        n_rows, n_assets = packed.shape
+        out = np.full((n_rows, n_assets), np.nan)
+        for a in prange(n_assets):
+            col = np.ascontiguousarray(packed[:lengths[a], a])
+            for i in range(window_size - 1, lengths[a]):
+                out[i, a] = _rs_hurst(col[i - window_size + 1:i + 1], window_sizes)
+        return out
+
+def _price_dtype(dtypes):
+    """
+    内核读取价格用的 dtype：全是 float32 (loader 的默认输出) 就保持 float32，
+    省掉一次转换并让内存读写减半 (内核内部仍用 float64 计算)；其他情况用 float64。
+    """
+    return np.float32 if all(d == np.float32 for d in dtypes) else np.float64
+
+def _valid_price_series(merged_prices_df):
+    """ {asset_name: 去掉 NaN 后的价格}；合并表是 outer join，各资产的起止日期不同。 """
+    return {name: merged_prices_df[name].dropna() for name in merged_prices_df.columns}
+
+def rolling_hurst_all(merged_prices_df, window_size, series=None):
+    """
+    对每个资产 (各自 dropna 后) 计算滚动 Hurst，返回 {asset_name: rolling_h}。
+    有 numba 时所有资产在一次并行内核调用里算完。
+    series (_valid_price_series 的结果) 已经有了时直接使用，不再逐列 dropna。
+    """
+    if series is None:
+        series = _valid_price_series(merged_prices_df)
+    if not HAS_NUMBA or window_size < 100:
+        return {name: rolling_hurst(s, window_size) for name, s in series.items()}
+
+    # 把每个资产的有效价格压到同一个二维数组的列首 (各资产长度不同，其余位置补 NaN)
+    lengths = np.array([len(s) for s in series.values()], dtype=np.int64)
+    packed = np.full((len(merged_prices_df), len(series)), np.nan, dtype=_price_dtype(merged_prices_df.dtypes))
+    for a, s in enumerate(series.values()):
+        packed[:lengths[a], a] = s.to_numpy()
+    out = _rolling_hurst_2d_kernel(packed, lengths, window_size, _hurst_window_sizes(window_size))
+    return {
+        name: pd.Series(out[:lengths[a], a], index=s.index).dropna()
+        for a, (name, s) in enumerate(series.items())
+    }
+
+def _rolling_hurst_numpy(arr, window_size, window_sizes):
+    """
+    _rolling_hurst_kernel 的纯 NumPy 版本 (没有 numba 时使用)，没有逐窗口的 Python 循环：
+    每个子窗口长度 w 上，先用 sliding_window_view 一次算出 *所有* 起点的 R/S，
+    第 i 个滚动窗口用到的就是起点 i, i+w, i+2w, ... 的那几段，取平均后批量做最小二乘。
+    """
+    n = len(arr)
+    out = np.full(n, np.nan)
+    n_windows = n - window_size + 1
+    if n_windows <= 0:
+        return out
+
+    incs = np.diff(arr)
+    log_w = np.log10(window_sizes.astype(np.float64))
+    log_rs = np.empty((n_windows, len(window_sizes)))
+    for k, w in enumerate(window_sizes):
+        segs = sliding_window_view(arr, w)                   # (n-w+1, w)
+        R = (segs.max(axis=1) - segs.min(axis=1)).astype(np.float64)
+        S = sliding_window_view(incs, w - 1).std(axis=1, ddof=1, dtype=np.float64)
+        valid = (R != 0) & (S != 0)                          # 和 hurst 库一样，跳过 R/S 无定义的段
+        rs = np.where(valid, R / np.where(S == 0, 1.0, S), 0.0)
+
+        starts = np.arange(n_windows)[:, None] + w * np.arange(window_size // w)
+        count = valid[starts].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_rs[:, k] = np.log10(rs[starts].sum(axis=1) / count)
+
+    # 批量最小二乘斜率 (每行一个滚动窗口)
+    n_w = len(window_sizes)
+    sum_x = log_w.sum()
+    sum_xx = (log_w * log_w).sum()
+    slope = (n_w * (log_rs * log_w).sum(axis=1) - sum_x * log_rs.sum(axis=1)) / (n_w * sum_xx - sum_x * sum_x)
+    out[window_size - 1:] = slope
+    return out
+
+def rolling_hurst(price_series, window_size):
+    """
+    滚动 Hurst 指数 (去掉前 window_size-1 个 NaN)。
+    有 numba 时用 JIT 内核，否则用 sliding_window_view 的向量化版本。
+    """
+    if window_size < 100:
+        # 和 compute_Hc 保持一致
+        raise ValueError("Series length must be greater or equal to 100")
+    arr = price_series.to_numpy(dtype=_price_dtype([price_series.dtype]))
+    if np.isnan(arr).any():
+        raise ValueError("Series contains NaNs")
+    kernel = _rolling_hurst_kernel if HAS_NUMBA else _rolling_hurst_numpy
+    out = kernel(arr, window_size, _hurst_window_sizes(window_size))
+    return pd.Series(out, index=price_series.index).dropna()
+
+def _build_hurst_figure(log_price, rolling_h, asset_name, window_size, fig=None):
+    """ fig 不为 None 时清空并复用这个 Figure (批量保存时不必每个资产都新建一个)。 """
+    if fig is None:
+        fig, ax1 = plt.subplots(figsize=(15, 7))
+    else:
+        fig.clear()
+        ax1 = fig.subplots()
 
-    # --- 可视化 (V2 双轴) ---
-    fig, ax1 = plt.subplots(figsize=(15, 7))
-    
     # Y1 轴 (左): 绘制 Log(Price)
     color1 = 'tab:blue'
     ax1.plot(log_price.index, log_price, color=color1, label='Log(Price) (Left Axis)', alpha=0.6)
@@ -138,16 +234,52 @@ def plot_rolling_hurst_v2(price_series, asset_name, window_size):
     
     fig.suptitle(f'Rolling Hurst Exponent vs. Log(Price) for {asset_name}', fontsize=16)
     fig.legend(loc='upper left', bbox_to_anchor=(0.1, 0.9)) # 整合两个图例
+    return fig
+
+# --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
+def plot_rolling_hurst_v2(price_series, asset_name, window_size):
+    """
+    (新增的 V2 API - 供 Notebook 调用)
+    计算滚动 Hurst，并“显示”双轴图表。
+    """
+    if len(price_series) < window_size:
+        print(f"  Skipping {asset_name}: Data length ({len(price_series)}) is shorter than window ({window_size}).")
+        return
+
+    print(f"  Calculating Rolling Hurst for {asset_name} (window={window_size})...")
+    
+    try:
+        # 1. 计算滚动 H (与 'hurst' 库的 compute_Hc 结果一致)
+        rolling_h = rolling_hurst(price_series, window_size)
+        
+        # 2. 为了对齐，我们也截取价格数据
+        log_price = np.log(price_series).loc[rolling_h.index]
+        
+    except Exception as e:
+        print(f"  Error calculating Hurst for {asset_name}: {e}")
+        return
+    
+    if rolling_h.empty:
+        print(f"  Skipping {asset_name}: Hurst calculation returned empty series.")
+        return
+
+    # --- 可视化 (V2 双轴) ---
+    _build_hurst_figure(log_price, rolling_h, asset_name, window_size)
     
     # --- [!! 核心区别: "显示" !!] ---
     plt.show()
 
 # --- [!! 优化 V2: 双轴图表 !!] ---
 
-def save_rolling_hurst_v2(price_series, asset_name, window_size, save_dir):
+def save_rolling_hurst_v2(price_series, asset_name, window_size, save_dir, rolling_h=None, log_price=None, fig=None,
+                          writer=None):
     """
     (已优化 V2)
     计算滚动 Hurst，并绘制“价格 vs Hurst”的双轴图表。
+    rolling_h 已经算好时 (例如 rolling_hurst_all 的结果) 直接使用，不再重算；
+    log_price (整列的对数价格) 同理。
+    传入 fig 时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    传入 writer (AsyncFigureWriter) 时 PNG 在后台线程编码写入。
     """
     if len(price_series) < window_size:
         print(f"  Skipping {asset_name}: Data length ({len(price_series)}) is shorter than window ({window_size}).")
@@ -157,13 +289,13 @@ def save_rolling_hurst_v2(price_series, asset_name, window_size, save_dir):
     
     try:
         # 1. 计算滚动 H
-        rolling_h = price_series.rolling(window=window_size).apply(
-            lambda x: compute_Hc(x)[0], 
-            raw=True
-        ).dropna()
+        if rolling_h is None:
+            rolling_h = rolling_hurst(price_series, window_size)
         
         # 2. 为了对齐，我们也截取价格数据
-        log_price = np.log(price_series).loc[rolling_h.index]
+        if log_price is None:
+            log_price = np.log(price_series)
+        log_price = log_price.loc[rolling_h.index]
         
     except Exception as e:
         print(f"  Error calculating Hurst for {asset_name}: {e}")
@@ -174,39 +306,20 @@ def save_rolling_hurst_v2(price_series, asset_name, window_size, save_dir):
         return
 
     # --- 可视化 (V2 双轴) ---
-    fig, ax1 = plt.subplots(figsize=(15, 7))
-    
-    # Y1 轴 (左): 绘制 Log(Price)
-    color1 = 'tab:blue'
-    ax1.plot(log_price.index, log_price, color=color1, label='Log(Price) (Left Axis)', alpha=0.6)
-    ax1.set_xlabel('Date')
-    ax1.set_ylabel('Log(Price)', color=color1)
-    ax1.tick_params(axis='y', labelcolor=color1)
-    
-    # Y2 轴 (右): 绘制 Hurst
-    ax2 = ax1.twinx()
-    color2 = 'tab:red'
-    ax2.plot(rolling_h.index, rolling_h, color=color2, label=f'Rolling Hurst (w={window_size}) (Right Axis)')
-    
-    # 绘制关键阈值线
-    ax2.axhline(0.5, color='black', linestyle='--', label='H = 0.5 (Random Walk)')
-    ax2.axhline(0.4, color='green', linestyle=':', label='H < 0.5 (Mean-Reverting)')
-    ax2.axhline(0.6, color='purple', linestyle=':', label='H > 0.5 (Trending)')
-    
-    ax2.set_ylabel('Hurst Value (H)', color=color2)
-    ax2.tick_params(axis='y', labelcolor=color2)
-    ax2.set_ylim(0, 1) # Hurst 必须在 0 和 1 之间
-    
-    fig.suptitle(f'Rolling Hurst Exponent vs. Log(Price) for {asset_name}', fontsize=16)
-    fig.legend(loc='upper left', bbox_to_anchor=(0.1, 0.9)) # 整合两个图例
+    owns_fig = fig is None
+    fig = _build_hurst_figure(log_price, rolling_h, asset_name, window_size, fig=fig)
     
     # --- 保存图表 ---
     os.makedirs(save_dir, exist_ok=True)
     output_filename = f"hurst_v2_dual_axis_{asset_name}_w{window_size}.png"
     output_path = os.path.join(save_dir, output_filename)
-    plt.savefig(output_path, bbox_inches='tight')
+    if writer is not None:
+        writer.save(fig, output_path, bbox_inches='tight')
+    else:
+        fig.savefig(output_path, bbox_inches='tight', dpi=100) # EDA 图不需要更高分辨率，固定下来不受 matplotlibrc 影响
     print(f"  [V2] Dual-Axis chart saved to {output_path}")
-    plt.close(fig)
+    if owns_fig:
+        plt.close(fig)
 
 def main():
     """
@@ -224,7 +337,7 @@ def main():
     os.makedirs(local_save_dir, exist_ok=True)
     print(f"Charts will be saved to: {local_save_dir}")
 
-    print(f"Calling internal load_and_merge_data(data_directory='{local_data_dir}')...")
+    print(f"Calling shared load_and_merge_data(data_directory='{local_data_dir}')...")
     
     merged_prices_df = load_and_merge_data(local_data_dir)
 
@@ -234,21 +347,40 @@ def main():
 
     print(f"✅ Loader success. Loaded merged DataFrame with {len(merged_prices_df.columns)} assets.")
 
-    # 3. 循环遍历 *合并后 DataFrame 的每一列*
-    for asset_name in merged_prices_df.columns:
-        price_series = merged_prices_df[asset_name].dropna()
-        
-        if isinstance(price_series, pd.Series) and not price_series.empty:
-            # [!! 优化 !!] 调用 V2 绘图函数
-            save_rolling_hurst_v2(price_series, 
-                                  asset_name, 
-                                  DEFAULT_WINDOW_SIZE, 
-                                  local_save_dir)
-        else:
-            print(f"Skipping {asset_name}: No valid data.")
+    # 3. 先一次性 (并行) 算出所有资产的滚动 Hurst，再逐列画图
+    # 每列的 dropna 只做一次，计算和画图共用
+    all_series = _valid_price_series(merged_prices_df)
+    try:
+        all_rolling_h = rolling_hurst_all(merged_prices_df, DEFAULT_WINDOW_SIZE, series=all_series)
+    except Exception as e:
+        print(f"  Error calculating Hurst: {e}")
+        all_rolling_h = {}
+    # 对数价格也对整张表只算一次 (画图时按 rolling_h 的日期切片)
+    log_prices_df = compute_log_prices(merged_prices_df)
+
+    # 所有资产共用一个 (不经过 pyplot 的) Figure，每次 clear 后重画；PNG 编码在后台线程进行
+    fig = new_figure(figsize=(15, 7))
+    with AsyncFigureWriter() as writer:
+        for asset_name, price_series in all_series.items():
+            
+            if isinstance(price_series, pd.Series) and not price_series.empty:
+                # [!! 优化 !!] 调用 V2 绘图函数
+                save_rolling_hurst_v2(price_series, 
+                                      asset_name, 
+                                      DEFAULT_WINDOW_SIZE, 
+                                      local_save_dir,
+                                      rolling_h=all_rolling_h.get(asset_name),
+                                      log_price=log_prices_df[asset_name],
+                                      fig=fig,
+                                      writer=writer)
+            else:
+                print(f"Skipping {asset_name}: No valid data.")
             
     print("--- Hurst 分析全部完成 ---")
 
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
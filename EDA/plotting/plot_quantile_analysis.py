@@ -2,7 +2,6 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-import glob
 import sys # 确保导入 sys
 from scipy import stats
 
@@ -14,117 +13,170 @@ N_QUANTILES = 5 # 将资产分为 5 组
 # ---
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这是 'Close-Only' 版本，Quantile 只需要 Close 价格)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory):
-    # 1. 查找所有 CSV 文件
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # [关键修复] 读取时不指定 parse_dates，避免因找不到列名报错
-            data = pd.read_csv(f, thousands=',')
-            
-            # 清理列名（去除空格或引号）
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            # [关键修复] 动态处理日期列：支持 'Index' 或 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，跳过该文件
-                print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
-                continue
-
-            # 提取 Close 列
-            if 'Close' in data.columns:
-                # 确保是数值类型
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                
-                # 重命名 Close 为资产名称，方便后续合并
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                print(f"  跳过 {asset_name}: 缺少 'Close' 列")
-                continue
-                
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    # 2. 合并所有数据
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        # 使用 outer join 确保保留所有日期，避免因某个资产缺失某天数据导致整行被删
-        merged = merged.merge(df_to_join, on='Date', how='outer')
-    
-    # 3. 设置索引并排序
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    
-    # 4. 填充缺失值 (Forward Fill) - 这是一个可选但推荐的操作，防止计算指标时因 NaN 报错
-    merged.ffill(inplace=True) 
-    
-    return merged
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
 
+from EDA.data_loader import load_and_merge_data  # noqa: E402
+
+
+def _row_nanquantiles(x, q):
+    """
+    逐行的 np.nanquantile(x, q, axis=1).T (线性插值)，全 NaN 的行返回 NaN。
+    对整张矩阵排一次序再按位置插值；np.nanquantile 带 axis 时会逐行调用 Python，慢得多。
+    """
+    sorted_x = np.sort(x, axis=1) # NaN 排在每行最后
+    n_valid = (~np.isnan(x)).sum(axis=1)[:, None]
+    pos = q[None, :] * np.maximum(n_valid - 1, 0)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, np.maximum(n_valid - 1, 0))
+    a = np.take_along_axis(sorted_x, lo, axis=1)
+    b = np.take_along_axis(sorted_x, hi, axis=1)
+    w = pos - lo
+    # 和 numpy 内部的 _lerp 同样的写法，保证结果逐位相同
+    out = np.where(w >= 0.5, b - (b - a) * (1 - w), a + (b - a) * w)
+    out[n_valid[:, 0] == 0] = np.nan
+    return out
+
+def _quantile_labels(factor, n_quantiles):
+    """
+    逐行 (每个日期一行) 的分位数标签 1..n_quantiles，int8。
+    结果和 pd.qcut(row, n_quantiles, labels=False, duplicates='drop') + 1 一致，
+    但整张矩阵一次向量化算完，不再对每个日期调用一次 qcut；qcut 给 NaN 的格子记为 0。
+    """
+    edges = _row_nanquantiles(factor, np.linspace(0, 1, n_quantiles + 1))
+    # duplicates='drop'：和前一条边相等的边不算 (重复的边不形成新的分组)。
+    # 把它们设成 NaN，和任何值比较都是 False
+    inner = np.where(edges[:, 1:-1] > edges[:, :-2], edges[:, 1:-1], np.nan)
+    # 逐条内部边累加 "值 > 边"：只有 n_quantiles-1 次 (日期 x 资产) 的比较，
+    # 不生成 (日期 x 资产 x 边) 的三维临时数组，也不用再转换 dtype
+    labels = np.ones(factor.shape, dtype=np.int8)
+    for k in range(inner.shape[1]):
+        labels += factor > inner[:, k, None]
+    # 所有边都相同 (有效值全相等或只有一个) 时 qcut 分不出组
+    valid = ~np.isnan(factor) & (edges[:, -1] > edges[:, 0])[:, None]
+    labels[~valid] = 0
+    return labels
+
+def _forward_return_matrix(merged_prices_df, forward_return_days):
+    """
+    (dates x assets) 的未来收益 P[t+f] / P[t] - 1，即 pct_change(f).shift(-f)。
+    几个因子用同一个持有期时，调用方算一次传给 _factor_matrices (fwd=...) 即可。
+    """
+    P = merged_prices_df.to_numpy(dtype=np.float64)
+    f = forward_return_days
+    fwd = np.full_like(P, np.nan)
+    fwd[:-f] = P[f:] / P[:-f] - 1.0
+    return fwd
+
+def _factor_matrices(merged_prices_df, factor_lookback_days, forward_return_days, fwd=None):
+    """
+    返回 (dates x assets) 的二维数组 (factor, fwd, quantile)。
+    等价于 pct_change(k) / pct_change(f).shift(-f)，再按日期 qcut，但直接在 ndarray 上计算。
+    价格不需要事先 ffill：缺价格的 (日期, 资产) 因子或未来收益为 NaN，在第 3 步一次性排除。
+    fwd (_forward_return_matrix 的结果) 已经算好时直接使用 (只读，不会被修改)。
+    """
+    P = merged_prices_df.to_numpy(dtype=np.float64)
+    k = factor_lookback_days
+
+    # 1. 因子值: P[t] / P[t-k] - 1
+    factor = np.full_like(P, np.nan)
+    factor[k:] = P[k:] / P[:-k] - 1.0
+    # 2. 未来收益: P[t+f] / P[t] - 1
+    if fwd is None:
+        fwd = _forward_return_matrix(merged_prices_df, forward_return_days)
+
+    # 3. 分位数只在两者都有效的资产之间排 (和原来 dropna 之后再 qcut 一致)
+    #    这是唯一的一次有效性筛选：一个联合掩码，之后只用 quantile > 0 判断
+    factor[np.isnan(fwd)] = np.nan
+    quantile = _quantile_labels(factor, N_QUANTILES)
+    return factor, fwd, quantile
+
+def _quantile_moments(fwd, quantile):
+    """
+    每个分位数的样本数、平均未来收益和样本方差 (ddof=1)，下标 0 是无效格子。
+    直接在二维数组上用 bincount 累加，不需要构造 (Date, Asset) 长表。
+    """
+    n_bins = N_QUANTILES + 1
+    valid = quantile > 0
+    labels = quantile[valid]
+    values = fwd[valid]
+    counts = np.bincount(labels, minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(labels, weights=values, minlength=n_bins) / counts
+        # 先减去组均值再平方 (两遍)，比 sumsq/n - mean^2 数值上稳定
+        variances = np.bincount(labels, weights=(values - means[labels]) ** 2, minlength=n_bins) / (counts - 1)
+    return counts, means, variances
+
+def _welch_ttest(counts, means, variances, a, b):
+    """
+    分位数 a 和 b 的 Welch t 检验 (双侧)，与 stats.ttest_ind(qa, qb, equal_var=False) 相同，
+    但只用各组的样本数 / 均值 / 方差，不再切片出两组收益。
+    """
+    va = variances[a] / counts[a]
+    vb = variances[b] / counts[b]
+    t_stat = (means[a] - means[b]) / np.sqrt(va + vb)
+    # Welch–Satterthwaite 自由度
+    dof = (va + vb) ** 2 / (va ** 2 / (counts[a] - 1) + vb ** 2 / (counts[b] - 1))
+    p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    return t_stat, p_value
+
+def _daily_quantile_returns(dates, fwd, quantile):
+    """
+    每个日期、每个分位数的平均未来收益 (Date x Quantile)。
+    等价于 (Date, Asset) 长表上的 groupby(['Date', 'Quantile'])['fwd_return'].mean().unstack()，
+    但用 bincount 直接在二维数组上累加 (sum / count)，不建 MultiIndex 分组。
+    """
+    n_dates = quantile.shape[0]
+    n_bins = N_QUANTILES + 1 # 第 0 列收集无效格子，最后丢掉
+    valid = quantile > 0
+    flat = (np.arange(n_dates)[:, None] * n_bins + quantile)[valid]
+    sums = np.bincount(flat, weights=fwd[valid], minlength=n_dates * n_bins).reshape(n_dates, n_bins)[:, 1:]
+    counts = np.bincount(flat, minlength=n_dates * n_bins).reshape(n_dates, n_bins)[:, 1:]
+
+    # 和 groupby + unstack 一样：只保留出现过的日期和分位数，缺的格子 (count 为 0) 是 NaN
+    rows = counts.any(axis=1)
+    cols = counts.any(axis=0)
+    sums, counts = sums[np.ix_(rows, cols)], counts[np.ix_(rows, cols)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts # 0/0 -> NaN
+    return pd.DataFrame(
+        means,
+        index=dates[rows],
+        columns=pd.Index(np.arange(1, n_bins)[cols], name='Quantile'),
+    )
 
-# -----------------------------------------------------------------
-# (数据加载函数结束)
-# -----------------------------------------------------------------
 # --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
-def plot_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward_return_days, factor_name):
+def plot_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward_return_days, factor_name, fwd=None):
     """
     (新增的 V2 API - 供 Notebook 调用)
     执行分位数分析并“显示”图表。
+    fwd 见 _factor_matrices (几个因子共用同一个持有期时只算一次)。
     """
     # [我们从 'perform_quantile_analysis_v2' 复制所有代码]
     print(f"\n--- 正在运行分位数分析: {factor_name} ---")
     
-    factor_values = merged_prices_df.pct_change(factor_lookback_days)
-    forward_returns = merged_prices_df.pct_change(forward_return_days).shift(-forward_return_days)
-    
-    factor_long = factor_values.stack().rename('factor')
-    fwd_ret_long = forward_returns.stack().rename('fwd_return')
+    factor, fwd, quantile = _factor_matrices(merged_prices_df, factor_lookback_days, forward_return_days, fwd=fwd)
     
-    df_long = pd.concat([factor_long, fwd_ret_long], axis=1)
-    df_long.index.names = ['Date', 'Asset'] 
-    df_long.dropna(inplace=True)
-    
-    if df_long.empty:
+    if not (quantile > 0).any():
         print(f"  ❌ 错误: 在 {factor_name} 计算中没有剩余数据。")
         return
 
-    df_long['Quantile'] = df_long.groupby(level=0)['factor'].transform(
-        lambda x: pd.qcut(x, N_QUANTILES, labels=False, duplicates='drop') + 1
-    )
-    df_long.dropna(inplace=True)
-    quantile_returns = df_long.groupby('Quantile')['fwd_return'].mean()
+    counts, means, variances = _quantile_moments(fwd, quantile)
+    present = np.flatnonzero(counts[1:]) + 1
+    quantile_returns = pd.Series(means[present], index=pd.Index(present, name='Quantile'), name='fwd_return')
     print(f"\n{factor_name} - 每个分位数的平均 {forward_return_days}日 收益:")
     print(quantile_returns.to_string(float_format="%.5f")) 
     
-    daily_quantile_returns = df_long.groupby(['Date', 'Quantile'])['fwd_return'].mean().unstack()
+    daily_quantile_returns = _daily_quantile_returns(merged_prices_df.index, fwd, quantile)
     mom_ls_portfolio = daily_quantile_returns[N_QUANTILES] - daily_quantile_returns[1]
     rev_ls_portfolio = daily_quantile_returns[1] - daily_quantile_returns[N_QUANTILES]
 
     print("\n--- 核心论据 (统计显著性) ---")
-    q1_returns = df_long[df_long['Quantile'] == 1]['fwd_return']
-    qN_returns = df_long[df_long['Quantile'] == N_QUANTILES]['fwd_return']
-    t_stat, p_value = stats.ttest_ind(qN_returns, q1_returns, equal_var=False)
+    t_stat, p_value = _welch_ttest(counts, means, variances, N_QUANTILES, 1)
     print(f"T-检验 (Q{N_QUANTILES} vs Q1): T-stat={t_stat:.3f}, P-value={p_value:.5f}")
     
     ann_factor = np.sqrt(252 / forward_return_days) 
@@ -157,47 +209,36 @@ def plot_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward_re
     plt.show()
 
 # --- (核心分析函数，来自队友，已添加 V2 优化) ---
-def perform_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward_return_days, factor_name):
+def perform_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward_return_days, factor_name, fwd=None):
     """
     (已优化 V2)
     对合并的价格数据执行横截面分位数分析。
     [优化]: 添加 T-检验 和 Sharpe Ratio。
+    fwd 见 _factor_matrices (几个因子共用同一个持有期时只算一次)。
     """
     print(f"\n--- 正在运行分位数分析: {factor_name} ---")
     
-    # 1. 计算因子值 (来自队友)
-    factor_values = merged_prices_df.pct_change(factor_lookback_days)
-    
-    # 2. 计算未来收益 (来自队友)
-    forward_returns = merged_prices_df.pct_change(forward_return_days).shift(-forward_return_days)
-    
-    # 3. 堆叠数据 (来自队友)
-    factor_long = factor_values.stack().rename('factor')
-    fwd_ret_long = forward_returns.stack().rename('fwd_return')
+    # 1-4. 计算因子值、未来收益和分位数 (来自队友，见 _factor_matrices)
+    factor, fwd, quantile = _factor_matrices(merged_prices_df, factor_lookback_days, forward_return_days, fwd=fwd)
     
-    df_long = pd.concat([factor_long, fwd_ret_long], axis=1)
-    df_long.index.names = ['Date', 'Asset'] 
-    df_long.dropna(inplace=True)
-    
-    if df_long.empty:
+    if not (quantile > 0).any():
         print(f"  ❌ 错误: 在 {factor_name} 计算中没有剩余数据。")
         return
 
-    # 4. 按日期分组，计算分位数 (来自队友)
-    df_long['Quantile'] = df_long.groupby(level=0)['factor'].transform(
-        lambda x: pd.qcut(x, N_QUANTILES, labels=False, duplicates='drop') + 1
-    )
-    df_long.dropna(inplace=True)
+    # 4. 按日期分组的分位数 (来自队友) 已经在 _factor_matrices 里算好 ('Quantile' 列)
 
     # 5. 分析结果
     
     # A. 计算每个分位数的平均未来收益 (来自队友)
-    quantile_returns = df_long.groupby('Quantile')['fwd_return'].mean()
+    # (每组的样本数 / 均值 / 方差一次算好，下面的 T-检验也直接用这些)
+    counts, means, variances = _quantile_moments(fwd, quantile)
+    present = np.flatnonzero(counts[1:]) + 1
+    quantile_returns = pd.Series(means[present], index=pd.Index(present, name='Quantile'), name='fwd_return')
     print(f"\n{factor_name} - 每个分位数的平均 {forward_return_days}日 收益:")
     print(quantile_returns.to_string(float_format="%.5f")) # 打印更精确
     
     # B. 计算多空组合 (来自队友)
-    daily_quantile_returns = df_long.groupby(['Date', 'Quantile'])['fwd_return'].mean().unstack()
+    daily_quantile_returns = _daily_quantile_returns(merged_prices_df.index, fwd, quantile)
     
     mom_ls_portfolio = daily_quantile_returns[N_QUANTILES] - daily_quantile_returns[1]
     rev_ls_portfolio = daily_quantile_returns[1] - daily_quantile_returns[N_QUANTILES]
@@ -206,10 +247,7 @@ def perform_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward
     print("\n--- 核心论据 (统计显著性) ---")
     
     # T-检验: 检验 Q5 和 Q1 的均值是否 *不* 相等
-    q1_returns = df_long[df_long['Quantile'] == 1]['fwd_return']
-    qN_returns = df_long[df_long['Quantile'] == N_QUANTILES]['fwd_return']
-    
-    t_stat, p_value = stats.ttest_ind(qN_returns, q1_returns, equal_var=False)
+    t_stat, p_value = _welch_ttest(counts, means, variances, N_QUANTILES, 1)
     
     print(f"T-检验 (Q{N_QUANTILES} vs Q1): T-stat={t_stat:.3f}, P-value={p_value:.5f}")
     
@@ -249,7 +287,7 @@ def perform_quantile_analysis_v2(merged_prices_df, factor_lookback_days, forward
     os.makedirs(QUANTILE_SAVE_DIR, exist_ok=True) # [修复] 确保在循环外创建
     output_filename = f"quantile_analysis_v2_{factor_name}.png"
     output_path = os.path.join(QUANTILE_SAVE_DIR, output_filename)
-    plt.savefig(output_path)
+    fig.savefig(output_path, dpi=100) # EDA 图不需要更高分辨率，固定下来不受 matplotlibrc 影响
     print(f"  [V2] Chart saved to {output_path}")
     plt.close(fig)
 
@@ -270,8 +308,9 @@ def main():
     
     print(f"Charts will be saved to: {QUANTILE_SAVE_DIR}")
 
-    print(f"Calling internal load_and_merge_data(data_directory='{local_data_dir}')...")
+    print(f"Calling shared load_and_merge_data(data_directory='{local_data_dir}')...")
     
+    # 不做 ffill：假期里填充出来的价格会变成虚假的因子值 / 未来收益，缺失的格子在 _factor_matrices 里直接排除
     merged_prices_df = load_and_merge_data(local_data_dir)
 
     if merged_prices_df.empty:
@@ -280,12 +319,16 @@ def main():
 
     print(f"✅ Loader success. Loaded merged DataFrame with {len(merged_prices_df.columns)} assets.")
     
+    # 两个因子的持有期相同 (1 个月)，未来收益只算一次
+    fwd_21 = _forward_return_matrix(merged_prices_df, 21)
+    
     # 2. 运行分析 1: 短期反转 (Short-Term Reversal, 1个月)
     perform_quantile_analysis_v2(
         merged_prices_df, 
         factor_lookback_days=21, # ~1 个月
         forward_return_days=21,  # 持有 1 个月
-        factor_name="STR_21D"    # 因子名
+        factor_name="STR_21D",   # 因子名
+        fwd=fwd_21
     )
     
     # 3. 运行分析 2: 动量 (Momentum, 6个月)
@@ -293,11 +336,15 @@ def main():
         merged_prices_df, 
         factor_lookback_days=126, # ~6 个月
         forward_return_days=21,   # 持有 1 个月
-        factor_name="MOM_126D"    # 因子名
+        factor_name="MOM_126D",   # 因子名
+        fwd=fwd_21
     )
 
     print("--- 分位数 (Quantile) 分析全部完成 ---")
 
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
@@ -1,120 +1,89 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import norm
+from matplotlib.colors import to_rgba
 import os
 import sys
-import glob 
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这和 'plot_acf_charts.py' 里的代码一模一样)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory):
-    # 1. 查找所有 CSV 文件
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # [关键修复] 读取时不指定 parse_dates，避免因找不到列名报错
-            data = pd.read_csv(f, thousands=',')
-            
-            # 清理列名（去除空格或引号）
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            # [关键修复] 动态处理日期列：支持 'Index' 或 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，跳过该文件
-                print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
-                continue
-
-            # 提取 Close 列
-            if 'Close' in data.columns:
-                # 确保是数值类型
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                
-                # 重命名 Close 为资产名称，方便后续合并
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                print(f"  跳过 {asset_name}: 缺少 'Close' 列")
-                continue
-                
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    # 2. 合并所有数据
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        # 使用 outer join 确保保留所有日期，避免因某个资产缺失某天数据导致整行被删
-        merged = merged.merge(df_to_join, on='Date', how='outer')
-    
-    # 3. 设置索引并排序
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    
-    # 4. 填充缺失值 (Forward Fill) - 这是一个可选但推荐的操作，防止计算指标时因 NaN 报错
-    merged.ffill(inplace=True) 
-    
-    return merged
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
 
+import EDA.data_loader  # noqa: E402
+import EDA.figure_writer  # noqa: E402
+from EDA.data_loader import load_log_returns, list_csv_files, _cache_key  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
 
-# --- [!! 关键一致性 !!] ---
-# (我们使用和 'acf' 脚本 *完全一样* 的计算函数)
-def calculate_log_returns(merged_df): 
-    log_returns = np.log(merged_df / merged_df.shift(1)).dropna()
-    absolute_log_returns = log_returns.abs().dropna()
-    # 即使这个脚本用不到 'absolute_log_returns'，
-    # 我们也保持函数一致性，返回两个值
-    return log_returns, absolute_log_returns
-# -----------------------------------------------------------------
-# (数据加载函数结束)
-# -----------------------------------------------------------------
 
+_SQRT_2PI = np.sqrt(2 * np.pi)
 
-# --- 1. API 函数 (给 Notebook 调用) ---
-# (这是队友的优化版绘图函数 - 我们保留它)
-def plot_histogram(log_returns_series, asset_name, bins="fd"): # 默认 'fd'
-    if log_returns_series.empty:
-        print(f" 警告: {asset_name} 的收益率数据为空，跳过绘图。")
-        return
-    
-    skewness = log_returns_series.skew()
-    kurtosis = log_returns_series.kurtosis() 
-    mu = log_returns_series.mean()
-    std = log_returns_series.std()
+def _density_histogram(ax, log_returns_series, bins, label):
+    """
+    画出和 sns.histplot(series, bins=bins, stat="density", alpha=0.7, label=label) 一样的柱状图：
+    np.histogram 算好密度后直接 ax.bar，不经过 seaborn 的数据整理层 (脚本也不用再导入 seaborn)。
+    """
+    vals = log_returns_series.to_numpy(dtype=np.float64)
+    vals = vals[np.isfinite(vals)]
+    # 和 seaborn 一样：先按 'fd' 等规则定出边，再按 (组数, 范围) 分组
+    edges = np.histogram_bin_edges(vals, bins)
+    heights, edges = np.histogram(vals, bins=len(edges) - 1, range=(edges.min(), edges.max()), density=True)
+    widths = np.diff(edges)
+    lefts = (edges[:-1] + widths / 2) - widths / 2 # seaborn 从柱子中心换算回左边，保持逐位相同
+    bars = ax.bar(lefts, heights, widths, align='edge', label=label,
+                  facecolor=to_rgba('C0', 0.7), edgecolor=plt.rcParams['patch.edgecolor'])
+    for bar in bars:
+        bar.sticky_edges.y[:] = (0, np.inf)
+
+    # 边线宽度不超过最窄那根柱子宽度 (换算成 point) 的 1/10，柱子很密时边线不会盖住填充色
+    ax.autoscale_view()
+    i = np.argmin(widths)
+    x0, x1 = (ax.transData.transform([x, x])[0] for x in (lefts[i], lefts[i] + widths[i]))
+    linewidth = .1 * 72 / ax.figure.dpi * abs(x1 - x0)
+    for bar in bars:
+        bar.set_linewidth(min(linewidth, bar.get_linewidth()))
+    return bars
+
+def summary_stats(log_returns):
+    """
+    每个资产的直方图统计量 (mean, std, skew, kurt, q_low, q_high)，行索引是资产名。
+    整张收益率表按列一次算完，取代逐个资产调用 6 次 Series 方法
+    (kurt 是 pandas 的超额峰度，标题里再加 3；q_low / q_high 是放大显示用的 0.5% / 99.5% 分位数)。
+    """
+    summary = log_returns.agg(['mean', 'std', 'skew', 'kurt']).T
+    summary[['q_low', 'q_high']] = log_returns.quantile([0.005, 0.995]).T.to_numpy()
+    return summary
+
+def _build_histogram_figure(log_returns_series, asset_name, bins="fd", summary=None, fig=None):
+    """
+    (队友的优化版绘图逻辑 - 显示和保存共用)
+    画收益率直方图 + 正态分布曲线 + 均值线，返回 fig。
+    summary (summary_stats 结果里这个资产的一行) 已经有了时直接使用，不再重新计算。
+    fig 不为 None 时清空并复用这个 Figure (批量保存时不必每个资产都新建一个)。
+    """
+    if summary is None:
+        summary = summary_stats(log_returns_series.to_frame()).iloc[0]
+    mu, std, skewness, kurtosis, q_low, q_high = summary[['mean', 'std', 'skew', 'kurt', 'q_low', 'q_high']]
     
-    plt.figure(figsize=(12, 7))
-    ax = plt.gca() # 获取当前 axes
+    if fig is None:
+        fig, ax = plt.subplots(figsize=(12, 7))
+    else:
+        fig.clear()
+        ax = fig.subplots()
     
-    sns.histplot(log_returns_series, bins=bins, stat="density", label='Log Returns Histogram', alpha=0.7, kde=False, ax=ax)
+    _density_histogram(ax, log_returns_series, bins, label='Log Returns Histogram')
     
     x = np.linspace(mu - 4*std, mu + 4*std, 100)
-    y = norm.pdf(x, mu, std)
+    # 正态密度，运算顺序和 scipy.stats.norm.pdf(x, mu, std) 相同 (结果逐位一致)，
+    # 100 个点不值得为它走一遍 scipy 的参数检查和广播 (也省掉导入 scipy.stats)
+    z = (x - mu) / std
+    y = np.exp(-z**2 / 2.0) / _SQRT_2PI / std
     ax.plot(x, y, linewidth=2, color='r', linestyle='--', label='Normal Distribution')
     
     ax.axvline(mu, color='darkorange', linestyle='-', linewidth=2, label=f'Mean: {mu:.5f}')
     
-    q_low = log_returns_series.quantile(0.005)
-    q_high = log_returns_series.quantile(0.995)
     ax.set_xlim(q_low, q_high)
 
     title_kurtosis = 3 + kurtosis 
@@ -123,55 +92,78 @@ def plot_histogram(log_returns_series, asset_name, bins="fd"): # 默认 'fd'
     ax.set_ylabel('Density')
     ax.legend()
     ax.grid(True, linestyle=':', alpha=0.6) 
+    return fig
+
+# --- 1. API 函数 (给 Notebook 调用) ---
+# (这是队友的优化版绘图函数 - 我们保留它)
+def plot_histogram(log_returns_series, asset_name, bins="fd"): # 默认 'fd'
+    if log_returns_series.empty:
+        print(f" 警告: {asset_name} 的收益率数据为空，跳过绘图。")
+        return
+    
+    _build_histogram_figure(log_returns_series, asset_name, bins=bins)
     plt.show()
 
 # --- 2. 优化的“保存”函数 (来自队友) ---
-def save_histogram_plot(log_returns_series, asset_name, bins="fd", save_path=""):
+def save_histogram_plot(log_returns_series, asset_name, bins="fd", save_path="", summary=None, fig=None,
+                        writer=None):
     """
     (已优化 - 来自队友)
+    summary 见 _build_histogram_figure (批量保存时由 summary_stats 一次算好)。
+    传入 fig 时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    传入 writer (AsyncFigureWriter) 时 PNG 在后台线程编码写入。
     """
     if log_returns_series.empty:
         print(f" 警告: {asset_name} 数据为空，跳过保存。")
         return
     
-    skewness = log_returns_series.skew()
-    kurtosis = log_returns_series.kurtosis()
-    mu = log_returns_series.mean()
-    std = log_returns_series.std()
-    
-    fig, ax = plt.subplots(figsize=(12, 7))
-    
-    sns.histplot(log_returns_series, bins=bins, stat="density", label='Log Returns Histogram', alpha=0.7, kde=False, ax=ax)
-
-    x = np.linspace(mu - 4*std, mu + 4*std, 100)
-    y = norm.pdf(x, mu, std)
-    ax.plot(x, y, linewidth=2, color='r', linestyle='--', label='Normal Distribution')
-    
-    ax.axvline(mu, color='darkorange', linestyle='-', linewidth=2, label=f'Mean: {mu:.5f}')
-    
-    q_low = log_returns_series.quantile(0.005)
-    q_high = log_returns_series.quantile(0.995)
-    ax.set_xlim(q_low, q_high)
-
-    title_kurtosis = 3 + kurtosis
-    ax.set_title(f'Log Returns Distribution - {asset_name}\nSkew: {skewness:.4f}, Kurtosis (W5 Standard): {title_kurtosis:.4f}')
-    ax.set_xlabel('Log Returns (Zoomed to 99% data)')
-    ax.set_ylabel('Density')
-    ax.legend()
-    ax.grid(True, linestyle=':', alpha=0.6)
+    owns_fig = fig is None
+    fig = _build_histogram_figure(log_returns_series, asset_name, bins=bins, summary=summary, fig=fig)
     
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path, bbox_inches='tight')
+    if writer is not None:
+        writer.save(fig, save_path, bbox_inches='tight')
+    else:
+        fig.savefig(save_path, bbox_inches='tight', dpi=100) # EDA 图不需要更高分辨率，固定下来不受 matplotlibrc 影响
     print(f"  图表已保存到: {save_path}")
-    plt.close(fig)
+    if owns_fig:
+        plt.close(fig)
+
+def _is_up_to_date(output_path, src_mtime):
+    """ output_path 已存在且比所有输入都新 (make 式的 mtime 判断) 时返回 True。 """
+    try:
+        return os.path.getmtime(output_path) > src_mtime
+    except OSError:
+        return False
+
+# 生成这批图片时 CSV 集合的 _cache_key，和图片存在同一目录
+STAMP_FILENAME = ".histograms.stamp"
+
+def _read_stamp(stamp_path):
+    try:
+        with open(stamp_path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _write_stamp(stamp_path, key):
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    with open(stamp_path, 'w') as f:
+        f.write(key)
 
 
 # --- 3. 本地运行块 (Standalone Runner) ---
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     
+    # --force: 不管图片是否已是最新，全部重新生成
+    args = [a for a in sys.argv[1:] if a != '--force']
+    force = len(args) < len(sys.argv) - 1
     dataset_name = "PART1"
-    if len(sys.argv) > 1:
-        dataset_name = sys.argv[1]
+    if args:
+        dataset_name = args[0]
 
     print(f"--- 正在以独立模式运行 (Histogram Plotter) [Dataset: {dataset_name}] ---")
     
@@ -179,26 +171,47 @@ if __name__ == "__main__":
     SAVE_DIR = f"./EDA/output/{dataset_name}/charts/histograms/" 
     
     print(f"正在从 '{DATA_PATH}' 加载数据...")
-    merged_prices = load_and_merge_data(DATA_PATH) 
+    # --- [!! 关键一致性 !!] ---
+    # 和 'acf' 脚本一样：ffill 后的价格 -> 对数收益率，结果按 CSV 的 mtime 缓存成 Parquet
+    log_returns, absolute_log_returns = load_log_returns(DATA_PATH, with_abs=True, ffill=True)
     
-    if merged_prices.empty:
+    if log_returns.empty:
         print(f"未能加载数据，请检查 DATA_PATH: {os.path.abspath(DATA_PATH)}")
     else:
-        # --- [!! 关键一致性 !!] ---
-        # 我们必须调用返回 *两个* 值的版本
-        log_returns, absolute_log_returns = calculate_log_returns(merged_prices)
-        # --- [修正结束] ---
-        
         print("✅ 数据加载、合并、计算收益率完毕。")
         print(f"正在为所有资产生成[优化版]直方图并保存到 '{SAVE_DIR}'...")
         
-        for asset_name in log_returns.columns:
-            print(f"  正在处理: {asset_name}")
-            asset_returns_series = log_returns[asset_name].dropna()
-            
-            save_file_path = os.path.join(SAVE_DIR, f"{asset_name}_histogram_V2_zoomed.png")
-            
-            # 调用优化的函数
-            save_histogram_plot(asset_returns_series, asset_name, bins="fd", save_path=save_file_path)
+        # 所有资产的均值 / 标准差 / 偏度 / 峰度 / 分位数一次算完
+        summary = summary_stats(log_returns)
+        
+        # 每个资产的直方图都依赖所有 CSV (合并后去掉含 NaN 的行)、本脚本的画法，
+        # 以及加载/收益率计算 (data_loader) 和 PNG 编码 (figure_writer) 这两个共享模块；
+        # 取它们中最新的 mtime，比它新的图片直接跳过，不再重画
+        csv_files = list_csv_files(DATA_PATH)
+        src_files = csv_files + [__file__, EDA.data_loader.__file__, EDA.figure_writer.__file__]
+        src_mtime = max(os.path.getmtime(f) for f in src_files)
+        # 只看 mtime 发现不了删掉一个 CSV、或加入一个保留了旧 mtime 的 CSV (它们同样改变每张图)，
+        # 所以还要比对上次生成时记下的 CSV 集合 key (文件名 / 修改时间 / 大小)，不一致就全部重画
+        stamp_path = os.path.join(SAVE_DIR, STAMP_FILENAME)
+        csv_key = _cache_key(csv_files)
+        csv_unchanged = _read_stamp(stamp_path) == csv_key
+        
+        # 所有资产共用一个 (不经过 pyplot 的) Figure，每次 clear 后重画；PNG 编码在后台线程进行
+        fig = new_figure(figsize=(12, 7))
+        with AsyncFigureWriter() as writer:
+            for asset_name in log_returns.columns:
+                save_file_path = os.path.join(SAVE_DIR, f"{asset_name}_histogram_V2_zoomed.png")
+                if not force and csv_unchanged and _is_up_to_date(save_file_path, src_mtime):
+                    print(f"  跳过 {asset_name}: 图片已是最新")
+                    continue
+                
+                print(f"  正在处理: {asset_name}")
+                asset_returns_series = log_returns[asset_name] # calculate_log_returns 已经去掉了含 NaN 的行
+                
+                # 调用优化的函数
+                save_histogram_plot(asset_returns_series, asset_name, bins="fd", save_path=save_file_path,
+                                    summary=summary.loc[asset_name], fig=fig, writer=writer)
+        # writer 退出时所有 PNG 都已写完，这时才记下 key (中途出错的话下次会全部重画)
+        _write_stamp(stamp_path, csv_key)
             
         print("--- 本地运行完毕 ---")
\ No newline at end of file
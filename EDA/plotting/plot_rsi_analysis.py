@@ -5,7 +5,13 @@ import seaborn as sns
 import os
 from scipy import stats # 导入 scipy.stats 用于 t-检验
 import sys # 确保导入 sys
-import glob # 确保导入 glob
+
+# numba 是可选依赖：装了就用 JIT 内核一次遍历算完 RSI，没装就用下面的纯 pandas 版本
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 # --- 配置 ---
 # [路径修复] 修正为 Zac 的本地路径
@@ -19,78 +25,75 @@ FORWARD_RETURN_DAYS = 5 # 测试未来 N 天的收益
 # ---
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这是 'Close-Only' 版本，RSI 只需要 Close 价格)
-# -----------------------------------------------------------------
-def load_and_merge_data(data_directory="./DATA/PART1/"):
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # 1. 读取 CSV，不预设任何日期列名
-            data = pd.read_csv(f, thousands=',')
-            data.columns = data.columns.str.strip().str.strip('"') # 清理列名
-            
-            # 2. 动态识别并统一日期列
-            #    如果原始数据有 'Index' 列，就把它重命名为 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            #    现在，我们确保 'Date' 列存在并将其转换为标准的 datetime 对象
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，就报错
-                raise ValueError("CSV file must contain either an 'Index' or 'Date' column.")
-
-            # 3. 后续代码现在可以安全地假设 'Date' 和 'Close' 列存在
-            if 'Close' in data.columns:
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                raise ValueError("CSV file must contain a 'Close' column.")
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        merged = merged.merge(df_to_join, on='Date', how='outer') # [我们的修复]
-    
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    # [优化] 向前填充 NaN，以防止 pct_change 计算因假期错位而失败
-    merged.ffill(inplace=True) 
-    return merged
-# -----------------------------------------------------------------
-# (数据加载函数结束)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import load_and_merge_data, forward_returns  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
 
 
 # -------------------------------------------------------------------
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _rsi_kernel(prices, period):
+        """
+        calculate_rsi 的 JIT 版本 (prices 每列一个资产，逐列计算)：差分、涨跌拆分、两条平滑和 RSI
+        在一次遍历里算完，不产生中间 Series。
+        平滑的递推和 pandas ewm(alpha=1/period, adjust=False, min_periods=period) 的实现逐步相同，
+        结果逐位一致 (所以不用 fastmath)。差分按价格的 dtype 计算，和 series.diff() 一样。
+        """
+        n_rows, n_cols = prices.shape
+        out = np.full((n_rows, n_cols), np.nan)
+        # pandas 先把 alpha 换算成 com 再换回来，这里照做，舍入才一致
+        com = (1.0 - 1.0 / period) / (1.0 / period)
+        alpha = 1.0 / (1.0 + com)
+        decay = 1.0 - alpha
+        # pandas 每步按 (旧权重 * 旧值 + alpha * 新值) / (旧权重 + alpha) 计算，旧权重固定是 1 - alpha
+        norm = decay + alpha
+        for j in range(n_cols):
+            # 第一个差分是 NaN，where(delta > 0, 0) 把它记成 0：从 0 开始，已有 1 个观测
+            avg_gain = 0.0
+            avg_loss = 0.0
+            for i in range(n_rows):
+                if i > 0:
+                    d = prices[i, j] - prices[i - 1, j]
+                    gain = d if d > 0 else 0.0 # 含 NaN 的差分两边都记 0
+                    loss = -d if d < 0 else 0.0
+                    if avg_gain != gain:
+                        avg_gain = (decay * avg_gain + alpha * gain) / norm
+                    if avg_loss != loss:
+                        avg_loss = (decay * avg_loss + alpha * loss) / norm
+                if i >= period - 1: # min_periods
+                    rs = avg_gain / (avg_loss + 1e-9)
+                    out[i, j] = 100 - (100 / (1 + rs))
+        return out
+
 # --- [ 队友的 RSI 实现 (完美, 保留) ] ---
 def calculate_rsi(series, period=RSI_PERIOD):
     """
     使用纯 pandas 计算 RSI，不依赖外部库。
-    使用 Wilder's Smoothing (RMA)，这是 RSI 的标准。
+    使用 Wilder's Smoothing (RMA)，这是 RSI 的标准：
+    y_t = (1 - 1/period) * y_{t-1} + (1/period) * x_t，即 ewm(alpha=1/period, adjust=False)。
+    series 也可以是 DataFrame (每列分别计算，和逐列调用结果相同)。
+    有 numba 时用 _rsi_kernel (结果相同)，下面的 pandas 版本是没有 numba 时的实现。
     """
+    if HAS_NUMBA and isinstance(series, pd.DataFrame) and all(d in (np.float32, np.float64) for d in series.dtypes):
+        prices = series.to_numpy(dtype=np.result_type(*series.dtypes))
+        return pd.DataFrame(_rsi_kernel(prices, period), index=series.index, columns=series.columns)
+    if HAS_NUMBA and isinstance(series, pd.Series) and series.dtype in (np.float32, np.float64):
+        rsi = _rsi_kernel(series.to_numpy()[:, None], period)[:, 0]
+        return pd.Series(rsi, index=series.index, name=series.name)
+
     delta = series.diff(1)
     gain = delta.where(delta > 0, 0)
     loss = -delta.where(delta < 0, 0)
 
-    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
+    avg_gain = gain.ewm(alpha=1.0 / period, adjust=False, min_periods=period).mean()
+    avg_loss = loss.ewm(alpha=1.0 / period, adjust=False, min_periods=period).mean()
 
     # [修复] 避免除以零
     rs = avg_gain / (avg_loss + 1e-9) 
@@ -98,6 +101,68 @@ def calculate_rsi(series, period=RSI_PERIOD):
     
     return rsi
 # --- [ 队友的 RSI 实现结束 ] ---
+
+def _pack_columns(series_list, dtype=np.float64):
+    """
+    把长度不同的序列压到同一个二维数组的列首 (列尾补 NaN)，返回 (packed, lengths)。
+    合并表是 outer join，各资产 dropna 后的起止日期不同；补的 NaN 排在有效数据之后，
+    不影响按时间向前递推的计算 (RSI、未来收益) 在有效部分的结果。
+    """
+    lengths = [len(s) for s in series_list]
+    packed = np.full((max(lengths, default=0), len(series_list)), np.nan, dtype=dtype)
+    for a, s in enumerate(series_list):
+        packed[:lengths[a], a] = s.to_numpy()
+    return packed, lengths
+
+def rsi_all(merged_prices_df, period=RSI_PERIOD):
+    """
+    对每个资产 (各自 dropna 后) 计算 RSI，返回 {asset_name: rsi}，和逐个资产调用
+    calculate_rsi(merged_prices_df[name].dropna()) 结果相同，但所有资产只调用一次。
+    """
+    series = {name: merged_prices_df[name].dropna() for name in merged_prices_df.columns}
+    # 全是 float32 (loader 的默认输出) 时保持 float32，差分和逐列计算时一样按 float32 做
+    packed, lengths = _pack_columns(list(series.values()), dtype=np.result_type(*merged_prices_df.dtypes))
+    rsi = calculate_rsi(pd.DataFrame(packed), period=period).to_numpy()
+    return {
+        name: pd.Series(rsi[:lengths[a], a], index=s.index, name=name)
+        for a, (name, s) in enumerate(series.items())
+    }
+
+def rsi_signal_ttests(merged_prices_df, rsi_by_asset):
+    """
+    所有资产的 t-检验 (信号日 vs 非信号日的未来收益，Welch，单侧 'greater') 一次算完，
+    返回 {asset_name: (t_stat, p_value)}；和 analyze_rsi_signal 里逐个资产调用
+    stats.ttest_ind(..., equal_var=False, alternative='greater') 的结果相同 (到浮点误差)。
+    每组只需要样本数 / 均值 / 方差：在二维数组上按列做几次掩码归约，不再切片出两组收益。
+    """
+    names = list(rsi_by_asset)
+    prices, _ = _pack_columns([merged_prices_df[name].dropna() for name in names])
+    rsi, _ = _pack_columns([rsi_by_asset[name] for name in names])
+
+    # 未来收益 P[t+f] / P[t] - 1 (和 forward_returns 一样按 float64 计算，补的 NaN 行结果也是 NaN)
+    f = FORWARD_RETURN_DAYS
+    fwd = np.full_like(prices, np.nan)
+    fwd[:-f] = prices[f:] / prices[:-f] - 1.0
+
+    # 和 analyze_rsi_signal 里的 dropna 一样：RSI 和未来收益都有效的日期才参与检验
+    valid = ~np.isnan(rsi) & ~np.isnan(fwd)
+    groups = [valid & (rsi < RSI_OVERSOLD), valid & (rsi >= RSI_OVERSOLD)]
+
+    moments = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for mask in groups:
+            n = mask.sum(axis=0)
+            mean = np.where(mask, fwd, 0.0).sum(axis=0) / n
+            # 先减去组均值再平方 (两遍)，和 np.var(ddof=1) 一样数值稳定
+            var = np.where(mask, (fwd - mean) ** 2, 0.0).sum(axis=0) / (n - 1)
+            moments.append((n, mean, var))
+        (n_s, mean_s, var_s), (n_n, mean_n, var_n) = moments
+        vs, vn = var_s / n_s, var_n / n_n
+        t_stat = (mean_s - mean_n) / np.sqrt(vs + vn)
+        # Welch–Satterthwaite 自由度
+        dof = (vs + vn) ** 2 / (vs ** 2 / (n_s - 1) + vn ** 2 / (n_n - 1))
+    p_value = stats.t.sf(t_stat, dof) # 单侧: 信号 > 非信号
+    return {name: (t_stat[a], p_value[a]) for a, name in enumerate(names)}
 # -------------------------------------------------------------------
 # --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
 def plot_rsi_signal_analysis(price_series, asset_name):
@@ -110,7 +175,7 @@ def plot_rsi_signal_analysis(price_series, asset_name):
 
     df = pd.DataFrame({'Close': price_series})
     df['rsi'] = calculate_rsi(df['Close'], period=RSI_PERIOD)
-    df['fwd_returns'] = df['Close'].pct_change(FORWARD_RETURN_DAYS).shift(-FORWARD_RETURN_DAYS)
+    df['fwd_returns'] = forward_returns(df['Close'], FORWARD_RETURN_DAYS)
     df.dropna(inplace=True)
 
     if df.empty:
@@ -161,16 +226,19 @@ def plot_rsi_signal_analysis(price_series, asset_name):
     # --- [!! 核心区别: "显示" !!] ---
     plt.show()
 
-def analyze_rsi_signal(price_series, asset_name, save_dir):
+def analyze_rsi_signal(price_series, asset_name, save_dir, rsi=None, ttest=None, fig=None, writer=None):
     """
     (队友的核心逻辑 - 100% 保留)
     对 *单个资产* 的 RSI 信号进行回测和统计分析。
+    rsi (rsi_all 的结果) 和 ttest (rsi_signal_ttests 的 (t_stat, p_value)) 已经算好时直接使用，不再重新计算。
+    传入 fig 时清空并在这个 Figure 上重画，由调用方负责最后 close；
+    传入 writer (AsyncFigureWriter) 时 PNG 在后台线程编码写入。
     """
     print(f"  Analyzing RSI({RSI_PERIOD}) < {RSI_OVERSOLD} signal for {asset_name}...")
 
     df = pd.DataFrame({'Close': price_series})
-    df['rsi'] = calculate_rsi(df['Close'], period=RSI_PERIOD)
-    df['fwd_returns'] = df['Close'].pct_change(FORWARD_RETURN_DAYS).shift(-FORWARD_RETURN_DAYS)
+    df['rsi'] = rsi if rsi is not None else calculate_rsi(df['Close'], period=RSI_PERIOD)
+    df['fwd_returns'] = forward_returns(df['Close'], FORWARD_RETURN_DAYS)
     df.dropna(inplace=True)
 
     if df.empty:
@@ -200,10 +268,13 @@ def analyze_rsi_signal(price_series, asset_name, save_dir):
     print(f"  Avg. Forward Return (Signal Days): {mean_return_signal: .4f}")
 
     # t-检验：检验信号收益率的均值是否 *显著大于* *非*信号日的均值
-    t_stat, p_value = stats.ttest_ind(signals['fwd_returns'], 
-                                      all_non_signals['fwd_returns'], 
-                                      equal_var=False, 
-                                      alternative='greater') # 'greater' 检验信号收益是否 > 非信号
+    if ttest is not None:
+        t_stat, p_value = ttest
+    else:
+        t_stat, p_value = stats.ttest_ind(signals['fwd_returns'], 
+                                          all_non_signals['fwd_returns'], 
+                                          equal_var=False, 
+                                          alternative='greater') # 'greater' 检验信号收益是否 > 非信号
 
     print(f"  T-statistic (Signal vs Non-Signal): {t_stat: .3f}")
     print(f"  P-value (Signal > Non-Signal): {p_value: .5f}")
@@ -215,25 +286,34 @@ def analyze_rsi_signal(price_series, asset_name, save_dir):
     print("--------------------------------------------------")
 
     # --- 可视化 (来自队友) ---
-    plt.figure(figsize=(12, 7))
+    owns_fig = fig is None
+    if owns_fig:
+        fig, ax = plt.subplots(figsize=(12, 7))
+    else:
+        fig.clear()
+        ax = fig.subplots()
     sns.histplot(signals['fwd_returns'], kde=True, bins=50, color='green', 
-                 label=f'Forward Returns after RSI < {RSI_OVERSOLD}')
-    plt.axvline(0, color='black', linestyle='--', label='Zero Return')
-    plt.axvline(mean_return_signal, color='red', linestyle='-', 
-                 label=f'Mean Return ({mean_return_signal:.4f})')
+                 label=f'Forward Returns after RSI < {RSI_OVERSOLD}', ax=ax)
+    ax.axvline(0, color='black', linestyle='--', label='Zero Return')
+    ax.axvline(mean_return_signal, color='red', linestyle='-', 
+               label=f'Mean Return ({mean_return_signal:.4f})')
     
-    plt.title(f'Forward {FORWARD_RETURN_DAYS}-Day Return Distribution for {asset_name} (RSI < {RSI_OVERSOLD})')
-    plt.xlabel(f'Forward {FORWARD_RETURN_DAYS}-Day Return')
-    plt.ylabel('Frequency')
-    plt.legend()
+    ax.set_title(f'Forward {FORWARD_RETURN_DAYS}-Day Return Distribution for {asset_name} (RSI < {RSI_OVERSOLD})')
+    ax.set_xlabel(f'Forward {FORWARD_RETURN_DAYS}-Day Return')
+    ax.set_ylabel('Frequency')
+    ax.legend()
     
     # --- 保存图表 (来自队友) ---
     output_filename = f"rsi_fwd_returns_hist_{asset_name}.png"
     output_path = os.path.join(save_dir, output_filename)
     
-    plt.savefig(output_path)
+    if writer is not None:
+        writer.save(fig, output_path)
+    else:
+        fig.savefig(output_path, dpi=100) # EDA 图不需要更高分辨率，固定下来不受 matplotlibrc 影响
     print(f"  Chart saved to {output_path}")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 def main():
     """
@@ -251,9 +331,9 @@ def main():
     os.makedirs(local_save_dir, exist_ok=True)
     print(f"Charts & stats will be saved to: {local_save_dir}")
 
-    print(f"Calling internal load_and_merge_data(data_directory='{local_data_dir}')...")
+    print(f"Calling shared load_and_merge_data(data_directory='{local_data_dir}')...")
     
-    merged_prices_df = load_and_merge_data(local_data_dir)
+    merged_prices_df = load_and_merge_data(local_data_dir, ffill=True)
 
     if merged_prices_df.empty:
         print("Error: Loader returned an empty DataFrame.")
@@ -261,19 +341,34 @@ def main():
 
     print(f"✅ Loader success. Loaded merged DataFrame with {len(merged_prices_df.columns)} assets.")
 
-    # 循环遍历 *合并后 DataFrame 的每一列*
-    for asset_name in merged_prices_df.columns:
-        price_series = merged_prices_df[asset_name].dropna()
-        
-        if isinstance(price_series, pd.Series) and not price_series.empty:
-            analyze_rsi_signal(price_series, 
-                               asset_name, 
-                               local_save_dir)
-        else:
-            print(f"Skipping {asset_name}: No valid data.")
+    # 所有资产的 RSI 一次算完 (每个资产仍是各自 dropna 后的序列)
+    rsi_by_asset = rsi_all(merged_prices_df, period=RSI_PERIOD)
+    # 所有资产的 t-检验也一次算完
+    ttests = rsi_signal_ttests(merged_prices_df, rsi_by_asset)
+
+    # 所有资产共用一个 (不经过 pyplot 的) Figure，每次 clear 后重画；PNG 编码在后台线程进行
+    fig = new_figure(figsize=(12, 7))
+    with AsyncFigureWriter() as writer:
+        # 循环遍历 *合并后 DataFrame 的每一列*
+        for asset_name in merged_prices_df.columns:
+            price_series = merged_prices_df[asset_name].dropna()
+            
+            if isinstance(price_series, pd.Series) and not price_series.empty:
+                analyze_rsi_signal(price_series, 
+                                   asset_name, 
+                                   local_save_dir,
+                                   rsi=rsi_by_asset[asset_name],
+                                   ttest=ttests[asset_name],
+                                   fig=fig,
+                                   writer=writer)
+            else:
+                print(f"Skipping {asset_name}: No valid data.")
             
     print("--- RSI 信号分析全部完成 ---")
 
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
@@ -3,9 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns # 导入 Seaborn
 import os
-import glob
 import sys # 确保导入 sys
-from scipy import stats
 
 # --- 配置 ---
 # [路径修复] 修正为 Zac 的本地路径
@@ -14,182 +12,204 @@ DATA_DIR_PATH = "./DATA/PART1/"
 # ---
 
 # -----------------------------------------------------------------
-# (数据加载函数，使用我们昨天的“最终修复版-老师的逻辑”)
-# (这是 'Close-Only' 版本，季节性分析只需要 Close 价格)
+# (数据加载函数 - 统一使用 EDA/data_loader.py 里的共享版本)
 # -----------------------------------------------------------------
-def load_and_merge_data(data_directory="./DATA/PART1/"):
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # 1. 读取 CSV，不预设任何日期列名
-            data = pd.read_csv(f, thousands=',')
-            data.columns = data.columns.str.strip().str.strip('"') # 清理列名
-            
-            # 2. 动态识别并统一日期列
-            #    如果原始数据有 'Index' 列，就把它重命名为 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            #    现在，我们确保 'Date' 列存在并将其转换为标准的 datetime 对象
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，就报错
-                raise ValueError("CSV file must contain either an 'Index' or 'Date' column.")
-
-            # 3. 后续代码现在可以安全地假设 'Date' 和 'Close' 列存在
-            if 'Close' in data.columns:
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                raise ValueError("CSV file must contain a 'Close' column.")
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
 
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
+from EDA.data_loader import load_and_merge_data  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
+
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+WHIS = 1.5 # 须线范围 (和 sns.boxplot / plt.boxplot 默认一样)
 
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        merged = merged.merge(df_to_join, on='Date', how='outer') # [我们的修复]
-    
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    # [优化] 向前填充 NaN
-    merged.ffill(inplace=True) 
-    return merged
 # -----------------------------------------------------------------
-# (数据加载函数结束)
+# (季节性统计 - 所有资产一次算完)
 # -----------------------------------------------------------------
-# --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
-def plot_seasonality_show(price_series, asset_name):
+def _long_returns(merged_prices_df):
     """
-    (新增的 API - 供 Notebook 调用)
-    对 *单个资产* 的收益率进行“星期几”和“月份”效应分析，并“显示”图表。
+    整个价格表一次取 log + 差分，再展开成长表 (asset, day_of_week, month, returns)。
+    day_of_week 为 0=Monday ... 6=Sunday，month 为 1..12，都是 int8 (分组键越窄，groupby 哈希越快)。
+    asset 是以列名为类别的 Categorical，分组时直接用整数编码，不必逐行哈希字符串。
     """
-    # [我们从 'plot_seasonality' 复制所有代码]
-    print(f"  Analyzing Seasonality for {asset_name}...")
-    log_returns = np.log(price_series / price_series.shift(1)).dropna()
-    if log_returns.empty:
-        print(f"  Skipping {asset_name}: Not enough data for returns.")
-        return
+    log_returns = np.log(merged_prices_df.astype(np.float64)).diff()
+    if not isinstance(log_returns.index, pd.DatetimeIndex):
+        log_returns.index = pd.to_datetime(log_returns.index)
 
-    df = pd.DataFrame({'returns': log_returns})
-    if not isinstance(df.index, pd.DatetimeIndex):
-        try:
-            df.index = pd.to_datetime(df.index)
-        except Exception as e:
-            print(f"  Skipping {asset_name}: Could not convert index to Datetime. Error: {e}")
-            return
-    df['day_of_week'] = df.index.day_name()
-    df['month'] = df.index.month_name()
-    
-    week_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    months = ["January", "February", "March", "April", "May", "June", 
-              "July", "August", "September", "October", "November", "December"]
-    
-    day_order = [day for day in week_days if day in df['day_of_week'].unique()]
-    month_order = [mon for mon in months if mon in df['month'].unique()]
+    values = log_returns.to_numpy()
+    n_dates, n_assets = values.shape
+    valid = ~np.isnan(values)
+    date_idx, asset_idx = np.nonzero(valid) # 日期优先，和逐列 dropna 的顺序无关
+    # 类别按资产名排序，分组 (sort=True) 的顺序和按字符串分组时一样
+    order = np.argsort(log_returns.columns.to_numpy())
+    rank = np.empty(n_assets, dtype=np.intp)
+    rank[order] = np.arange(n_assets)
+    return pd.DataFrame({
+        'asset': pd.Categorical.from_codes(rank[asset_idx], categories=log_returns.columns[order]),
+        'day_of_week': log_returns.index.day_of_week.to_numpy().astype(np.int8)[date_idx],
+        'month': log_returns.index.month.to_numpy().astype(np.int8)[date_idx],
+        'returns': values[valid],
+    })
 
-    fig, (ax1, ax2) = plt.subplots(nrows=2, ncols=1, figsize=(15, 12))
-    fig.suptitle(f'Seasonality Analysis for {asset_name}', y=1.02, fontsize=16)
+def _box_stats(long_df, key, labels):
+    """
+    按 (asset, key) 一次性算出箱线图需要的统计量 (四分位数、须线、离群点)，
+    返回 {asset: [ax.bxp 用的 dict, ...]}，规则和 matplotlib.cbook.boxplot_stats 一致。
+    """
+    keys = ['asset', key]
+    # observed=True: 只保留真正出现过的 (asset, key) 组合 (pandas 2.x 的默认值是 False)
+    grouped = long_df.groupby(keys, sort=True, observed=True)['returns']
+    r = long_df['returns']
 
-    sns.boxplot(ax=ax1, data=df, x='day_of_week', y='returns', 
-                order=day_order, palette="pastel")
-    ax1.axhline(0, color='red', linestyle='--', alpha=0.7)
-    ax1.set_title('Day-of-Week Effect')
-    ax1.set_xlabel('Day of the Week')
-    ax1.set_ylabel('Log Returns')
+    # 每一行所在组的 Q1 / Q3，用来判断是否在须线范围内
+    q1_row = grouped.transform('quantile', 0.25)
+    q3_row = grouped.transform('quantile', 0.75)
+    iqr_row = q3_row - q1_row
+    inside = (r >= q1_row - WHIS * iqr_row) & (r <= q3_row + WHIS * iqr_row)
 
-    sns.boxplot(ax=ax2, data=df, x='month', y='returns', 
-                order=month_order, palette="Spectral")
-    ax2.axhline(0, color='red', linestyle='--', alpha=0.7)
-    ax2.set_title('Month-of-Year Effect')
-    ax2.set_xlabel('Month')
-    ax2.set_ylabel('Log Returns')
-    
-    plt.tight_layout(rect=[0, 0.03, 1, 0.98]) 
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    inner = r.where(inside).groupby([long_df[k] for k in keys], sort=True, observed=True)
+    # 须线取范围内的最值，但不会缩进箱体里面 (fmin/fmax 同时处理整组都在范围外的情况)
+    whislo = np.fmin(inner.min(), quartiles[0.25])
+    whishi = np.fmax(inner.max(), quartiles[0.75])
+    fliers = {k: g.to_numpy() for k, g in r[~inside].groupby([long_df[k] for k in keys], observed=True)}
 
-    # --- [!! 核心区别: "显示" !!] ---
-    plt.show()
+    stats = {}
+    for (asset, k), q1, med, q3, lo, hi in zip(quartiles.index, quartiles[0.25], quartiles[0.5],
+                                               quartiles[0.75], whislo, whishi):
+        stats.setdefault(asset, []).append({
+            'label': labels[k], 'q1': q1, 'med': med, 'q3': q3,
+            'whislo': lo, 'whishi': hi, 'fliers': fliers.get((asset, k), np.empty(0)),
+        })
+    return stats
 
-# --- (队友的核心分析函数 - 100% 保留) ---
-def plot_seasonality(price_series, asset_name, save_dir):
+def seasonality_box_stats(merged_prices_df):
     """
-    对 *单个资产* 的收益率进行“星期几”和“月份”效应分析。
+    所有资产的“星期几”和“月份”箱线图统计量。
+    返回 {asset: (day_stats, month_stats)}，每个都是按日历顺序排好的 ax.bxp 输入。
     """
-    print(f"  Analyzing Seasonality for {asset_name}...")
+    long_df = _long_returns(merged_prices_df)
+    day_stats = _box_stats(long_df, 'day_of_week', WEEK_DAYS)
+    month_stats = _box_stats(long_df, 'month', dict(enumerate(MONTHS, start=1)))
+    return {asset: (day_stats[asset], month_stats[asset]) for asset in day_stats}
 
-    # 1. 准备数据：季节性分析应在收益率上进行
-    log_returns = np.log(price_series / price_series.shift(1)).dropna()
+def _draw_boxes(ax, stats, palette):
+    """ 用已汇总的统计量画箱线图 (ax.bxp)，颜色沿用 seaborn 的调色板。 """
+    artists = ax.bxp(
+        stats, positions=range(len(stats)), widths=0.8, patch_artist=True,
+        medianprops={'color': '0.25'}, whiskerprops={'color': '0.25'}, capprops={'color': '0.25'},
+        flierprops={'marker': 'd', 'markerfacecolor': '0.25', 'markeredgecolor': '0.25', 'markersize': 5},
+    )
+    for patch, color in zip(artists['boxes'], sns.color_palette(palette, len(stats))):
+        patch.set_facecolor(color)
+        patch.set_edgecolor('0.25')
 
-    if log_returns.empty:
-        print(f"  Skipping {asset_name}: Not enough data for returns.")
-        return
-
-    # 2. 创建一个包含收益率和日历特征的 DataFrame
-    df = pd.DataFrame({'returns': log_returns})
-    
-    # 确保索引是 DatetimeIndex (我们的 loader 已经做了)
-    if not isinstance(df.index, pd.DatetimeIndex):
-        try:
-            df.index = pd.to_datetime(df.index)
-        except Exception as e:
-            print(f"  Skipping {asset_name}: Could not convert index to Datetime. Error: {e}")
-            return
-            
-    df['day_of_week'] = df.index.day_name()
-    df['month'] = df.index.month_name()
-    
-    # 3. 为图表排序
-    week_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    months = ["January", "February", "March", "April", "May", "June", 
-              "July", "August", "September", "October", "November", "December"]
-    
-    # 过滤掉数据中不存在的日期
-    day_order = [day for day in week_days if day in df['day_of_week'].unique()]
-    month_order = [mon for mon in months if mon in df['month'].unique()]
-
-    # 4. 可视化 (一张图包含两个子图)
-    fig, (ax1, ax2) = plt.subplots(nrows=2, ncols=1, figsize=(15, 12))
+def _build_seasonality_figure(asset_name, day_stats, month_stats, fig=None):
+    """ fig 不为 None 时清空并复用这个 Figure (批量保存时不必每个资产都新建一个)。 """
+    if fig is None:
+        fig, (ax1, ax2) = plt.subplots(nrows=2, ncols=1, figsize=(15, 12))
+    else:
+        fig.clear()
+        ax1, ax2 = fig.subplots(nrows=2, ncols=1)
     fig.suptitle(f'Seasonality Analysis for {asset_name}', y=1.02, fontsize=16)
 
     # 子图 1: 周内效应 (Day of Week)
-    sns.boxplot(ax=ax1, data=df, x='day_of_week', y='returns', 
-                order=day_order, palette="pastel")
+    _draw_boxes(ax1, day_stats, "pastel")
     ax1.axhline(0, color='red', linestyle='--', alpha=0.7) # 零收益线
     ax1.set_title('Day-of-Week Effect')
     ax1.set_xlabel('Day of the Week')
     ax1.set_ylabel('Log Returns')
 
     # 子图 2: 月度效应 (Month of Year)
-    sns.boxplot(ax=ax2, data=df, x='month', y='returns', 
-                order=month_order, palette="Spectral")
+    _draw_boxes(ax2, month_stats, "Spectral")
     ax2.axhline(0, color='red', linestyle='--', alpha=0.7) # 零收益线
     ax2.set_title('Month-of-Year Effect')
     ax2.set_xlabel('Month')
     ax2.set_ylabel('Log Returns')
-    
-    plt.tight_layout(rect=[0, 0.03, 1, 0.98]) # 调整布局以适应主标题
 
-    # 5. 保存图表
+    fig.tight_layout(rect=[0, 0.03, 1, 0.98]) # 调整布局以适应主标题
+    return fig
+
+def _single_asset_stats(price_series, asset_name):
+    """ 单个资产的统计量；收益率为空或日期无法解析时打印原因并返回 None。 """
+    prices = price_series.dropna().to_frame(asset_name)
+    if not isinstance(prices.index, pd.DatetimeIndex):
+        try:
+            prices.index = pd.to_datetime(prices.index)
+        except Exception as e:
+            print(f"  Skipping {asset_name}: Could not convert index to Datetime. Error: {e}")
+            return None
+    stats = seasonality_box_stats(prices)
+    if asset_name not in stats:
+        print(f"  Skipping {asset_name}: Not enough data for returns.")
+        return None
+    return stats[asset_name]
+
+# --- [!! 新增的 API 函数 (给 Notebook 调用) !!] ---
+def plot_seasonality_show(price_series, asset_name):
+    """
+    (新增的 API - 供 Notebook 调用)
+    对 *单个资产* 的收益率进行“星期几”和“月份”效应分析，并“显示”图表。
+    """
+    print(f"  Analyzing Seasonality for {asset_name}...")
+    stats = _single_asset_stats(price_series, asset_name)
+    if stats is None:
+        return
+    _build_seasonality_figure(asset_name, *stats)
+
+    # --- [!! 核心区别: "显示" !!] ---
+    plt.show()
+
+# --- (队友的核心分析函数 - 100% 保留) ---
+def plot_seasonality(price_series, asset_name, save_dir, box_stats=None, fig=None, writer=None):
+    """
+    对 *单个资产* 的收益率进行“星期几”和“月份”效应分析。
+    box_stats: 可选，seasonality_box_stats() 里这个资产的 (day_stats, month_stats)；
+               批量运行时由 main() 一次算好传进来。
+    fig: 可选，传入时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    writer: 可选，AsyncFigureWriter；传入时 PNG 在后台线程编码写入。
+    """
+    print(f"  Analyzing Seasonality for {asset_name}...")
+
+    # 1. 统计量：收益率 -> 按星期/月份分组的四分位数和须线
+    if box_stats is None:
+        box_stats = _single_asset_stats(price_series, asset_name)
+        if box_stats is None:
+            return
+
+    # 2. 可视化 (一张图包含两个子图)
+    owns_fig = fig is None
+    fig = _build_seasonality_figure(asset_name, *box_stats, fig=fig)
+
+    # 3. 保存图表
     os.makedirs(save_dir, exist_ok=True) # [修复] 确保在函数内创建
     output_filename = f"seasonality_{asset_name}.png"
     output_path = os.path.join(save_dir, output_filename)
     
-    plt.savefig(output_path)
+    if writer is not None:
+        writer.save(fig, output_path)
+    else:
+        fig.savefig(output_path, dpi=100) # EDA 图不需要更高分辨率，固定下来不受 matplotlibrc 影响
     print(f"  Chart saved to {output_path}")
-    plt.close(fig)
+    if owns_fig:
+        plt.close(fig)
+
+# 进程池里每个 worker 进程自己的 Figure (由 _init_worker 创建)，同一进程处理的资产共用
+_worker_fig = None
+
+def _init_worker():
+    global _worker_fig
+    import matplotlib
+    matplotlib.use('Agg', force=True) # 子进程同样只用 Agg 后端
+    _worker_fig = new_figure(figsize=(15, 12))
+
+def _plot_one_asset(asset_name, box_stats, save_dir):
+    """ 进程池里画一个资产：统计量已由 main() 算好，不需要再传价格序列。 """
+    plot_seasonality(None, asset_name, save_dir, box_stats=box_stats, fig=_worker_fig)
 
 def main():
     """
@@ -207,9 +227,9 @@ def main():
     os.makedirs(local_save_dir, exist_ok=True)
     print(f"Charts will be saved to: {local_save_dir}")
 
-    print(f"Calling internal load_and_merge_data(data_directory='{local_data_dir}')...")
+    print(f"Calling shared load_and_merge_data(data_directory='{local_data_dir}')...")
     
-    merged_prices_df = load_and_merge_data(local_data_dir)
+    merged_prices_df = load_and_merge_data(local_data_dir, ffill=True)
 
     if merged_prices_df.empty:
         print("Error: Loader returned an empty DataFrame.")
@@ -217,19 +237,48 @@ def main():
 
     print(f"✅ Loader success. Loaded merged DataFrame with {len(merged_prices_df.columns)} assets.")
 
-    # 循环遍历 *合并后 DataFrame 的每一列*
-    for asset_name in merged_prices_df.columns:
-        price_series = merged_prices_df[asset_name].dropna()
-        
-        if isinstance(price_series, pd.Series) and not price_series.empty:
-            plot_seasonality(price_series, 
-                             asset_name, 
-                             local_save_dir)
-        else:
-            print(f"Skipping {asset_name}: No valid data.")
+    # 所有资产的收益率和分组统计一次算完，下面每个资产只负责画图
+    all_box_stats = seasonality_box_stats(merged_prices_df)
+
+    n_workers = min(os.cpu_count() or 1, len(all_box_stats))
+    if n_workers > 1:
+        # 只画图的部分分给多个进程，每个 worker 进程建一个 Figure，之后处理的资产都在上面重画；
+        # 用 spawn 启动 (不 fork 父进程里可能已启动的线程池，见 plot_acf_charts)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        assets = []
+        for asset_name in merged_prices_df.columns:
+            if asset_name in all_box_stats:
+                assets.append(asset_name)
+            else:
+                print(f"Skipping {asset_name}: No valid data.")
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as ex:
+            list(ex.map(_plot_one_asset, assets, [all_box_stats[a] for a in assets],
+                        [local_save_dir] * len(assets)))
+    else:
+        # 所有资产共用一个 (不经过 pyplot 的) Figure，每次 clear 后重画；PNG 编码在后台线程进行
+        fig = new_figure(figsize=(15, 12))
+        with AsyncFigureWriter() as writer:
+            # 循环遍历 *合并后 DataFrame 的每一列*
+            for asset_name in merged_prices_df.columns:
+                price_series = merged_prices_df[asset_name].dropna()
+                
+                if asset_name in all_box_stats:
+                    plot_seasonality(price_series, 
+                                     asset_name, 
+                                     local_save_dir,
+                                     box_stats=all_box_stats[asset_name],
+                                     fig=fig,
+                                     writer=writer)
+                else:
+                    print(f"Skipping {asset_name}: No valid data.")
             
     print("--- Seasonality 分析全部完成 ---")
 
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
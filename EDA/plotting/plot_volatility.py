@@ -4,91 +4,76 @@ import matplotlib.pyplot as plt
 import os
 import matplotlib.ticker as mticker
 import seaborn as sns 
-import glob # 确保导入
 import sys # 确保导入
 
-# -----------------------------------------------------------------
-# (数据加载函数 - 这是一个独立的 OHLCV 加载器)
-# (它和 'plot_candlestick.py' 里的加载器逻辑一致)
-# -----------------------------------------------------------------
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import load_and_merge_data as _load_and_merge_data  # noqa: E402
+from EDA.data_loader import read_asset_csv, list_csv_files, prefetch  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
+
+
+# --- 合并收盘价表 (Notebook 调用) ---
 def load_and_merge_data(data_directory):
-    # 1. 查找所有 CSV 文件
-    csv_files_path = os.path.join(data_directory, "*.csv")
-    files = glob.glob(csv_files_path)
-    if not files:
-        print(f"警告：在 '{data_directory}' 中没有找到 .csv 文件。")
-        return pd.DataFrame() 
-    
-    dfs = {}
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        try:
-            # [关键修复] 读取时不指定 parse_dates，避免因找不到列名报错
-            data = pd.read_csv(f, thousands=',')
-            
-            # 清理列名（去除空格或引号）
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            # [关键修复] 动态处理日期列：支持 'Index' 或 'Date'
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-            else:
-                # 如果两个都没有，跳过该文件
-                print(f"  跳过 {asset_name}: 缺少 'Date' 或 'Index' 列")
-                continue
-
-            # 提取 Close 列
-            if 'Close' in data.columns:
-                # 确保是数值类型
-                data['Close'] = pd.to_numeric(data['Close'], errors='coerce')
-                data.dropna(subset=['Date', 'Close'], inplace=True) 
-                
-                # 重命名 Close 为资产名称，方便后续合并
-                df = data[['Date', 'Close']].rename(columns={'Close': asset_name})
-                dfs[asset_name] = df
-            else:
-                print(f"  跳过 {asset_name}: 缺少 'Close' 列")
-                continue
-                
-        except Exception as e:
-            print(f" 警告: 加载 {f} 出错: {e}")
-
-    if not dfs:
-        print("❌ 错误: 未能从任何 CSV 文件中加载有效数据。")
-        return pd.DataFrame()
-
-    # 2. 合并所有数据
-    df_list = list(dfs.values())
-    merged = df_list[0]
-    for df_to_join in df_list[1:]:
-        # 使用 outer join 确保保留所有日期，避免因某个资产缺失某天数据导致整行被删
-        merged = merged.merge(df_to_join, on='Date', how='outer')
-    
-    # 3. 设置索引并排序
-    merged.set_index('Date', inplace=True)
-    merged.sort_index(inplace=True) 
-    
-    # 4. 填充缺失值 (Forward Fill) - 这是一个可选但推荐的操作，防止计算指标时因 NaN 报错
-    merged.ffill(inplace=True) 
-    
-    return merged
+    """
+    合并所有资产的收盘价 (Date 索引，每个资产一列)，已向前填充，float64。
+    保持这个脚本原来的返回值；实际加载走共享的 EDA.data_loader.load_and_merge_data
+    (一次 concat 按日期对齐，带 Parquet 缓存)。
+    """
+    return _load_and_merge_data(data_directory, ffill=True, dtype=np.float64)
 
 
+# --- 0. 单个资产的 OHLCV 加载器 (Notebook 和本地运行共用) ---
+def load_single_asset_ohlcv(csv_file_path):
+    """
+    加载并清洗*单个* CSV 文件，返回 Date 索引、小写列名 (open/high/low/close/volume) 的 DataFrame。
+    读取走 read_asset_csv 的 Parquet 缓存 (见 EDA/data_loader.py)，同一个 CSV 只在第一次解析。
+    出错或清洗后为空时打印警告并返回 None。
+    """
+    try:
+        data = read_asset_csv(csv_file_path)
+        
+        if 'Index' in data.columns:
+            data.rename(columns={'Index': 'Date'}, inplace=True)
+        
+        if 'Date' in data.columns:
+            data['Date'] = pd.to_datetime(data['Date'])
+            data.set_index('Date', inplace=True)
+        
+        # 转换列名为小写以匹配计算函数
+        data.columns = data.columns.str.lower()
+        for col in ['open', 'high', 'low', 'close', 'volume']:
+            if col in data.columns:
+                data[col] = pd.to_numeric(data[col], errors='coerce')
+        
+        data.dropna(inplace=True)
+        return data if not data.empty else None
+    except Exception as e:
+        print(f"  警告: 加载 {csv_file_path} 出错: {e}")
+        return None
 
 # --- 1. 队友的 ATR 计算函数 (完美, 保留) ---
 def calculate_atr(df, length=14):
     """
     计算 Average True Range (ATR)。
     """
-    high_low = df['high'] - df['low']
-    high_close = np.abs(df['high'] - df['close'].shift(1))
-    low_close = np.abs(df['low'] - df['close'].shift(1))
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = df['close'].to_numpy(dtype=np.float64)
+    prev_close = np.empty_like(close) # = close.shift(1)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
     
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = ranges.max(axis=1)
+    high_low = high - low
+    high_close = np.abs(high - prev_close)
+    low_close = np.abs(low - prev_close)
+    
+    # 三列逐元素取最大 (fmax 跳过 NaN，和 concat(...).max(axis=1) 一样)，
+    # 不再拼出一个 3 列的 DataFrame 再按行求最大
+    true_range = pd.Series(np.fmax(high_low, np.fmax(high_close, low_close)), index=df.index)
     
     atr = true_range.ewm(span=length, adjust=False).mean()
     
@@ -96,18 +81,20 @@ def calculate_atr(df, length=14):
 
 # --- 2. 核心绘图逻辑 (来自队友, 封装为 API) ---
 
-def _plot_volatility_core(ohlcv_df, asset_name):
+def _plot_volatility_core(ohlcv_df, asset_name, fig=None):
     """
     (V2 辅助函数)
     包含队友的所有核心计算和绘图设置，返回 fig, ax1。
+    fig 不为 None 时清空并复用这个 Figure (批量保存时不必每个资产都新建一个)。
     """
-    plot_df = ohlcv_df.copy() 
-    
     # 队友的核心计算
-    plot_df['Log_Returns'] = np.log(plot_df['close'] / plot_df['close'].shift(1))
-    plot_df['Vol_20D'] = plot_df['Log_Returns'].rolling(window=20).std() * np.sqrt(252) # 年化
-    plot_df['Vol_60D'] = plot_df['Log_Returns'].rolling(window=60).std() * np.sqrt(252) # 年化
-    plot_df['ATR'] = calculate_atr(plot_df, length=14)
+    # 只把画图要用的三列一次组装成 DataFrame，不再拷贝整张 OHLCV 表再逐列插入
+    log_returns = np.log(ohlcv_df['close']).diff() # = log(p_t) - log(p_{t-1})，不用先相除
+    plot_df = pd.DataFrame({
+        'Vol_20D': log_returns.rolling(window=20).std() * np.sqrt(252), # 年化
+        'Vol_60D': log_returns.rolling(window=60).std() * np.sqrt(252), # 年化
+        'ATR': calculate_atr(ohlcv_df, length=14),
+    })
     
     plot_df.dropna(subset=['Vol_60D', 'ATR'], inplace=True)
     
@@ -117,7 +104,11 @@ def _plot_volatility_core(ohlcv_df, asset_name):
         
     # 队友的绘图设置
     plt.style.use('seaborn-v0_8-whitegrid')
-    fig, ax1 = plt.subplots(figsize=(14, 6))
+    if fig is None:
+        fig, ax1 = plt.subplots(figsize=(14, 6))
+    else:
+        fig.clear() # 连同 twinx 的右轴和 fig.legend 一起清掉
+        ax1 = fig.subplots()
 
     ax1.plot(plot_df.index, plot_df['Vol_60D'], label='60-Day Ann. Rolling StDev (Smoothed)', color='tab:blue', linewidth=1.5)
     ax1.plot(plot_df.index, plot_df['Vol_20D'], label='20-Day Ann. Rolling StDev (Sensitive)', color='tab:blue', alpha=0.5, linestyle='--')
@@ -144,23 +135,69 @@ def plot_volatility_analysis_v2(ohlcv_df, asset_name):
     if fig is not None:
         plt.show()
 
-def save_volatility_analysis_v2(ohlcv_df, asset_name, save_path=""):
+def save_volatility_analysis_v2(ohlcv_df, asset_name, save_path="", fig=None, writer=None):
     """
     (供本地运行调用)
     绘制 V2 波动率图表并 'savefig()'。
+    fig: 可选，传入时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    writer: 可选，AsyncFigureWriter；传入时 PNG 在后台线程编码写入。
     """
-    fig, ax1 = _plot_volatility_core(ohlcv_df, asset_name)
-    if fig is None:
+    owns_fig = fig is None
+    fig, ax1 = _plot_volatility_core(ohlcv_df, asset_name, fig=fig)
+    if ax1 is None:
         return # 如果绘图失败，则不保存
 
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    fig.savefig(save_path, bbox_inches='tight') 
-    plt.close(fig) 
+    if writer is not None:
+        writer.save(fig, save_path, bbox_inches='tight')
+    else:
+        fig.savefig(save_path, bbox_inches='tight') 
+    if owns_fig:
+        plt.close(fig) 
     print(f"  [V2] 图表已保存到: {save_path}")
 
 
 # --- 3. 主执行逻辑 (Standalone Runner) ---
+# 进程池里每个 worker 进程自己的 Figure (由 _init_worker 创建)，同一进程处理的资产共用
+_worker_fig = None
+
+def _init_worker():
+    global _worker_fig
+    import matplotlib
+    matplotlib.use('Agg', force=True) # 子进程同样只用 Agg 后端
+    _worker_fig = new_figure(figsize=(14, 6))
+
+def _process_one_asset(asset_name, full_df, save_dir, fig=None, writer=None):
+    """
+    单个资产的画图 + 保存；full_df 为 None (加载失败) 时跳过。
+    fig 为 None 时用本进程的 _worker_fig (不在进程池里时就每次新建)。
+    """
+    if fig is None:
+        fig = _worker_fig
+    print(f"  正在处理: {asset_name}")
+    
+    if full_df is not None:
+        # 构造保存路径，调用我们新的“保存”函数
+        save_file_path = os.path.join(save_dir, f"{asset_name}_volatility_v2_atr.png")
+        save_volatility_analysis_v2(full_df, asset_name, save_path=save_file_path, fig=fig, writer=writer)
+    else:
+        print(f"  [跳过] {asset_name} 因加载失败而被跳过。")
+
+def _process_one_file(csv_file_path, save_dir):
+    """
+    单个 CSV 的完整流程 (读取 -> 计算 -> 画图 -> 保存)。
+    各文件互不依赖，独立运行时分给多个进程并行 (pandas 计算和 Agg 渲染都占着 GIL)。
+    """
+    asset_name = os.path.basename(csv_file_path).split('.')[0]
+    _process_one_asset(asset_name, load_single_asset_ohlcv(csv_file_path), save_dir)
+
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
     
     dataset_name = "PART1"
     if len(sys.argv) > 1:
@@ -172,7 +209,7 @@ if __name__ == "__main__":
     SAVE_DIR = f"./EDA/output/{dataset_name}/charts/volatility/" 
 
     print(f"正在从 '{DATA_PATH}' 加载数据...")
-    csv_files = glob.glob(os.path.join(DATA_PATH, '*.csv'))
+    csv_files = list_csv_files(DATA_PATH)
     
     if not csv_files:
         print(f"错误：在 '{DATA_PATH}' 文件夹里没有找到任何 .csv 文件。")
@@ -180,43 +217,21 @@ if __name__ == "__main__":
         
     print(f"找到了 {len(csv_files)} 个 CSV 文件。开始批量处理...")
 
-    for csv_file_path in csv_files:
-        asset_name = os.path.basename(csv_file_path).split('.')[0]
-        print(f"  正在处理: {asset_name}")
-        
-        # --- [!! 关键升级 !!] ---
-        # 1. 加载单个资产的 OHLCV 数据
-        try:
-            data = pd.read_csv(csv_file_path, thousands=',')
-            data.columns = data.columns.str.strip().str.strip('"')
-            
-            if 'Index' in data.columns:
-                data.rename(columns={'Index': 'Date'}, inplace=True)
-            
-            if 'Date' in data.columns:
-                data['Date'] = pd.to_datetime(data['Date'])
-                data.set_index('Date', inplace=True)
-            
-            # 转换列名为小写以匹配计算函数
-            data.columns = data.columns.str.lower()
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                if col in data.columns:
-                    data[col] = pd.to_numeric(data[col], errors='coerce')
-            
-            data.dropna(inplace=True)
-            full_df = data if not data.empty else None
-        except Exception as e:
-            print(f"  警告: 加载 {csv_file_path} 出错: {e}")
-            full_df = None
-        # --- [升级结束] ---
-        
-        if full_df is not None:
-            # 2. 构造保存路径
-            save_file_path = os.path.join(SAVE_DIR, f"{asset_name}_volatility_v2_atr.png")
-            
-            # 3. 调用我们新的“保存”函数
-            save_volatility_analysis_v2(full_df, asset_name, save_path=save_file_path)
-        else:
-            print(f"  [跳过] {asset_name} 因加载失败而被跳过。")
+    n_workers = min(os.cpu_count() or 1, len(csv_files))
+    if n_workers > 1:
+        # 每个进程自己读取 + 画图 (加载失败时 load_single_asset_ohlcv 已打印警告并返回 None)；
+        # 每个 worker 进程建一个 Figure，之后处理的资产都在上面重画；
+        # 用 spawn 启动 (不 fork 父进程里可能已启动的线程池，见 plot_acf_charts)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as ex:
+            list(ex.map(partial(_process_one_file, save_dir=SAVE_DIR), csv_files))
+    else:
+        # 单核时顺序处理：后台线程提前读取 + 清洗后面的 CSV，和当前资产的计算/画图重叠；
+        # 所有资产共用一个 Figure，每次 clear 后重画，PNG 编码交给后台线程
+        fig = new_figure(figsize=(14, 6))
+        with AsyncFigureWriter() as writer:
+            for csv_file_path, pending in prefetch(load_single_asset_ohlcv, csv_files):
+                asset_name = os.path.basename(csv_file_path).split('.')[0]
+                _process_one_asset(asset_name, pending.result(), SAVE_DIR, fig=fig, writer=writer)
             
-    print("--- 波动率图表批量生成和保存完毕 ---")
\ No newline at end of file
+    print("--- 波动率图表批量生成和保存完毕 ---")
@@ -3,10 +3,16 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns 
 import os
-import glob
 from scipy import stats
 import sys # 确保导入 sys
 
+# numba 是可选依赖：装了就用 JIT 内核做平滑和滚动求和，没装就用 pandas 的 ewm / rolling
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 # --- 配置 ---
 # [路径修复] 我们的 'charts' 文件夹在 'EDA' 内部
 CHARTS_BASE_DIR = "./EDA/output/charts" 
@@ -16,6 +22,14 @@ VOLUME_SAVE_DIR = os.path.join(CHARTS_BASE_DIR, "volume_analysis") # 新子文
 DATA_DIR_PATH = "./DATA/PART1/" 
 # ---
 
+# 直接运行脚本 (python EDA/plotting/xxx.py) 时，项目根目录不在 sys.path 里
+PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJ_ROOT not in sys.path:
+    sys.path.insert(0, PROJ_ROOT)
+
+from EDA.data_loader import read_asset_csv, list_csv_files, forward_returns, prefetch  # noqa: E402
+from EDA.figure_writer import AsyncFigureWriter, new_figure  # noqa: E402
+
 # --- 策略参数 ---
 RSI_PERIOD = 14
 MFI_PERIOD = 14
@@ -27,41 +41,145 @@ FORWARD_RETURN_DAYS = 5
 # --- 辅助函数 (自包含) ---
 # (这些函数 100% 正确，无需改动)
 
+def _diff(values):
+    """ values.diff(1) 的 ndarray 版本 (第一个是 NaN)。 """
+    out = np.empty_like(values)
+    out[:1] = np.nan
+    out[1:] = values[1:] - values[:-1]
+    return out
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _wilder_smooth(values, period):
+        """
+        逐列的 ewm(alpha=1/period, adjust=False, min_periods=period).mean()。
+        递推 (包括 NaN 的处理) 和 pandas 的实现逐步相同，结果逐位一致 (所以不用 fastmath)。
+        """
+        n_rows, n_cols = values.shape
+        out = np.full((n_rows, n_cols), np.nan)
+        if n_rows == 0:
+            return out
+        # pandas 先把 alpha 换算成 com 再换回来，这里照做，舍入才一致
+        com = (1.0 - 1.0 / period) / (1.0 / period)
+        alpha = 1.0 / (1.0 + com)
+        decay = 1.0 - alpha
+        for j in range(n_cols):
+            weighted = values[0, j]
+            nobs = 0 if np.isnan(weighted) else 1
+            old_wt = 1.0
+            new_wt = alpha
+            if nobs >= period:
+                out[0, j] = weighted
+            for i in range(1, n_rows):
+                cur = values[i, j]
+                is_obs = not np.isnan(cur)
+                nobs += is_obs
+                if not np.isnan(weighted):
+                    old_wt *= decay
+                    if com == 1.0:
+                        # pandas 在 com == 1 (period == 2) 时用 1 - old_wt 作为新值的权重
+                        new_wt = 1.0 - old_wt
+                    if is_obs:
+                        if weighted != cur:
+                            weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                        old_wt = 1.0
+                elif is_obs:
+                    weighted = cur
+                if nobs >= period:
+                    out[i, j] = weighted
+        return out
+
+    @njit(cache=True)
+    def _rolling_sum(values, window):
+        """
+        逐列的 rolling(window, min_periods=window).sum()。
+        和 pandas 一样做 Kahan 补偿的滑动加减，窗口里全是同一个值时直接返回 值 * 个数，结果逐位一致。
+        """
+        n_rows, n_cols = values.shape
+        out = np.full((n_rows, n_cols), np.nan)
+        for j in range(n_cols):
+            nobs = 0
+            sum_x = 0.0
+            comp_add = 0.0
+            comp_remove = 0.0
+            n_same = 0
+            prev_value = values[0, j] if n_rows > 0 else np.nan
+            for i in range(n_rows):
+                # 先减去离开窗口的值，再加上新进入的值 (和 pandas 的顺序相同)
+                if i >= window:
+                    val = values[i - window, j]
+                    if not np.isnan(val):
+                        nobs -= 1
+                        y = -val - comp_remove
+                        t = sum_x + y
+                        comp_remove = t - sum_x - y
+                        sum_x = t
+                val = values[i, j]
+                if not np.isnan(val):
+                    nobs += 1
+                    y = val - comp_add
+                    t = sum_x + y
+                    comp_add = t - sum_x - y
+                    sum_x = t
+                    if val == prev_value:
+                        n_same += 1
+                    else:
+                        n_same = 1
+                    prev_value = val
+                if nobs >= window:
+                    out[i, j] = prev_value * nobs if n_same >= nobs else sum_x
+        return out
+
 def calculate_rsi(series, period=RSI_PERIOD):
-    """ (从 plot_rsi_analysis.py 复制而来) """
-    delta = series.diff(1)
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.ewm(com=period - 1, min_periods=period).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period).mean()
+    """
+    (从 plot_rsi_analysis.py 复制而来)
+    差分和涨跌拆分直接在 ndarray 上做，两条平滑放进同一个 ewm 调用 (逐列计算，结果和分开算相同)。
+    """
+    delta = _diff(series.to_numpy(dtype=np.float64))
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    # Wilder's Smoothing (RMA)，和 plot_rsi_analysis.calculate_rsi 相同
+    if HAS_NUMBA:
+        smoothed = _wilder_smooth(np.column_stack((gain, loss)), period)
+    else:
+        smoothed = pd.DataFrame({'gain': gain, 'loss': loss}).ewm(
+            alpha=1.0 / period, adjust=False, min_periods=period).mean().to_numpy()
+    avg_gain, avg_loss = smoothed[:, 0], smoothed[:, 1]
     if avg_loss.all() == 0:
          # 避免除以零，返回中性值
         return pd.Series(index=series.index, data=50)
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100 - (100 / (1 + rs))
+    return pd.Series(rsi, index=series.index, name=series.name)
 
 def calculate_mfi(high, low, close, volume, period=MFI_PERIOD):
     """
-    使用纯 pandas 计算 MFI (资金流指标)。
+    计算 MFI (资金流指标)。
+    逐元素的部分直接在 ndarray 上算，两条滚动求和放进同一个 rolling 调用。
     """
-    typical_price = (high + low + close) / 3
-    raw_money_flow = typical_price * volume
-    price_change = typical_price.diff(1)
+    typical_price = (high.to_numpy(dtype=np.float64) + low.to_numpy(dtype=np.float64)
+                     + close.to_numpy(dtype=np.float64)) / 3
+    raw_money_flow = typical_price * volume.to_numpy(dtype=np.float64)
+    price_change = _diff(typical_price)
     
-    pos_money_flow = raw_money_flow.where(price_change > 0, 0)
-    neg_money_flow = raw_money_flow.where(price_change < 0, 0)
+    pos_money_flow = np.where(price_change > 0, raw_money_flow, 0.0)
+    neg_money_flow = np.where(price_change < 0, raw_money_flow, 0.0)
     
-    pos_mf_sum = pos_money_flow.rolling(window=period, min_periods=period).sum()
-    neg_mf_sum = neg_money_flow.rolling(window=period, min_periods=period).sum()
+    if HAS_NUMBA:
+        mf_sums = _rolling_sum(np.column_stack((pos_money_flow, neg_money_flow)), period)
+    else:
+        mf_sums = pd.DataFrame({'pos': pos_money_flow, 'neg': neg_money_flow}).rolling(
+            window=period, min_periods=period).sum().to_numpy()
+    pos_mf_sum, neg_mf_sum = mf_sums[:, 0], mf_sums[:, 1]
     
     # [修复] 避免除以零
     money_ratio = pos_mf_sum / (neg_mf_sum + 1e-9) # 添加一个极小值
     mfi = 100 - (100 / (1 + money_ratio))
     
     # 将 MFI 限制在 0-100 范围内 (滚动计算可能产生小误差)
-    mfi = mfi.clip(0, 100)
-    return mfi
+    mfi = np.clip(mfi, 0, 100)
+    return pd.Series(mfi, index=close.index)
 
 def load_single_asset_ohlcv(csv_file_path):
     """
@@ -69,9 +187,8 @@ def load_single_asset_ohlcv(csv_file_path):
     这是一个健壮的加载器，可以处理 'Index' 或 'Date' 列。
     """
     try:
-        # 1. 读取 CSV，不预设日期列
-        df = pd.read_csv(csv_file_path, thousands=',')
-        df.columns = df.columns.str.strip().str.strip('"')
+        # 1. 读取 CSV (带 Parquet 缓存，列名已清洗，见 EDA/data_loader.py)
+        df = read_asset_csv(csv_file_path)
 
         # 2. 动态识别并统一日期列
         if 'Index' in df.columns:
@@ -120,7 +237,7 @@ def plot_volume_signal_analysis(df, asset_name):
 
     df['rsi'] = calculate_rsi(df['close'], period=RSI_PERIOD)
     df['mfi'] = calculate_mfi(df['high'], df['low'], df['close'], df['volume'], period=MFI_PERIOD)
-    df['fwd_returns'] = df['close'].pct_change(FORWARD_RETURN_DAYS).shift(-FORWARD_RETURN_DAYS)
+    df['fwd_returns'] = forward_returns(df['close'], FORWARD_RETURN_DAYS)
     df.dropna(inplace=True)
     if df.empty:
         print(f"  Skipping {asset_name}: Not enough data.")
@@ -173,53 +290,55 @@ def plot_volume_signal_analysis(df, asset_name):
     
     # --- [!! 核心区别: "显示" !!] ---
     plt.show()
-def analyze_volume_signal(df, asset_name, save_dir):
+def analyze_volume_signal(df, asset_name, save_dir, fig=None, writer=None):
     """
     (此函数 100% 正确，无需改动)
     对 *单个资产* 的 RSI vs RSI+MFI 信号进行对比分析。
+    fig: 可选，传入时在这个 Figure 上重画并保存，由调用方负责最后 close。
+    writer: 可选，AsyncFigureWriter；传入时 PNG 在后台线程编码写入。
     """
     print(f"  Analyzing Volume-Filtered Signals for {asset_name}...")
 
-    # 1. 计算指标
-    df['rsi'] = calculate_rsi(df['close'], period=RSI_PERIOD)
-    df['mfi'] = calculate_mfi(df['high'], df['low'], df['close'], df['volume'], period=MFI_PERIOD)
+    # 1. 计算指标 (都取成 ndarray：不往 df 里加列，也不对整张 OHLCV 表做 dropna)
+    rsi = calculate_rsi(df['close'], period=RSI_PERIOD).to_numpy()
+    mfi = calculate_mfi(df['high'], df['low'], df['close'], df['volume'], period=MFI_PERIOD).to_numpy()
     
     # 2. 计算未来收益
-    df['fwd_returns'] = df['close'].pct_change(FORWARD_RETURN_DAYS).shift(-FORWARD_RETURN_DAYS)
+    fwd = forward_returns(df['close'], FORWARD_RETURN_DAYS).to_numpy()
     
-    df.dropna(inplace=True)
-    if df.empty:
+    # 三个指标都有值的行 (df 本身已由加载器清洗过，只有指标在首尾有 NaN)
+    valid = ~(np.isnan(rsi) | np.isnan(mfi) | np.isnan(fwd))
+    if not valid.any():
         print(f"  Skipping {asset_name}: Not enough data.")
         return
 
     # 3. 定义信号组 (这是核心对比)
-    signals_rsi_only = df[df['rsi'] < OVERSOLD_THRESHOLD]
-    signals_rsi_and_mfi = df[
-        (df['rsi'] < OVERSOLD_THRESHOLD) & 
-        (df['mfi'] < OVERSOLD_THRESHOLD) # MFI 也超卖 (即恐慌性抛售)
-    ]
+    rsi_signal = valid & (rsi < OVERSOLD_THRESHOLD)
+    rsi_only_fwd = fwd[rsi_signal]
+    both_fwd = fwd[rsi_signal & (mfi < OVERSOLD_THRESHOLD)] # MFI 也超卖 (即恐慌性抛售)
 
-    if signals_rsi_only.empty:
+    if rsi_only_fwd.size == 0:
         print(f"  Skipping {asset_name}: No RSI signals found.")
         return
-    if signals_rsi_and_mfi.empty:
+    if both_fwd.size == 0:
         print(f"  Skipping {asset_name}: No MFI-confirmed signals found.")
         return
 
     # 4. 统计分析
+    rsi_only_mean, both_mean = rsi_only_fwd.mean(), both_fwd.mean()
     print(f"\n--- Volume Filter Analysis for {asset_name} (N={FORWARD_RETURN_DAYS} Days) ---")
     print(f"  Signal (RSI < {OVERSOLD_THRESHOLD}):")
-    print(f"    Signal Count: {len(signals_rsi_only)}")
-    print(f"    Avg. Fwd Return: {signals_rsi_only['fwd_returns'].mean():.4f}")
+    print(f"    Signal Count: {rsi_only_fwd.size}")
+    print(f"    Avg. Fwd Return: {rsi_only_mean:.4f}")
     
     print(f"\n  Signal (RSI < {OVERSOLD_THRESHOLD} AND MFI < {OVERSOLD_THRESHOLD}):")
-    print(f"    Signal Count: {len(signals_rsi_and_mfi)} (Filtered out {len(signals_rsi_only) - len(signals_rsi_and_mfi)} signals)")
-    print(f"    Avg. Fwd Return: {signals_rsi_and_mfi['fwd_returns'].mean():.4f}")
+    print(f"    Signal Count: {both_fwd.size} (Filtered out {rsi_only_fwd.size - both_fwd.size} signals)")
+    print(f"    Avg. Fwd Return: {both_mean:.4f}")
 
     # t-检验：(B 组) vs (A 组)
     t_stat, p_value = stats.ttest_ind(
-        signals_rsi_and_mfi['fwd_returns'], 
-        signals_rsi_only['fwd_returns'], 
+        both_fwd, 
+        rsi_only_fwd, 
         equal_var=False, 
         alternative='greater' # 检验 B 组是否 *显著更好*
     )
@@ -232,26 +351,63 @@ def analyze_volume_signal(df, asset_name, save_dir):
     print("--------------------------------------------------")
 
     # 5. 可视化
-    plt.figure(figsize=(12, 7))
-    sns.histplot(signals_rsi_only['fwd_returns'], kde=True, bins=50, 
-                 color='blue', label=f'RSI-Only (Avg: {signals_rsi_only["fwd_returns"].mean():.4f})', 
-                 stat="density")
-    sns.histplot(signals_rsi_and_mfi['fwd_returns'], kde=True, bins=50, 
-                 color='green', label=f'RSI+MFI (Avg: {signals_rsi_and_mfi["fwd_returns"].mean():.4f})', 
-                 stat="density")
+    owns_fig = fig is None
+    if fig is None:
+        fig, ax = plt.subplots(figsize=(12, 7))
+    else:
+        fig.clear()
+        ax = fig.subplots()
+    sns.histplot(rsi_only_fwd, kde=True, bins=50, 
+                 color='blue', label=f'RSI-Only (Avg: {rsi_only_mean:.4f})', 
+                 stat="density", ax=ax)
+    sns.histplot(both_fwd, kde=True, bins=50, 
+                 color='green', label=f'RSI+MFI (Avg: {both_mean:.4f})', 
+                 stat="density", ax=ax)
     
-    plt.title(f'Signal Quality Comparison for {asset_name}')
-    plt.xlabel(f'Forward {FORWARD_RETURN_DAYS}-Day Return')
-    plt.legend()
+    ax.set_title(f'Signal Quality Comparison for {asset_name}')
+    ax.set_xlabel(f'Forward {FORWARD_RETURN_DAYS}-Day Return')
+    ax.legend()
     
     # 6. 保存图表
     output_filename = f"volume_filter_comp_{asset_name}.png"
     output_path = os.path.join(save_dir, output_filename)
-    plt.savefig(output_path)
+    if writer is not None:
+        writer.save(fig, output_path)
+    else:
+        fig.savefig(output_path)
     print(f"  Chart saved to {output_path}")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 
+# 进程池里每个 worker 进程自己的 Figure (由 _init_worker 创建)，同一进程处理的资产共用
+_worker_fig = None
+
+def _init_worker():
+    global _worker_fig
+    import matplotlib
+    matplotlib.use('Agg', force=True) # 子进程同样只用 Agg 后端
+    _worker_fig = new_figure(figsize=(12, 7))
+
+def _process_one_asset(asset_name, df, save_dir, fig=None, writer=None):
+    """
+    加载成功 (df 非空) 时分析单个资产；错误和跳过信息由加载器内部打印。
+    fig 为 None 时用本进程的 _worker_fig (不在进程池里时就每次新建)。
+    """
+    if fig is None:
+        fig = _worker_fig
+    if df is not None and not df.empty:
+        # 传入 *完整的* DataFrame 进行分析
+        analyze_volume_signal(df, asset_name, save_dir, fig=fig, writer=writer)
+
+def _process_one_file(csv_file_path, save_dir):
+    """
+    单个 CSV 的完整流程 (读取 -> 指标 -> 检验 -> 画图 -> 保存)。
+    各文件互不依赖，独立运行时分给多个进程并行 (pandas 计算和 Agg 渲染都占着 GIL)。
+    """
+    asset_name = os.path.basename(csv_file_path).split('.')[0]
+    _process_one_asset(asset_name, load_single_asset_ohlcv(csv_file_path), save_dir)
+
 def main():
     """
     主执行函数：独立加载数据，循环处理。
@@ -269,8 +425,7 @@ def main():
     print(f"Charts & stats will be saved to: {local_save_dir}")
 
     # 1. 独立查找所有 CSV 文件
-    csv_files_path = os.path.join(local_data_dir, "*.csv")
-    files = glob.glob(csv_files_path)
+    files = list_csv_files(local_data_dir)
     
     if not files:
         print(f"❌ 错误: 在 '{local_data_dir}' 中没有找到 .csv 文件。")
@@ -279,19 +434,30 @@ def main():
 
     print(f"Found {len(files)} assets. Processing...")
 
-    # 2. 循环加载和分析
-    for f in files:
-        asset_name = os.path.basename(f).split('.')[0]
-        
-        # 调用新的健壮加载器
-        df = load_single_asset_ohlcv(f)
-        
-        if df is not None and not df.empty:
-            # 传入 *完整的* DataFrame 进行分析
-            analyze_volume_signal(df, asset_name, local_save_dir)
-        # 错误和跳过信息现在由加载器内部处理
+    n_workers = min(os.cpu_count() or 1, len(files))
+    if n_workers > 1:
+        # 2. 各资产互不依赖：分给多个进程，每个进程自己加载 + 分析，
+        #    每个 worker 进程建一个 Figure，之后处理的资产都在上面重画；
+        #    用 spawn 启动 (不 fork 父进程里可能已启动的线程池，见 plot_acf_charts)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as ex:
+            list(ex.map(partial(_process_one_file, save_dir=local_save_dir), files))
+    else:
+        # 2. 单核时循环加载和分析 (后台线程提前读取后面的 CSV，和当前资产的分析/画图重叠)；
+        #    所有资产共用一个 Figure，每次 clear 后重画，PNG 编码交给后台线程
+        fig = new_figure(figsize=(12, 7))
+        with AsyncFigureWriter() as writer:
+            for f, pending in prefetch(load_single_asset_ohlcv, files):
+                asset_name = os.path.basename(f).split('.')[0]
+                _process_one_asset(asset_name, pending.result(), local_save_dir, fig=fig, writer=writer)
             
     print("--- Volume 信号分析全部完成 ---")
 
 if __name__ == "__main__":
+    # 独立运行只保存图片，用非交互的 Agg 后端 (Notebook 调用的 plot_* 函数不受影响)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
     main()
\ No newline at end of file
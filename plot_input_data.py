@@ -46,7 +46,7 @@ def plot_price_data(data_path=".", output_dir=None, normalise=False, selected_se
         if "Close" not in df.columns:
             print(f"Skipping {name}: missing 'Close' column.")
             continue
-        df = df[["Date", "Close"]].rename(columns={"Close": name})
+        df = df[["Date", "Close"]].rename(columns={"Close": name}).set_index("Date")
         dfs[name] = df
 
     # --- Filter only selected series if provided ---
@@ -65,11 +65,9 @@ def plot_price_data(data_path=".", output_dir=None, normalise=False, selected_se
         print(f"Plotting all {len(dfs)} available series.")
 
     # --- Merge all dataframes on 'Date' ---
-    merged = dfs[list(dfs.keys())[0]]
-    for name, df in list(dfs.items())[1:]:
-        merged = merged.merge(df, on="Date", how="inner")
-
-    merged.set_index("Date", inplace=True)
+    # One concat aligns every series on the shared dates at once (no chain of pairwise merges)
+    merged = pd.concat(dfs.values(), axis=1, join="inner").sort_index()
+    merged.index.name = "Date"
 
     # --- Plot Close prices ---
     plt.figure(figsize=(12, 6))
@@ -110,6 +108,10 @@ def plot_price_data(data_path=".", output_dir=None, normalise=False, selected_se
 if __name__ == "__main__":
     import argparse
 
+    # Only saves PNGs: use the non-interactive Agg backend (importers are unaffected)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
     parser = argparse.ArgumentParser(description="Plot price data from multiple CSVs.")
     parser.add_argument("--data-path", default="./DATA/PART2",
                         help="Directory containing the CSV files.")
@@ -0,0 +1,24 @@
+# tests/test_eda_acf.py
+import numpy as np
+import pytest
+
+stattools = pytest.importorskip("statsmodels.tsa.stattools")
+
+from EDA.plotting.plot_acf_charts import _acf_pacf_cached
+
+# ---- test 1: FFT ACF + Levinson-Durbin PACF match statsmodels ---------------
+
+@pytest.mark.parametrize("transform", [lambda x: x, np.abs])
+def test_acf_pacf_match_statsmodels(transform):
+    rng = np.random.default_rng(0)
+    values = np.ascontiguousarray(transform(rng.standard_t(4, 800) * 0.01))
+    nlags, alpha = 40, 0.05
+
+    acf_vals, acf_conf, pacf_vals, pacf_conf = _acf_pacf_cached(values.tobytes(), nlags, alpha)
+
+    exp_acf, exp_acf_conf = stattools.acf(values, nlags=nlags, alpha=alpha, fft=True)
+    exp_pacf, exp_pacf_conf = stattools.pacf(values, nlags=nlags, alpha=alpha, method="ywm")
+    np.testing.assert_allclose(acf_vals, exp_acf, atol=1e-12)
+    np.testing.assert_allclose(acf_conf, exp_acf_conf, atol=1e-12)
+    np.testing.assert_allclose(pacf_vals, exp_pacf, atol=1e-12)
+    np.testing.assert_allclose(pacf_conf, exp_pacf_conf, atol=1e-12)
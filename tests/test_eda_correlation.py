@@ -0,0 +1,54 @@
+# tests/test_eda_correlation.py
+import numpy as np
+import pandas as pd
+
+from EDA.plotting.plot_correlation_heatmap import _correlation_matrix
+
+# ---- test 1: correlation matrix matches pandas, with and without gaps -------
+
+def test_correlation_matrix_matches_pandas_corr():
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0, 0.01, (60, 5)), columns=list("abcde"))
+    pd.testing.assert_frame_equal(_correlation_matrix(returns), returns.corr(), atol=1e-12)
+
+    # pairwise-complete: every pair only uses the days where both assets have data
+    gappy = returns.mask(rng.random(returns.shape) < 0.3)
+    gappy["e"] = np.nan
+    gappy.loc[0, "e"] = 0.01  # a single observation: correlations must be NaN like pandas
+    pd.testing.assert_frame_equal(_correlation_matrix(gappy), gappy.corr(), atol=1e-12)
+
+# ---- test 2: repeated calls reuse the cached matrix but return fresh frames -
+
+def test_correlation_matrix_cached_per_data():
+    from EDA.plotting.plot_correlation_heatmap import _correlation_cached
+
+    returns = pd.DataFrame(np.random.default_rng(1).normal(0, 0.01, (40, 3)), columns=list("xyz"))
+    first = _correlation_matrix(returns)
+    hits = _correlation_cached.cache_info().hits
+    first.iloc[0, 1] = 5.0  # editing one result must not leak into the cache
+
+    second = _correlation_matrix(returns)
+    assert _correlation_cached.cache_info().hits == hits + 1
+    pd.testing.assert_frame_equal(second, returns.corr(), atol=1e-12)
+
+    # changed data must not hit the old entry
+    returns.iloc[0, 0] += 0.01
+    pd.testing.assert_frame_equal(_correlation_matrix(returns), returns.corr(), atol=1e-12)
+
+# ---- test 3: heatmap has one tick per asset and annotates every finite cell -
+
+def test_draw_heatmap_annotations():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from EDA.plotting.plot_correlation_heatmap import _draw_heatmap
+
+    corr = pd.DataFrame([[1.0, np.nan], [-0.05, 1.0]], index=list("ab"), columns=list("ab"))
+    fig, ax = plt.subplots()
+    _draw_heatmap(ax, corr, annot=True)
+    texts = [(t.get_text(), t.get_color()) for t in ax.texts]
+    ticks = [t.get_text() for t in ax.get_xticklabels()], [t.get_text() for t in ax.get_yticklabels()]
+    plt.close(fig)
+    # the NaN cell gets no label; every label uses the same colour
+    assert sorted(texts) == [("-0.05", "black"), ("1.00", "black"), ("1.00", "black")]
+    assert ticks == (["a", "b"], ["a", "b"])
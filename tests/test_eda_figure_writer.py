@@ -0,0 +1,65 @@
+# tests/test_eda_figure_writer.py
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+
+from EDA.figure_writer import AsyncFigureWriter
+
+# ---- test 1: background PNGs match savefig --------------------------------
+
+def test_async_png_matches_savefig(tmp_path):
+    fig, ax = plt.subplots(figsize=(6, 3))
+    ax.plot([0, 1, 2], [1, 0, 1], label="line")
+    ax.legend()
+    fig.suptitle("title", y=1.05)  # above the canvas: only a real tight render shows it
+
+    fig.savefig(tmp_path / "sync.png", dpi=100)
+    fig.savefig(tmp_path / "sync_tight.png", dpi=100, bbox_inches="tight")
+    with AsyncFigureWriter() as writer:
+        writer.save(fig, str(tmp_path / "sub" / "async.png"))
+        writer.save(fig, str(tmp_path / "sub" / "async_tight.png"), bbox_inches="tight")
+        fig.clear()  # pixels were copied, the figure can be reused right away
+    plt.close(fig)
+
+    assert mpimg.imread(tmp_path / "sub" / "async.png").shape == mpimg.imread(tmp_path / "sync.png").shape
+    assert (mpimg.imread(tmp_path / "sub" / "async_tight.png")
+            == mpimg.imread(tmp_path / "sync_tight.png")).all()
+
+# ---- test 2: the queue of pixel buffers waiting for encoding is bounded -----
+
+def test_pending_queue_is_bounded(tmp_path):
+    fig, ax = plt.subplots(figsize=(2, 2))
+    with AsyncFigureWriter(max_workers=1, max_pending=2) as writer:
+        for i in range(5):
+            ax.set_title(str(i))
+            writer.save(fig, str(tmp_path / f"{i}.png"))
+            assert len(writer._pending) <= 2
+    plt.close(fig)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{i}.png" for i in range(5)]
+
+# ---- test 3: pyplot-free figures render the same and are never registered ---
+
+def test_new_figure_outside_pyplot(tmp_path):
+    from EDA.figure_writer import new_figure
+
+    def draw(fig):
+        ax = fig.subplots()
+        ax.plot([0, 1, 2], [1, 0, 1])
+        ax.set_title("title")
+
+    managed = plt.figure(figsize=(4, 3))
+    draw(managed)
+    managed.savefig(tmp_path / "pyplot.png", dpi=100, bbox_inches="tight")
+    plt.close(managed)
+
+    fignums = plt.get_fignums()
+    fig = new_figure(figsize=(4, 3))
+    draw(fig)
+    with AsyncFigureWriter() as writer:
+        writer.save(fig, str(tmp_path / "plain.png"))
+        writer.save(fig, str(tmp_path / "tight.png"), bbox_inches="tight")
+    assert plt.get_fignums() == fignums
+    assert (mpimg.imread(tmp_path / "tight.png") == mpimg.imread(tmp_path / "pyplot.png")).all()
+    assert mpimg.imread(tmp_path / "plain.png").shape == (300, 400, 4)
@@ -0,0 +1,23 @@
+# tests/test_eda_garch.py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("arch")
+
+# ---- test 1: pool task returns its whole report instead of printing it ------
+
+def test_fit_and_save_returns_report(tmp_path, capsys):
+    import matplotlib
+    matplotlib.use("Agg")
+    from EDA.plotting.plot_garch_analysis import _fit_and_save
+
+    rng = np.random.default_rng(0)
+    returns = pd.Series(rng.standard_t(5, 500), index=pd.date_range("2020-01-01", periods=500, name="Date"))
+
+    name, report = _fit_and_save((returns, "01", str(tmp_path)))
+    assert name == "01"
+    assert capsys.readouterr().out == ""  # nothing reaches stdout from the worker
+    assert report.startswith("  Analyzing GARCH for 01...")
+    assert "--- GARCH(1,1) Summary for 01 ---" in report and "omega" in report
+    assert (tmp_path / "garch_diagnostics_01.png").exists()
@@ -0,0 +1,73 @@
+# tests/test_eda_hurst.py
+import numpy as np
+import pandas as pd
+import pytest
+
+hurst = pytest.importorskip("hurst")
+
+import EDA.plotting.plot_hurst_analysis as hurst_mod
+from EDA.plotting.plot_hurst_analysis import rolling_hurst, rolling_hurst_all
+
+# ---- tiny helpers -----------------------------------------------------------
+
+def random_walk_prices(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))),
+        index=pd.date_range("2020-01-01", periods=n, name="Date"),
+    )
+
+# ---- test 1: JIT rolling Hurst matches hurst.compute_Hc ---------------------
+
+def test_rolling_hurst_matches_compute_hc():
+    pytest.importorskip("numba")
+    prices = random_walk_prices(400)
+    window = 120
+
+    expected = prices.rolling(window).apply(lambda x: hurst.compute_Hc(x)[0], raw=True).dropna()
+    pd.testing.assert_series_equal(rolling_hurst(prices, window), expected, check_freq=False, atol=1e-10)
+
+# ---- test 2: NumPy sliding-window fallback matches hurst.compute_Hc ---------
+
+def test_numpy_rolling_hurst_matches_compute_hc(monkeypatch):
+    monkeypatch.setattr(hurst_mod, "HAS_NUMBA", False)
+    prices = random_walk_prices(400, seed=2)
+    window = 120
+
+    expected = prices.rolling(window).apply(lambda x: hurst.compute_Hc(x)[0], raw=True).dropna()
+    pd.testing.assert_series_equal(rolling_hurst(prices, window), expected, check_freq=False, atol=1e-10)
+
+# ---- test 3: parallel multi-asset kernel equals the per-asset result --------
+
+def test_rolling_hurst_all_handles_ragged_assets():
+    pytest.importorskip("numba")
+    rng = np.random.default_rng(1)
+    index = pd.date_range("2020-01-01", periods=300, name="Date")
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, (300, 2)), axis=0)),
+        index=index, columns=["01", "02"],
+    )
+    prices.iloc[:40, 1] = np.nan      # listed later
+    prices.iloc[150:155, 0] = np.nan  # holiday gap
+
+    result = rolling_hurst_all(prices, 100)
+    for name in prices.columns:
+        pd.testing.assert_series_equal(result[name], rolling_hurst(prices[name].dropna(), 100))
+
+# ---- test 4: float32 prices (loader default) give the float64 result --------
+
+@pytest.mark.parametrize("use_numba", [True, False])
+def test_float32_prices_match_compute_hc(monkeypatch, use_numba):
+    if use_numba:
+        pytest.importorskip("numba")
+    else:
+        monkeypatch.setattr(hurst_mod, "HAS_NUMBA", False)
+    prices = random_walk_prices(300, seed=3).astype(np.float32)
+    window = 120
+
+    # compute_Hc on the same float32 values, evaluated in float64
+    expected = prices.astype(np.float64).rolling(window).apply(lambda x: hurst.compute_Hc(x)[0], raw=True).dropna()
+    pd.testing.assert_series_equal(rolling_hurst(prices, window), expected, check_freq=False, atol=1e-10)
+    if use_numba:
+        result = rolling_hurst_all(prices.to_frame("01"), window)["01"]
+        pd.testing.assert_series_equal(result, expected, check_freq=False, check_names=False, atol=1e-10)
@@ -0,0 +1,248 @@
+# tests/test_eda_loader.py
+import os
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from EDA.data_loader import (
+    load_and_merge_data, calculate_log_returns, compute_log_prices, CACHE_FILENAME, FFILL_CACHE_FILENAME,
+)
+
+# ---- tiny helpers -----------------------------------------------------------
+
+def write_csv(path, dates, closes):
+    df = pd.DataFrame({
+        "Index": dates,
+        "Open": closes, "High": closes, "Low": closes, "Close": closes,
+        "Volume": [100] * len(dates),
+    })
+    df.to_csv(path, index=False)
+
+# ---- test 1: parquet cache round-trip and invalidation ----------------------
+
+def test_merged_cache_hit_and_invalidation(tmp_path):
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02"], [10.0, 11.0])
+    write_csv(tmp_path / "02.csv", ["2020-01-02", "2020-01-03"], [20.0, 21.0])
+
+    fresh = load_and_merge_data(str(tmp_path))
+    assert (tmp_path / CACHE_FILENAME).exists()
+    cached = load_and_merge_data(str(tmp_path))
+    pd.testing.assert_frame_equal(fresh, cached, check_freq=False)
+
+    # Touching a CSV after the cache was written must force a rebuild
+    write_csv(tmp_path / "02.csv", ["2020-01-02", "2020-01-03"], [30.0, 31.0])
+    cache_mtime = os.path.getmtime(tmp_path / CACHE_FILENAME)
+    os.utime(tmp_path / "02.csv", (cache_mtime + 10, cache_mtime + 10))
+    rebuilt = load_and_merge_data(str(tmp_path))
+    assert rebuilt.loc["2020-01-03", "02"] == 31.0
+
+    # Removing a CSV must also invalidate the cache, even though no mtime got newer
+    os.remove(tmp_path / "02.csv")
+    assert list(load_and_merge_data(str(tmp_path)).columns) == ["01"]
+
+# ---- test 2: log returns match the pandas shift/divide definition -----------
+
+def test_log_returns_match_shift_definition():
+    prices = pd.DataFrame(
+        {"01": [10.0, 11.0, np.nan, 12.0, 12.5], "02": [5.0, 5.5, 5.2, 5.1, 5.3]},
+        index=pd.date_range("2020-01-01", periods=5, name="Date"),
+    )
+    expected = np.log(prices / prices.shift(1)).dropna()
+
+    log_returns, abs_log_returns = calculate_log_returns(prices, with_abs=True)
+    pd.testing.assert_frame_equal(log_returns, expected, check_freq=False)
+    pd.testing.assert_frame_equal(abs_log_returns, expected.abs(), check_freq=False)
+    # log returns are just differences of the shared log prices
+    pd.testing.assert_frame_equal(compute_log_prices(prices).diff().dropna(), expected, check_freq=False)
+
+# ---- test 3: chunked streaming read gives the same merged frame -------------
+
+def test_chunked_load_matches_default(tmp_path):
+    dates = [str(d.date()) for d in pd.date_range("2020-01-01", periods=7)]
+    write_csv(tmp_path / "01.csv", dates, [float(i) for i in range(7)])
+    write_csv(tmp_path / "02.csv", dates[2:], [float(i) for i in range(5)])
+
+    default = load_and_merge_data(str(tmp_path), use_cache=False)
+    chunked = load_and_merge_data(str(tmp_path), use_cache=False, chunksize=2)
+    pd.testing.assert_frame_equal(default, chunked)
+
+# ---- test 4: prices load as float32 and log returns keep that dtype ---------
+
+def test_float32_prices_and_returns(tmp_path):
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02", "2020-01-03"], [10.0, 11.0, 10.5])
+
+    merged = load_and_merge_data(str(tmp_path), use_cache=False)
+    assert (merged.dtypes == np.float32).all()
+    assert (calculate_log_returns(merged).dtypes == np.float32).all()
+
+    wide = load_and_merge_data(str(tmp_path), use_cache=False, dtype=np.float64)
+    assert (wide.dtypes == np.float64).all()
+
+# ---- test 5: forward-filled frame has its own cache -------------------------
+
+def test_ffill_result_is_cached_separately(tmp_path):
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02", "2020-01-03"], [10.0, 11.0, 12.0])
+    write_csv(tmp_path / "02.csv", ["2020-01-01", "2020-01-03"], [20.0, 22.0])
+
+    filled = load_and_merge_data(str(tmp_path), ffill=True)
+    assert (tmp_path / CACHE_FILENAME).exists()
+    assert (tmp_path / FFILL_CACHE_FILENAME).exists()
+    assert filled.loc["2020-01-02", "02"] == 20.0
+
+    pd.testing.assert_frame_equal(load_and_merge_data(str(tmp_path), ffill=True), filled, check_freq=False)
+    assert np.isnan(load_and_merge_data(str(tmp_path)).loc["2020-01-02", "02"])
+
+# ---- test 6: quoted / padded headers and thousands separators ---------------
+
+def test_quoted_headers_and_thousands(tmp_path):
+    (tmp_path / "01.csv").write_text(
+        '"Index", "Open", "Close"\n'
+        '2020-01-01,1,"1,234.5"\n'
+        '2020-01-02,1,bad\n'
+        '2020-01-03,1,"1,240.0"\n'
+    )
+    merged = load_and_merge_data(str(tmp_path), use_cache=False, dtype=np.float64)
+    assert merged.index.name == "Date"
+    assert list(merged.columns) == ["01"]
+    assert merged["01"].tolist() == [1234.5, 1240.0]
+
+# ---- test 7: repeated loads in one process reuse the in-memory result -------
+
+def test_in_process_memo_returns_independent_copies(tmp_path, monkeypatch):
+    import EDA.data_loader as loader
+
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02"], [10.0, 11.0])
+    first = load_and_merge_data(str(tmp_path))
+
+    # Neither the CSVs nor the Parquet cache may be read again
+    monkeypatch.setattr(loader, "_load_and_concat", lambda *a, **k: pytest.fail("CSV re-parsed"))
+    monkeypatch.setattr(loader, "_read_cache", lambda *a, **k: pytest.fail("Parquet re-read"))
+    first.iloc[0, 0] = -1.0
+    second = load_and_merge_data(str(tmp_path))
+    assert second.iloc[0, 0] == 10.0
+
+# ---- test 8: per-asset OHLCV frames are cached as Parquet -------------------
+
+def test_read_asset_csv_parquet_cache(tmp_path):
+    from EDA.data_loader import read_asset_csv, ASSET_CACHE_DIR
+
+    csv = tmp_path / "01.csv"
+    write_csv(csv, ["2020-01-01", "2020-01-02"], [10.0, 11.0])
+    fresh = read_asset_csv(str(csv))
+    assert (tmp_path / ASSET_CACHE_DIR / "01.parquet").exists()
+    assert fresh["Index"].dtype == "datetime64[ns]"
+    pd.testing.assert_frame_equal(read_asset_csv(str(csv)), fresh)
+
+    write_csv(csv, ["2020-01-01", "2020-01-02"], [10.0, 12.0])
+    cache_mtime = os.path.getmtime(tmp_path / ASSET_CACHE_DIR / "01.parquet")
+    os.utime(csv, (cache_mtime + 10, cache_mtime + 10))
+    assert read_asset_csv(str(csv))["Close"].tolist() == [10.0, 12.0]
+
+# ---- test 9: typed Arrow read falls back to pandas for "1,234" values -------
+
+def test_read_asset_csv_thousands_fallback(tmp_path):
+    from EDA.data_loader import read_asset_csv
+
+    (tmp_path / "01.csv").write_text(
+        '"Index","Open","High","Low","Close","Volume"\n'
+        '2020-01-01,"1,200.5","1,250","1,190","1,234.5",100\n'
+    )
+    data = read_asset_csv(str(tmp_path / "01.csv"), use_cache=False)
+    assert data["Close"].tolist() == [1234.5]
+    assert data["Index"].dtype == "datetime64[ns]"
+
+# ---- test 10: log returns get their own Parquet cache -----------------------
+
+def test_load_log_returns_cached(tmp_path):
+    from EDA.data_loader import load_log_returns, LOG_RETURNS_CACHE_FILENAME
+
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02", "2020-01-03"], [10.0, 11.0, 12.0])
+    write_csv(tmp_path / "02.csv", ["2020-01-01", "2020-01-03"], [20.0, 22.0])
+
+    expected = calculate_log_returns(load_and_merge_data(str(tmp_path), ffill=True))
+    fresh = load_log_returns(str(tmp_path))
+    assert (tmp_path / LOG_RETURNS_CACHE_FILENAME).exists()
+    pd.testing.assert_frame_equal(fresh, expected, check_freq=False)
+
+    cached, cached_abs = load_log_returns(str(tmp_path), with_abs=True)
+    pd.testing.assert_frame_equal(cached, expected, check_freq=False)
+    pd.testing.assert_frame_equal(cached_abs, expected.abs(), check_freq=False)
+    # different parameters must not reuse the ffill=True entry (unfilled, 02's gap drops every row)
+    assert load_log_returns(str(tmp_path), ffill=False).empty
+
+# ---- test 11: directory listing picks the same files as glob('*.csv') --------
+
+def test_list_csv_files(tmp_path):
+    from EDA.data_loader import list_csv_files
+
+    for name in ["02.csv", "01.csv", ".hidden.csv", "notes.txt", "03.csv.bak"]:
+        (tmp_path / name).write_text("")
+    (tmp_path / "sub.csv").mkdir()
+    assert list_csv_files(str(tmp_path)) == [str(tmp_path / "01.csv"), str(tmp_path / "02.csv")]
+    assert list_csv_files(str(tmp_path / "missing")) == []
+
+# ---- test 12: forward returns match pct_change(k).shift(-k) -----------------
+
+def test_forward_returns_match_pct_change():
+    from EDA.data_loader import forward_returns
+
+    prices = pd.Series([10.0, 11.0, np.nan, 12.0, 12.5, 13.0], name="Close",
+                       index=pd.date_range("2020-01-01", periods=6, name="Date"))
+    expected = prices.pct_change(2, fill_method=None).shift(-2)
+    pd.testing.assert_series_equal(forward_returns(prices, 2), expected)
+    assert forward_returns(prices.iloc[:2], 2).isna().all()
+
+# ---- test 13: direct pyarrow read matches the pandas C engine ---------------
+
+def test_arrow_close_reader_matches_c_engine(tmp_path, monkeypatch):
+    import EDA.data_loader as loader
+
+    if loader.CSV_ENGINE != "pyarrow":
+        pytest.skip("pyarrow not installed")
+    (tmp_path / "01.csv").write_text(
+        '"Index","Open","Close"\n'
+        '2020-01-01,1,1.5\n'
+        '2020-01-02,1,\n'      # missing close
+        ',1,3.0\n'             # missing date
+        '2020-01-03,1,2.0\n'
+        '2020-01-03,1,2.5\n'   # duplicate date: last one wins
+    )
+    write_csv(tmp_path / "02.csv", ["2020-01-02", "2020-01-04"], [20.0, 21.0])
+
+    arrow = load_and_merge_data(str(tmp_path), use_cache=False, dtype=np.float64)
+    monkeypatch.setattr(loader, "CSV_ENGINE", "c")
+    pd.testing.assert_frame_equal(arrow, load_and_merge_data(str(tmp_path), use_cache=False, dtype=np.float64))
+    assert arrow["01"].dropna().tolist() == [1.5, 2.5]
+
+# ---- test 14: a float32 load does not leave float32-rounded prices in the cache
+
+@pytest.mark.parametrize("ffill", [False, True])
+def test_float64_load_after_float32_load(tmp_path, ffill):
+    import EDA.data_loader as loader
+
+    write_csv(tmp_path / "01.csv", ["2020-01-01", "2020-01-02", "2020-01-03"], [10.1, 11.3, 12.7])
+    write_csv(tmp_path / "02.csv", ["2020-01-01", "2020-01-03"], [20.3, 22.9])
+
+    load_and_merge_data(str(tmp_path), ffill=ffill)  # float32 default writes the Parquet caches
+    loader._load_memoized.cache_clear()              # force the next load to go through the Parquet cache
+    cached = load_and_merge_data(str(tmp_path), ffill=ffill, dtype=np.float64)
+    fresh = load_and_merge_data(str(tmp_path), ffill=ffill, use_cache=False, dtype=np.float64)
+    pd.testing.assert_frame_equal(cached, fresh, check_exact=True, check_freq=False)
+
+# ---- test 15: prefetch keeps a bounded lookahead and stops early -------------
+
+def test_prefetch_is_bounded_and_ordered():
+    from EDA.data_loader import prefetch
+
+    calls = []
+    def record(item):
+        calls.append(item)
+        return item * 10
+
+    gen = prefetch(record, range(100), max_workers=2)
+    assert [future.result() for _, future in islice(gen, 3)] == [0, 10, 20]
+    gen.close()  # consumer stops early: nothing beyond the lookahead window was submitted
+    assert len(calls) <= 5
+    assert [(item, future.result()) for item, future in prefetch(record, range(4))] == [(i, i * 10) for i in range(4)]
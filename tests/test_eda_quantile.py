@@ -0,0 +1,118 @@
+# tests/test_eda_quantile.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from EDA.plotting.plot_quantile_analysis import (
+    _quantile_labels, _row_nanquantiles, _factor_matrices, _daily_quantile_returns,
+    _quantile_moments, _welch_ttest,
+)
+
+# ---- test 1: vectorised labeler matches per-row pd.qcut ---------------------
+
+def test_quantile_labels_match_qcut_with_ties_and_nans():
+    rng = np.random.default_rng(0)
+    factor = rng.integers(-3, 4, size=(200, 9)).astype(float)  # lots of ties
+    factor[rng.random(factor.shape) < 0.2] = np.nan
+    factor[0] = np.nan        # nothing valid
+    factor[1, :] = 1.0        # all equal -> qcut cannot bin
+    factor[2, 1:] = np.nan    # single value
+
+    labels = _quantile_labels(factor, 5)
+
+    for row, got in zip(factor, labels):
+        expected = pd.qcut(pd.Series(row), 5, labels=False, duplicates="drop") + 1
+        np.testing.assert_array_equal(got, expected.fillna(0).to_numpy())
+
+# ---- test 2: sort-based row quantiles equal np.nanquantile ------------------
+
+def test_row_nanquantiles_match_numpy():
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=(300, 7))
+    x[rng.random(x.shape) < 0.3] = np.nan
+    x[0] = np.nan
+    q = np.linspace(0, 1, 6)
+
+    with np.errstate(all="ignore"), pytest.warns(RuntimeWarning):
+        expected = np.nanquantile(x, q, axis=1).T
+    np.testing.assert_array_equal(_row_nanquantiles(x, q), expected)
+
+def _long_frame(prices, fwd, quantile):
+    """(Date, Asset) long table the way the analysis used to build it."""
+    wide = lambda a: pd.DataFrame(a, index=prices.index, columns=prices.columns)
+    df_long = pd.concat([wide(fwd).stack(), wide(quantile).stack()], axis=1, keys=["fwd_return", "Quantile"])
+    return df_long[df_long["Quantile"] > 0]
+
+# ---- test 3: bincount portfolio means match groupby + unstack ---------------
+
+def test_daily_quantile_returns_match_groupby():
+    rng = np.random.default_rng(1)
+    prices = pd.DataFrame(
+        np.exp(np.cumsum(rng.normal(0, 0.01, size=(120, 8)), axis=0)),
+        index=pd.date_range("2020-01-01", periods=120, name="Date"),
+        columns=[f"{i:02d}" for i in range(8)],
+    )
+    prices.iloc[:30, 0] = np.nan  # asset that starts late
+
+    factor, fwd, quantile = _factor_matrices(prices, 10, 5)
+    df_long = _long_frame(prices, fwd, quantile)
+    expected = df_long.groupby(["Date", "Quantile"])["fwd_return"].mean().unstack()
+
+    got = _daily_quantile_returns(prices.index, fwd, quantile)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_column_type=False, check_freq=False)
+
+# ---- test 4: Welch t-test from group moments equals scipy on the slices -----
+
+def test_welch_ttest_from_moments_matches_scipy():
+    rng = np.random.default_rng(4)
+    prices = pd.DataFrame(
+        np.exp(np.cumsum(rng.normal(0, 0.02, size=(200, 12)), axis=0)),
+        index=pd.date_range("2020-01-01", periods=200, name="Date"),
+        columns=[f"{i:02d}" for i in range(12)],
+    )
+    factor, fwd, quantile = _factor_matrices(prices, 20, 10)
+    counts, means, variances = _quantile_moments(fwd, quantile)
+
+    df_long = _long_frame(prices, fwd, quantile)
+    pd.testing.assert_series_equal(
+        pd.Series(means[1:], index=pd.Index(np.arange(1, 6, dtype=np.int8), name="Quantile"), name="fwd_return"),
+        df_long.groupby("Quantile")["fwd_return"].mean(),
+    )
+    expected = stats.ttest_ind(fwd[quantile == 5], fwd[quantile == 1], equal_var=False)
+    np.testing.assert_allclose(_welch_ttest(counts, means, variances, 5, 1), expected, rtol=1e-10)
+
+# ---- test 5: missing prices drop out instead of being forward-filled --------
+
+def test_missing_prices_are_excluded_not_filled():
+    rng = np.random.default_rng(5)
+    prices = pd.DataFrame(
+        np.exp(np.cumsum(rng.normal(0, 0.01, size=(60, 6)), axis=0)),
+        index=pd.date_range("2020-01-01", periods=60, name="Date"),
+        columns=[f"{i:02d}" for i in range(6)],
+    )
+    prices.iloc[30, 2] = np.nan  # one holiday for one asset
+
+    factor, fwd, quantile = _factor_matrices(prices, 5, 3)
+    # the gap date itself, the date whose forward return ends on it, and the date whose factor looks back to it
+    for row in (30, 30 - 3, 30 + 5):
+        assert quantile[row, 2] == 0
+    assert (quantile[30, [0, 1, 3, 4, 5]] > 0).all()
+
+# ---- test 6: a precomputed forward-return matrix is reused, not modified ----
+
+def test_factor_matrices_reuse_forward_returns():
+    from EDA.plotting.plot_quantile_analysis import _forward_return_matrix
+
+    rng = np.random.default_rng(6)
+    prices = pd.DataFrame(np.exp(np.cumsum(rng.normal(0, 0.01, size=(80, 7)), axis=0)))
+    prices.iloc[40, 3] = np.nan
+
+    fwd = _forward_return_matrix(prices, 4)
+    np.testing.assert_array_equal(fwd, prices.pct_change(4, fill_method=None).shift(-4).to_numpy())
+    before = fwd.copy()
+    for k in (3, 10):
+        expected = _factor_matrices(prices, k, 4)
+        for got, exp in zip(_factor_matrices(prices, k, 4, fwd=fwd), expected):
+            np.testing.assert_array_equal(got, exp)
+    np.testing.assert_array_equal(fwd, before)
@@ -0,0 +1,63 @@
+# tests/test_eda_rsi.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import EDA.plotting.plot_rsi_analysis as rsi_mod
+from EDA.plotting.plot_rsi_analysis import calculate_rsi
+
+# ---- tiny helpers -----------------------------------------------------------
+
+def random_walk_prices(n, seed=0, dtype=np.float64):
+    rng = np.random.default_rng(seed)
+    return pd.Series(
+        (100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))).astype(dtype),
+        index=pd.date_range("2020-01-01", periods=n, name="Date"),
+        name="01",
+    )
+
+# ---- test 1: JIT RSI is bit-identical to the pandas ewm version -------------
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_rsi_kernel_matches_pandas(monkeypatch, dtype):
+    pytest.importorskip("numba")
+    prices = random_walk_prices(300, dtype=dtype)
+    prices.iloc[[50, 51, 120]] = np.nan  # gaps count as zero gain/loss in the pandas version
+    prices.iloc[200:210] = prices.iloc[199]  # flat stretch
+
+    jit = {p: calculate_rsi(prices, period=p) for p in (1, 14)}
+    monkeypatch.setattr(rsi_mod, "HAS_NUMBA", False)
+    for p, got in jit.items():
+        pd.testing.assert_series_equal(got, calculate_rsi(prices, period=p), check_exact=True)
+    assert jit[14].iloc[:13].isna().all() and jit[14].iloc[13:].notna().all()
+
+# ---- test 2: one call for all assets equals per-asset dropna + calculate_rsi -
+
+def test_rsi_all_matches_per_asset_calls():
+    prices = pd.concat(
+        [random_walk_prices(200, seed=s, dtype=np.float32).rename(f"{s:02d}") for s in range(3)], axis=1
+    )
+    prices.iloc[:40, 1] = np.nan  # asset that starts late (outer join)
+
+    got = rsi_mod.rsi_all(prices)
+    for name in prices.columns:
+        pd.testing.assert_series_equal(got[name], calculate_rsi(prices[name].dropna()), check_exact=True)
+    pd.testing.assert_series_equal(calculate_rsi(prices)["00"], calculate_rsi(prices["00"]), check_exact=True)
+
+# ---- test 3: batched Welch t-tests equal scipy on the per-asset slices -------
+
+def test_rsi_signal_ttests_match_scipy():
+    from scipy import stats
+    from EDA.data_loader import forward_returns
+
+    prices = pd.concat([random_walk_prices(400, seed=s).rename(f"{s:02d}") for s in range(3)], axis=1)
+    prices.iloc[:60, 2] = np.nan
+    rsi = rsi_mod.rsi_all(prices)
+
+    got = rsi_mod.rsi_signal_ttests(prices, rsi)
+    for name in prices.columns:
+        df = pd.DataFrame({"rsi": rsi[name], "fwd": forward_returns(prices[name].dropna(), rsi_mod.FORWARD_RETURN_DAYS)})
+        df = df.dropna()
+        signal = df["rsi"] < rsi_mod.RSI_OVERSOLD
+        expected = stats.ttest_ind(df["fwd"][signal], df["fwd"][~signal], equal_var=False, alternative="greater")
+        np.testing.assert_allclose(got[name], expected, rtol=1e-10)
@@ -0,0 +1,29 @@
+# tests/test_eda_seasonality.py
+import numpy as np
+import pandas as pd
+from matplotlib import cbook
+
+from EDA.plotting.plot_seasonality_analysis import seasonality_box_stats
+
+# ---- test 1: batched box stats match matplotlib's per-group boxplot_stats ---
+
+def test_box_stats_match_boxplot_stats_per_asset():
+    rng = np.random.default_rng(2)
+    prices = pd.DataFrame(
+        np.exp(np.cumsum(rng.standard_t(3, size=(400, 3)) * 0.01, axis=0)),
+        index=pd.date_range("2020-01-01", periods=400, name="Date"),
+        columns=["01", "02", "03"],
+    )
+    prices.iloc[:50, 1] = np.nan  # asset that starts late
+
+    stats = seasonality_box_stats(prices)
+
+    for asset in prices.columns:
+        returns = np.log(prices[asset].dropna()).diff().dropna()
+        for got, keys in zip(stats[asset], (returns.index.day_of_week, returns.index.month)):
+            assert len(got) == len(np.unique(keys))
+            for box, key in zip(got, np.unique(keys)):
+                ref = cbook.boxplot_stats(returns[keys == key].to_numpy())[0]
+                for field in ("q1", "med", "q3", "whislo", "whishi"):
+                    assert np.isclose(box[field], ref[field])
+                np.testing.assert_allclose(np.sort(box["fliers"]), np.sort(ref["fliers"]))
@@ -0,0 +1,42 @@
+# tests/test_eda_volatility.py
+import numpy as np
+import pandas as pd
+
+import EDA.data_loader as shared
+from EDA.plotting.plot_volatility import calculate_atr, load_and_merge_data
+
+# ---- test 1: array true range matches the concat + row-max definition -------
+
+def test_atr_matches_concat_max_definition():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+    df = pd.DataFrame(
+        {"high": close * 1.01, "low": close * 0.99, "close": close},
+        index=pd.date_range("2020-01-01", periods=300, name="Date"),
+    )
+    df.iloc[[10, 11], 2] = np.nan  # gaps in close: the true range falls back to the other legs
+    df.iloc[50, :] = np.nan
+
+    prev_close = df["close"].shift(1)
+    ranges = pd.concat(
+        [df["high"] - df["low"], np.abs(df["high"] - prev_close), np.abs(df["low"] - prev_close)], axis=1
+    )
+    expected = ranges.max(axis=1).ewm(span=14, adjust=False).mean()
+    pd.testing.assert_series_equal(calculate_atr(df), expected, check_exact=True)
+
+# ---- test 2: the script's merged close table stays ffilled float64 ----------
+
+def test_load_and_merge_data_is_ffilled_float64(tmp_path):
+    for name, dates, closes in [("01", ["2020-01-01", "2020-01-02", "2020-01-03"], [10.0, 11.0, 12.0]),
+                                ("02", ["2020-01-01", "2020-01-03"], [20.0, 21.0])]:
+        pd.DataFrame({"Index": dates, "Close": [c + 0.1 for c in closes]}).to_csv(
+            tmp_path / f"{name}.csv", index=False)
+
+    # GARCH / RSI / seasonality load ffill=True with the float32 default first and write .cache.ffill.parquet
+    shared.load_and_merge_data(str(tmp_path), ffill=True)
+    shared._load_memoized.cache_clear()
+
+    merged = load_and_merge_data(str(tmp_path))
+    assert (merged.dtypes == np.float64).all()
+    assert merged.loc["2020-01-02", "02"] == 20.1
+    assert merged.loc["2020-01-03", "01"] == 12.1
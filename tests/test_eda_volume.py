@@ -0,0 +1,77 @@
+# tests/test_eda_volume.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import EDA.plotting.plot_volume_analysis as volume_mod
+from EDA.plotting.plot_volume_analysis import calculate_rsi, calculate_mfi
+
+# ---- test 1: array RSI / MFI match the pandas Series definitions ------------
+
+def test_rsi_and_mfi_match_pandas_definitions():
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("2020-01-01", periods=200, name="date")
+    close = pd.Series(100 + rng.normal(0, 1, 200).cumsum(), index=idx, name="close")
+    high, low = close + 1, close - 1
+    volume = pd.Series(rng.integers(1, 1000, 200), index=idx, name="volume")
+
+    delta = close.diff(1)
+    avg_gain = delta.where(delta > 0, 0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    avg_loss = (-delta.where(delta < 0, 0)).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    pd.testing.assert_series_equal(calculate_rsi(close), 100 - 100 / (1 + avg_gain / avg_loss), check_exact=True)
+    # a series that never falls has no losses: neutral 50
+    assert (calculate_rsi(pd.Series(np.arange(30.0))) == 50).all()
+
+    tp = (high + low + close) / 3
+    flow, change = tp * volume, tp.diff(1)
+    pos = flow.where(change > 0, 0).rolling(14, min_periods=14).sum()
+    neg = flow.where(change < 0, 0).rolling(14, min_periods=14).sum()
+    expected = (100 - 100 / (1 + pos / (neg + 1e-9))).clip(0, 100)
+    pd.testing.assert_series_equal(calculate_mfi(high, low, close, volume), expected, check_exact=True)
+
+# ---- test 2: JIT smoothing / rolling sums are bit-identical to pandas -------
+
+@pytest.mark.parametrize("period", [2, 14])
+def test_volume_kernels_match_pandas(monkeypatch, period):
+    pytest.importorskip("numba")
+    rng = np.random.default_rng(1)
+    idx = pd.date_range("2020-01-01", periods=300, name="date")
+    close = pd.Series(100 + rng.normal(0, 1, 300).cumsum(), index=idx, name="close")
+    close.iloc[[40, 41, 150]] = np.nan  # gaps
+    close.iloc[200:215] = close.iloc[199]  # flat stretch: constant windows
+    high, low = close + 1, close - 1
+    volume = pd.Series(rng.integers(1, 1000, 300), index=idx, name="volume")
+
+    jit = calculate_rsi(close, period), calculate_mfi(high, low, close, volume, period)
+    monkeypatch.setattr(volume_mod, "HAS_NUMBA", False)
+    pd.testing.assert_series_equal(jit[0], calculate_rsi(close, period), check_exact=True)
+    pd.testing.assert_series_equal(jit[1], calculate_mfi(high, low, close, volume, period), check_exact=True)
+
+# ---- test 3: signal groups from ndarray masks equal the dropna'd frame ------
+
+def test_analyze_volume_signal_counts_match_dropna(tmp_path, capsys):
+    import matplotlib
+    matplotlib.use("Agg")
+    from EDA.data_loader import forward_returns
+
+    rng = np.random.default_rng(2)
+    idx = pd.date_range("2020-01-01", periods=400, name="date")
+    close = pd.Series(100 + rng.normal(0, 2, 400).cumsum(), index=idx)
+    df = pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close,
+                       "volume": rng.integers(1, 1000, 400)})
+    before = df.copy()
+
+    volume_mod.analyze_volume_signal(df, "01", str(tmp_path))
+    pd.testing.assert_frame_equal(df, before)  # the caller's frame is not modified
+    assert (tmp_path / "volume_filter_comp_01.png").exists()
+
+    expected = before.assign(
+        rsi=calculate_rsi(close), mfi=calculate_mfi(df["high"], df["low"], close, df["volume"]),
+        fwd=forward_returns(close, volume_mod.FORWARD_RETURN_DAYS),
+    ).dropna()
+    rsi_only = expected[expected["rsi"] < volume_mod.OVERSOLD_THRESHOLD]
+    both = rsi_only[rsi_only["mfi"] < volume_mod.OVERSOLD_THRESHOLD]
+    out = capsys.readouterr().out
+    assert f"Signal Count: {len(rsi_only)}\n" in out
+    assert f"Signal Count: {len(both)} (Filtered out {len(rsi_only) - len(both)} signals)" in out
+    assert f"Avg. Fwd Return: {both['fwd'].mean():.4f}" in out